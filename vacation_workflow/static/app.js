@@ -1,5 +1,13 @@
 const { createApp } = Vue;
 
+// ETag последних GET-ответов: url -> { etag, body }. Повторный запрос
+// уходит с If-None-Match, на 304 возвращается сохранённое тело
+const etagCache = new Map();
+const ETAG_CACHE_LIMIT = 100;
+// годы производственного календаря, которые уже запрашиваются
+const calendarRequests = new Map();
+const ONE_DAY_MS = 24 * 60 * 60 * 1000;
+
 function getCookie(name) {
   const value = `; ${document.cookie}`;
   const parts = value.split(`; ${name}=`);
@@ -14,6 +22,8 @@ createApp({
       loginForm: { username: '', password: '' },
       newRequest: { start_date: '', end_date: '' },
       dateRangeInfo: { days: 0, valid: false },
+      // год -> { off: {дата: true}, on: {дата: true} }: отличия от обычной недели
+      calendarYears: {},
       dateRangeError: '',
       error: '',
       balance: 0,
@@ -138,16 +148,39 @@ createApp({
         credentials: 'include',
         headers: { 'Content-Type': 'application/json', ...this.csrfHeader() },
       }, options);
+      const isGet = (opts.method || 'GET').toUpperCase() === 'GET';
+      const cached = isGet ? etagCache.get(url) : null;
+      if (isGet) {
+        // валидаторы шлём сами, мимо HTTP-кэша браузера, чтобы 304 дошёл сюда
+        opts.cache = 'no-store';
+        if (cached) {
+          opts.headers = { ...opts.headers, 'If-None-Match': cached.etag };
+        }
+      }
       const response = await fetch(url, opts);
+      if (response.status === 304 && cached) {
+        // тело храним строкой: вызывающий код может менять полученный объект
+        return JSON.parse(cached.body);
+      }
       const contentType = response.headers.get('content-type') || '';
       let data = null;
+      let body = null;
       if (contentType.includes('application/json')) {
-        data = await response.json();
+        body = await response.text();
+        data = JSON.parse(body);
       }
       if (!response.ok) {
         const message = data && data.error ? data.error : 'Ошибка запроса';
         throw new Error(message);
       }
+      const etag = response.headers.get('etag');
+      if (isGet && etag && body !== null) {
+        etagCache.delete(url);
+        etagCache.set(url, { etag, body });
+        if (etagCache.size > ETAG_CACHE_LIMIT) {
+          etagCache.delete(etagCache.keys().next().value);
+        }
+      }
       return data;
     },
     async loadMe() {
@@ -227,6 +260,7 @@ createApp({
       } catch (err) {
         console.error(err);
       }
+      etagCache.clear();
       this.user = null;
       this.showProfileModal = false;
       this.myRequests = [];
@@ -365,11 +399,11 @@ createApp({
         return;
       }
 
-      const start = new Date(start_date);
-      const end = new Date(end_date);
-      const diffMs = end.getTime() - start.getTime();
-      const oneDayMs = 24 * 60 * 60 * 1000;
-      const days = Math.round(diffMs / oneDayMs) + 1;
+      if (!this.hasCalendars(start_date, end_date)) {
+        // пересчитаем, когда придёт календарь; до тех пор - по обычной неделе
+        this.loadCalendars(start_date, end_date).then(() => this.updateDateRangeInfo());
+      }
+      const days = this.getDaysBetween(start_date, end_date);
 
       this.dateRangeInfo = { days, valid: true };
 
@@ -579,13 +613,50 @@ createApp({
       }
       window.open(url, '_blank');
     },
+    calendarYearsOf(start, end) {
+      const years = [];
+      for (let year = Number(start.slice(0, 4)); year <= Number(end.slice(0, 4)); year += 1) {
+        years.push(year);
+      }
+      return years;
+    },
+    hasCalendars(start, end) {
+      return this.calendarYearsOf(start, end).every((year) => this.calendarYears[year]);
+    },
+    loadCalendars(start, end) {
+      return Promise.all(this.calendarYearsOf(start, end).map((year) => this.loadCalendar(year)));
+    },
+    loadCalendar(year) {
+      if (this.calendarYears[year]) return Promise.resolve();
+      if (!calendarRequests.has(year)) {
+        const toSet = (days) => Object.fromEntries(days.map((day) => [day, true]));
+        const request = this.fetchJson(`/api/calendar?year=${year}`)
+          .then((data) => ({ off: toSet(data.non_working), on: toSet(data.working) }))
+          // без календаря считаем по обычной неделе, повторно не запрашиваем
+          .catch(() => ({ off: {}, on: {} }))
+          .then((calendar) => {
+            this.calendarYears = { ...this.calendarYears, [year]: calendar };
+            calendarRequests.delete(year);
+          });
+        calendarRequests.set(year, request);
+      }
+      return calendarRequests.get(year);
+    },
+    // рабочие дни периода по производственному календарю (как считает сервер)
     getDaysBetween(start, end) {
       if (!start || !end) return '';
-      const startDate = new Date(start);
-      const endDate = new Date(end);
+      const startDate = new Date(`${start}T00:00:00Z`);
+      const endDate = new Date(`${end}T00:00:00Z`);
       if (isNaN(startDate) || isNaN(endDate)) return '';
-      const diffMs = endDate.getTime() - startDate.getTime();
-      const days = Math.floor(diffMs / (1000 * 60 * 60 * 24)) + 1;
+      let days = 0;
+      for (let time = startDate.getTime(); time <= endDate.getTime(); time += ONE_DAY_MS) {
+        const day = new Date(time);
+        const iso = day.toISOString().slice(0, 10);
+        const calendar = this.calendarYears[day.getUTCFullYear()] || { off: {}, on: {} };
+        if (calendar.on[iso] || (!calendar.off[iso] && day.getUTCDay() % 6 !== 0)) {
+          days += 1;
+        }
+      }
       return days;
     },
     toggleMySort(field) {
@@ -1,7 +1,22 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
+from django.db import transaction
 
-from .models import User, VacationBalance, VacationRequest, VacationSchedule, Notification
+from . import unread
+from .changes import Action, Entity, record_change, record_changes
+from .models import (
+    ArchivedNotification,
+    BroadcastNotification,
+    ChangeLogEntry,
+    ExportJob,
+    Holiday,
+    Notification,
+    ReminderWatermark,
+    User,
+    VacationBalance,
+    VacationRequest,
+    VacationSchedule,
+)
 
 
 @admin.register(User)
@@ -12,18 +27,95 @@ class UserAdmin(DjangoUserAdmin):
     list_display = ('username', 'email', 'role', 'manager', 'is_staff')
     list_filter = ('role', 'is_staff', 'is_superuser')
 
+    # правки профиля пишут журнал, как и API: ETag, кэш ответов и live-клиенты
+    # менеджера и HR узнают о новом имени, роли или менеджере
+    def save_model(self, request, obj, form, change):
+        old_manager_id, old_role = (
+            User.objects.filter(pk=obj.pk).values_list('manager_id', 'role').first() if change else None
+        ) or (None, None)
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            rows = [(obj.id, obj.id, obj.manager_id)]
+            if change and old_manager_id != obj.manager_id:
+                # прежний менеджер тоже должен убрать сотрудника из своих списков
+                rows.append((obj.id, obj.id, old_manager_id))
+            record_changes(Entity.USER, rows)
+            if change and old_role != obj.role:
+                # broadcast видны по роли: с новой ролью у пользователя другой набор непрочитанных
+                unread.recount([obj.id])
+
+    def get_deleted_objects(self, objs, request):
+        deleted, model_count, perms_needed, protected = super().get_deleted_objects(objs, request)
+        # заявки уходят вместе с сотрудником; запрет в VacationRequestAdmin - про удаление отдельных заявок
+        perms_needed.discard(VacationRequest._meta.verbose_name)
+        return deleted, model_count, perms_needed, protected
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, User.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            users = list(queryset.values_list('id', 'manager_id'))
+            user_ids = [user_id for user_id, _ in users]
+            # заявки уходят каскадом (балансы журналируют свои сигналы)
+            requests = list(
+                VacationRequest.objects
+                .filter(user_id__in=user_ids)
+                .values_list('id', 'user_id', 'user__manager_id')
+            )
+            # вместе с заявками каскадом уходят уведомления о них у менеджеров и HR
+            request_ids = [request_id for request_id, _, _ in requests]
+            affected = set(
+                Notification.objects.filter(request_id__in=request_ids, is_read=False).values_list('user_id', flat=True)
+            )
+            roles = set(BroadcastNotification.objects.filter(request_id__in=request_ids).values_list('role', flat=True))
+            super().delete_queryset(request, queryset)
+            record_changes(Entity.REQUEST, requests, action=Action.DELETE)
+            record_changes(
+                Entity.USER, ((user_id, user_id, manager_id) for user_id, manager_id in users), action=Action.DELETE,
+            )
+            if roles:
+                affected.update(User.objects.filter(role__in=roles).values_list('id', flat=True))
+            if affected:
+                unread.recount(affected)
+
 
 @admin.register(VacationBalance)
 class VacationBalanceAdmin(admin.ModelAdmin):
-    list_display = ('user', 'days_remaining')
+    list_display = ('user', 'year', 'days_remaining', 'reserved_days', 'consumed_days')
+    # итоги ведутся по заявкам (ledger.py), руками их не правим
+    readonly_fields = ('reserved_days', 'consumed_days')
 
 
 @admin.register(VacationRequest)
 class VacationRequestAdmin(admin.ModelAdmin):
-    list_display = ('user', 'start_date', 'end_date', 'status', 'confirmed_by_employee', 'created_at')
+    list_display = ('user', 'start_date', 'end_date', 'days', 'status', 'confirmed_by_employee', 'created_at')
+    # статус, даты и подтверждение меняют резерв дней (ledger.py), а создание и
+    # удаление ещё и уведомления - всё это делают только вьюхи API; days
+    # считается по производственному календарю
+    readonly_fields = ('user', 'start_date', 'end_date', 'days', 'status', 'confirmed_by_employee')
     list_filter = ('status', 'confirmed_by_employee')
     search_fields = ('user__username',)
 
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            record_change(Entity.REQUEST, obj.id, obj.user)
+
+
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    # дни уже поданных заявок пересчитывает import_production_calendar, не правка здесь
+    list_display = ('date', 'kind', 'name')
+    list_filter = ('kind',)
+    date_hierarchy = 'date'
+
 
 @admin.register(VacationSchedule)
 class VacationScheduleAdmin(admin.ModelAdmin):
@@ -34,3 +126,63 @@ class VacationScheduleAdmin(admin.ModelAdmin):
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('user', 'type', 'request', 'is_read', 'created_at')
     list_filter = ('is_read',)
+
+    # счётчик непрочитанных (unread.py) ручные правки не видит - пересчитываем получателей
+    def save_model(self, request, obj, form, change):
+        old_user_id = Notification.objects.filter(pk=obj.pk).values_list('user_id', flat=True).first()
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            unread.recount({obj.user_id, old_user_id} - {None})
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, Notification.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            affected = set(queryset.values_list('user_id', flat=True))
+            super().delete_queryset(request, queryset)
+            unread.recount(affected)
+
+
+@admin.register(ArchivedNotification)
+class ArchivedNotificationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'type', 'request', 'created_at', 'archived_at')
+    list_filter = ('type',)
+
+
+@admin.register(BroadcastNotification)
+class BroadcastNotificationAdmin(admin.ModelAdmin):
+    list_display = ('role', 'type', 'request', 'remind_days', 'created_at')
+    list_filter = ('role', 'type')
+
+    def save_model(self, request, obj, form, change):
+        old_role = BroadcastNotification.objects.filter(pk=obj.pk).values_list('role', flat=True).first()
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            unread.recount(User.objects.filter(role__in={obj.role, old_role}).values_list('id', flat=True))
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, BroadcastNotification.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            roles = set(queryset.values_list('role', flat=True))
+            super().delete_queryset(request, queryset)
+            unread.recount(User.objects.filter(role__in=roles).values_list('id', flat=True))
+
+
+@admin.register(ChangeLogEntry)
+class ChangeLogEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'entity', 'entity_id', 'action', 'scope_user', 'scope_manager', 'hr_visible', 'created_at')
+    list_filter = ('entity', 'action', 'hr_visible')
+
+
+@admin.register(ReminderWatermark)
+class ReminderWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('key', 'last_date', 'updated_at')
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'year', 'manager_id', 'status', 'rows_done', 'rows_total', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
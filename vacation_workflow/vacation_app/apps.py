@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class VacationAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vacation_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
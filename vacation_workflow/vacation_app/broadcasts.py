@@ -0,0 +1,129 @@
+"""
+Broadcast-уведомления: одно событие на роль вместо строки на получателя.
+
+Получатели - все пользователи роли. Прочитанное хранится компактно
+в BroadcastReadState (отметка read_up_to + короткий список id выше неё),
+так что размер таблиц не зависит от числа сотрудников в роли.
+
+В API broadcast-уведомления идут вперемешку с личными; их id
+отличаются префиксом: "b<pk>".
+"""
+from django.db import transaction
+from django.db.models import Max
+
+from .changes import Action, Entity, record_changes
+from .models import BroadcastNotification, BroadcastReadState, User
+
+ID_PREFIX = 'b'
+
+
+def public_id(broadcast_id):
+    return f'{ID_PREFIX}{broadcast_id}'
+
+
+def visible_broadcasts(user: User):
+    """Broadcast-уведомления роли пользователя, появившиеся после его регистрации."""
+    return BroadcastNotification.objects.filter(role=user.role, created_at__gte=user.date_joined)
+
+
+def read_state(user: User):
+    """Состояние прочтения (без записи в БД, если пользователь ничего не читал)."""
+    try:
+        return user.broadcast_read_state
+    except BroadcastReadState.DoesNotExist:
+        return BroadcastReadState(user=user)
+
+
+def unread_broadcasts(user: User, state=None):
+    state = state or read_state(user)
+    qs = visible_broadcasts(user).filter(id__gt=state.read_up_to)
+    if state.read_ids:
+        qs = qs.exclude(id__in=state.read_ids)
+    return qs
+
+
+def _compact(user, state):
+    """Сдвигает read_up_to через подряд прочитанные id и выкидывает их из read_ids."""
+    read_ids = set(state.read_ids)
+    # сдвинуться можно не дальше чем на len(read_ids) позиций
+    following = (
+        BroadcastNotification.objects
+        .filter(role=user.role, id__gt=state.read_up_to)
+        .order_by('id')
+        .values_list('id', flat=True)[:len(read_ids) + 1]
+    )
+    for broadcast_id in following:
+        if broadcast_id not in read_ids:
+            break
+        state.read_up_to = broadcast_id
+        read_ids.discard(broadcast_id)
+    state.read_ids = sorted(i for i in read_ids if i > state.read_up_to)
+
+
+def _locked_state(user):
+    state, _ = BroadcastReadState.objects.select_for_update().get_or_create(user=user)
+    return state
+
+
+def _record_read(user, broadcast_ids):
+    # отметка о прочтении личная: видна только самому пользователю
+    record_changes(Entity.BROADCAST, ((i, user.id, None) for i in broadcast_ids), hr_visible=False)
+
+
+def mark_read(user: User, broadcast_ids):
+    """Отмечает прочитанными broadcast из списка; возвращает id, которые были непрочитанными."""
+    broadcast_ids = set(broadcast_ids)
+    if not broadcast_ids:
+        return []
+    with transaction.atomic():
+        state = _locked_state(user)
+        newly_read = sorted(
+            unread_broadcasts(user, state).filter(id__in=broadcast_ids).values_list('id', flat=True)
+        )
+        if newly_read:
+            state.read_ids = state.read_ids + newly_read
+            _compact(user, state)
+            state.save(update_fields=['read_up_to', 'read_ids'])
+    user.broadcast_read_state = state
+    _record_read(user, newly_read)
+    return newly_read
+
+
+def mark_read_up_to(user: User, up_to=None):
+    """
+    Отмечает прочитанными все broadcast с id <= up_to (None - все видимые).
+    Сводится к сдвигу read_up_to; возвращает id, которые были непрочитанными.
+    """
+    with transaction.atomic():
+        state = _locked_state(user)
+        unread = unread_broadcasts(user, state)
+        if up_to is not None:
+            unread = unread.filter(id__lte=up_to)
+        newly_read = list(unread.values_list('id', flat=True))
+        if newly_read:
+            state.read_up_to = max(state.read_up_to, up_to if up_to is not None else max(newly_read))
+            state.read_ids = [i for i in state.read_ids if i > state.read_up_to]
+            _compact(user, state)
+            state.save(update_fields=['read_up_to', 'read_ids'])
+    user.broadcast_read_state = state
+    _record_read(user, newly_read)
+    return newly_read
+
+
+def record_broadcasts(rows, action=Action.UPSERT):
+    """Журнал: rows - итерируемое из (broadcast_id, role).
+
+    Broadcast для роли HR попадает в зону HR. У журнала нет зоны "вся роль"
+    для сотрудников и менеджеров, поэтому live-обновления приходят только
+    для broadcast-уведомлений HR.
+    """
+    record_changes(
+        Entity.BROADCAST,
+        ((broadcast_id, None, None) for broadcast_id, role in rows if role == User.Roles.HR),
+        action,
+        hr_visible=True,
+    )
+
+
+def last_id():
+    return BroadcastNotification.objects.aggregate(last=Max('id'))['last'] or 0
@@ -0,0 +1,110 @@
+"""
+Запись и чтение журнала изменений (ChangeLogEntry).
+
+Версия данных - id последней записи журнала в зоне видимости пользователя.
+Вопрос "изменилось ли что-нибудь с версии N" сводится к поиску максимального
+id по индексу (scope_user, id) / (scope_manager, id) / (hr_visible, id),
+сколько бы ни было заявок, уведомлений и пользователей.
+"""
+from django.db.models import Max, Q
+
+from .models import ChangeLogEntry, User
+
+Entity = ChangeLogEntry.Entity
+Action = ChangeLogEntry.Action
+
+
+def _entry(entity, entity_id, owner_id, manager_id, action, hr_visible):
+    return ChangeLogEntry(
+        entity=entity,
+        entity_id=entity_id,
+        action=action,
+        scope_user=owner_id,
+        scope_manager=manager_id,
+        hr_visible=hr_visible,
+    )
+
+
+def record_change(entity, entity_id, owner: User, action=Action.UPSERT, hr_visible=True):
+    """Записывает изменение сущности, принадлежащей owner (видно ему, его менеджеру и HR)."""
+    _entry(entity, entity_id, owner.id, owner.manager_id, action, hr_visible).save()
+
+
+def record_changes(entity, rows, action=Action.UPSERT, hr_visible=True):
+    """Пакетная запись: rows - итерируемое из (entity_id, owner_id, manager_id)."""
+    entries = [
+        _entry(entity, entity_id, owner_id, manager_id, action, hr_visible)
+        for entity_id, owner_id, manager_id in rows
+    ]
+    if entries:
+        ChangeLogEntry.objects.bulk_create(entries)
+
+
+def record_notification(notification_id, recipient_id, action=Action.UPSERT):
+    """Уведомления личные: видны только получателю."""
+    _entry(Entity.NOTIFICATION, notification_id, recipient_id, None, action, False).save()
+
+
+def record_notifications(rows, action=Action.UPSERT):
+    """Пакетная запись уведомлений: rows - итерируемое из (notification_id, recipient_id)."""
+    record_changes(
+        Entity.NOTIFICATION,
+        ((notification_id, recipient_id, None) for notification_id, recipient_id in rows),
+        action,
+        hr_visible=False,
+    )
+
+
+def _max_version(qs):
+    return qs.aggregate(version=Max('id'))['version'] or 0
+
+
+def hr_version() -> int:
+    """Последняя версия данных в зоне HR (общая для всех кадровиков)."""
+    return _max_version(ChangeLogEntry.objects.filter(hr_visible=True))
+
+
+def latest_version(user: User) -> int:
+    """Последняя версия данных, видимых пользователю (0 - изменений ещё не было)."""
+    role = getattr(user, 'role', None)
+    version = _max_version(ChangeLogEntry.objects.filter(scope_user=user.id))
+    if role == User.Roles.MANAGER:
+        version = max(version, _max_version(ChangeLogEntry.objects.filter(scope_manager=user.id)))
+    elif role == User.Roles.HR:
+        version = max(version, hr_version())
+    return version
+
+
+def visible_entries(user: User):
+    """Записи журнала в зоне видимости пользователя."""
+    role = getattr(user, 'role', None)
+    condition = Q(scope_user=user.id)
+    if role == User.Roles.MANAGER:
+        condition |= Q(scope_manager=user.id)
+    elif role == User.Roles.HR:
+        condition |= Q(hr_visible=True)
+    return ChangeLogEntry.objects.filter(condition)
+
+
+def collapse_entries(entries):
+    """
+    Сворачивает записи (entity, entity_id, action, scope_user) до последнего
+    действия по каждой сущности.
+
+    Возвращает {entity: {'upsert': set(ids), 'delete': set(ids)}} и множество
+    владельцев изменённых заявок (их балансы тоже пересчитались).
+    """
+    latest = {}
+    request_owners = set()
+    for entity, entity_id, action, owner_id in entries:
+        latest[(entity, entity_id)] = action
+        if entity == Entity.REQUEST and owner_id:
+            request_owners.add(owner_id)
+    collapsed = {entity: {Action.UPSERT: set(), Action.DELETE: set()} for entity in Entity.values}
+    for (entity, entity_id), action in latest.items():
+        collapsed[entity][action].add(entity_id)
+    return collapsed, request_owners
+
+
+def global_version() -> int:
+    return _max_version(ChangeLogEntry.objects.all())
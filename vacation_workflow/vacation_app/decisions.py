@@ -0,0 +1,141 @@
+"""
+Пакетное согласование и отклонение заявок менеджером.
+
+Вместо чтения, UPDATE и уведомления на каждую заявку:
+
+* заявки читаются одним запросом, он же проверяет, что сотрудник - из
+  команды менеджера;
+* итоги балансов меняются одним условным UPDATE на баланс
+  (ledger.apply_many);
+* статусы пишутся одним UPDATE с CASE по статусу;
+* уведомления и записи журнала - пакетными вставками, строки графика HR -
+  одним schedule_store.sync_requests (UPDATE по queryset сигналы не шлёт).
+
+Всё в одной транзакции. Её первая запись - пустой UPDATE заявок пачки
+(как ledger.lock_unchanged): он блокирует их строки до чтения, поэтому
+параллельное решение, правка или удаление той же заявки не может
+вклиниться между чтением статуса и записью - select_for_update, который
+работает и на SQLite. Статусы, прочитанные после блокировки, - текущие,
+и баланс меняется только по заявкам, которые действительно меняют статус.
+
+Результат - по каждой заявке в порядке запроса:
+APPROVED/REJECTED, UNCHANGED (статус уже такой - без записи и повторного
+уведомления), NOT_FOUND (нет заявки или она не из команды) или
+INSUFFICIENT_DAYS (согласование превысило бы остаток - заявка не тронута).
+"""
+from collections import Counter
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import Case, CharField, F, Value, When
+from django.utils import timezone
+
+from . import ledger, schedule_store, unread
+from .changes import Entity, record_changes, record_notifications
+from .models import Notification, User, VacationRequest
+from .notification_texts import TEMPLATE_VERSION, render_message
+
+# заявок в одном запросе: столько id уходит в IN (...) и строк в bulk_create
+MAX_DECISIONS = 500
+
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+INSUFFICIENT_DAYS = 'insufficient_days'
+
+NOTIFICATION_TYPES = {
+    VacationRequest.Status.APPROVED: Notification.Type.REQUEST_APPROVED,
+    VacationRequest.Status.REJECTED: Notification.Type.REQUEST_REJECTED,
+}
+
+
+@dataclass(frozen=True)
+class Outcome:
+    """Итог по одной заявке; request - заявка после решения (кроме NOT_FOUND)."""
+    request_id: int
+    result: str
+    request: VacationRequest = None
+    error: ledger.InsufficientVacationDays = None
+
+
+def decide(manager: User, decisions):
+    """
+    decisions - [(request_id, status)] с различными id, status - APPROVED
+    или REJECTED. Возвращает список Outcome в том же порядке.
+    """
+    request_ids = [request_id for request_id, _ in decisions]
+    with transaction.atomic():
+        team_requests = VacationRequest.objects.filter(user__manager=manager, id__in=request_ids)
+        team_requests.update(status=F('status'))
+        found = team_requests.select_related('user').in_bulk()
+
+        changes = []
+        unchanged = set()
+        for request_id, status in decisions:
+            request_obj = found.get(request_id)
+            if request_obj is None:
+                continue
+            if request_obj.status == status:
+                unchanged.add(request_id)
+                continue
+            old_status = request_obj.status
+            old_state = ledger.state_of(request_obj)
+            request_obj.status = status
+            changes.append((request_obj, old_status, old_state, ledger.state_of(request_obj)))
+
+        failed = ledger.apply_many(
+            (request_obj.id, old_state, new_state)
+            for request_obj, _, old_state, new_state in changes
+        )
+        decided = []
+        for request_obj, old_status, _, _ in changes:
+            if request_obj.id in failed:
+                request_obj.status = old_status
+            else:
+                decided.append(request_obj)
+        if decided:
+            _save(decided)
+
+    return [
+        _outcome(request_id, status, found.get(request_id), failed.get(request_id), request_id in unchanged)
+        for request_id, status in decisions
+    ]
+
+
+def _save(decided):
+    now = timezone.now()
+    by_status = {}
+    for request_obj in decided:
+        request_obj.updated_at = now
+        by_status.setdefault(request_obj.status, []).append(request_obj.id)
+    VacationRequest.objects.filter(id__in=[r.id for r in decided]).update(
+        status=Case(
+            *[When(id__in=ids, then=Value(status)) for status, ids in by_status.items()],
+            output_field=CharField(),
+        ),
+        updated_at=now,
+    )
+    schedule_store.sync_requests(r.id for r in decided)
+
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            user_id=request_obj.user_id,
+            type=NOTIFICATION_TYPES[request_obj.status],
+            request=request_obj,
+            message=render_message(NOTIFICATION_TYPES[request_obj.status], request_obj, request_obj.user_id),
+            message_version=TEMPLATE_VERSION,
+        )
+        for request_obj in decided
+    ])
+    record_notifications((n.id, n.user_id) for n in notifications)
+    unread.increment(Counter(r.user_id for r in decided))
+    record_changes(Entity.REQUEST, ((r.id, r.user_id, r.user.manager_id) for r in decided))
+
+
+def _outcome(request_id, status, request_obj, error, unchanged):
+    if request_obj is None:
+        return Outcome(request_id, NOT_FOUND)
+    if error is not None:
+        return Outcome(request_id, INSUFFICIENT_DAYS, request_obj, error)
+    if unchanged:
+        return Outcome(request_id, UNCHANGED, request_obj)
+    return Outcome(request_id, status, request_obj)
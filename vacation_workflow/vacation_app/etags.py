@@ -0,0 +1,59 @@
+"""
+ETag для GET-эндпоинтов чтения (условные запросы If-None-Match -> 304).
+
+Тег строится не по телу ответа, а по версии данных: для списков заявок,
+балансов и графика - версия зоны видимости пользователя в журнале
+изменений (та же, что у кэша ответов, response_cache.py), для уведомлений -
+личная версия (прочтение и архивация тоже пишут журнал) плюс версия шаблонов
+текстов, для счётчика непрочитанных - сам счётчик из профиля. Поэтому
+304 отдаётся после одного-двух запросов по индексу, без запросов
+сериализации.
+
+В тег входят id и роль пользователя (ответ зависит от зоны) и текущая
+дата (без ?year вьюхи берут текущий год).
+"""
+from datetime import date
+from functools import wraps
+
+from django.views.decorators.http import condition
+
+from . import notification_texts
+from .changes import latest_version
+from .response_cache import request_version
+
+
+def _tag(kind, user, *parts):
+    return '.'.join(str(part) for part in (kind, user.id, user.role, date.today().strftime('%Y%m%d'), *parts))
+
+
+def data_etag(request, *args, **kwargs):
+    return _tag('d', request.user, request_version(request))
+
+
+def notifications_etag(request, *args, **kwargs):
+    user = request.user
+    return _tag('n', user, latest_version(user), notification_texts.TEMPLATE_VERSION)
+
+
+def unread_etag(request, *args, **kwargs):
+    # счётчик уже загружен вместе с пользователем сессии - ни одного запроса
+    return _tag('u', request.user, request.user.unread_notifications)
+
+
+def etag(etag_func):
+    """
+    condition(etag_func=...) для GET-вьюхи под login_required.
+
+    Ответы помечаются Cache-Control: private, no-cache - браузер и прокси
+    не отдают их без перепроверки тега.
+    """
+    def decorator(view):
+        conditional = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
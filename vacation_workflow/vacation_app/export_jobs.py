@@ -0,0 +1,243 @@
+"""
+Фоновые выгрузки HR (ExportJob).
+
+Запрос только ставит задание в очередь (enqueue); файл пишет воркер -
+команда run_export_jobs - в каталог settings.EXPORT_JOBS_DIR, по ходу
+обновляя прогресс (rows_done из rows_total). Готовый файл отдаётся
+отдельным эндпоинтом, так что долгая выгрузка не держит запрос.
+
+Задание с теми же параметрами (kind, year, manager_id) переиспользуется,
+пока версия данных HR в журнале изменений не сдвинулась: свежий файл
+не пересчитывается, а незавершённое задание не дублируется - в том числе
+при параллельных постановках (уникальное ограничение на активные задания).
+
+Пока задание в работе, воркер раз в HEARTBEAT_SECONDS (и с каждым
+обновлением прогресса) отмечает heartbeat_at. В очередь возвращаются только
+задания без свежей отметки - долгая, но живая выгрузка не запускается
+второй раз. Воркер, у которого задание забрали, замечает это на следующей
+отметке и бросает его, не трогая чужой результат.
+"""
+import os
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import exports, schedule_store
+from .changes import hr_version
+from .models import ExportJob, VacationRequest
+
+Kind = ExportJob.Kind
+Status = ExportJob.Status
+
+# через сколько строк обновлять прогресс в БД
+PROGRESS_EVERY = 5000
+# отметка жизни задания не реже раза в столько секунд
+HEARTBEAT_SECONDS = 30
+
+CONTENT_TYPES = {
+    Kind.REQUESTS_CSV: 'text/csv',
+    Kind.SCHEDULE_CSV: 'text/csv',
+    Kind.SCHEDULE_PRINT: 'text/html; charset=utf-8',
+}
+
+
+def jobs_dir() -> Path:
+    return Path(settings.EXPORT_JOBS_DIR)
+
+
+def artifact_path(job: ExportJob) -> Path:
+    return jobs_dir() / f'{job.id}-{job.file_name}'
+
+
+def download_name(kind, year, manager_id):
+    if kind == Kind.REQUESTS_CSV:
+        return 'vacation_approved.csv'
+    suffix = f'_manager_{manager_id}' if manager_id else ''
+    extension = 'html' if kind == Kind.SCHEDULE_PRINT else 'csv'
+    return f'vacation_schedule_{year}{suffix}.{extension}'
+
+
+def enqueue(kind, year=None, manager_id=None, requested_by=None):
+    """Ставит выгрузку в очередь; возвращает (задание, создано ли новое)."""
+    if kind == Kind.REQUESTS_CSV:
+        # выгрузка заявок не зависит от года и подразделения
+        year = manager_id = None
+    version = hr_version()
+    candidates = ExportJob.objects.filter(
+        kind=kind,
+        year=year,
+        manager_id=manager_id,
+        data_version=version,
+        status__in=[Status.QUEUED, Status.RUNNING, Status.DONE],
+    ).order_by('-id')
+    job = candidates.first()
+    if job is not None and (job.status != Status.DONE or artifact_path(job).exists()):
+        return job, False
+    try:
+        with transaction.atomic():
+            job = ExportJob.objects.create(
+                kind=kind,
+                year=year,
+                manager_id=manager_id,
+                data_version=version,
+                requested_by=requested_by,
+                file_name=download_name(kind, year, manager_id),
+            )
+    except IntegrityError:
+        # параллельный запрос успел поставить такое же задание
+        return candidates.first(), False
+    return job, True
+
+
+def claim_next():
+    """Забирает следующее задание из очереди (условный UPDATE - безопасно для нескольких воркеров)."""
+    while True:
+        job_id = (
+            ExportJob.objects.filter(status=Status.QUEUED)
+            .order_by('id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        now = timezone.now()
+        claimed = ExportJob.objects.filter(id=job_id, status=Status.QUEUED).update(
+            status=Status.RUNNING,
+            started_at=now,
+            heartbeat_at=now,
+        )
+        if claimed:
+            return ExportJob.objects.get(id=job_id)
+
+
+def requeue_stale(heartbeat_before):
+    """Возвращает в очередь задания в running без отметки жизни с heartbeat_before (воркер упал)."""
+    return ExportJob.objects.filter(status=Status.RUNNING).filter(
+        Q(heartbeat_at__lt=heartbeat_before)
+        # задания, взятые до появления отметок
+        | Q(heartbeat_at__isnull=True, started_at__lt=heartbeat_before)
+    ).update(
+        status=Status.QUEUED,
+        rows_done=0,
+        heartbeat_at=None,
+    )
+
+
+class JobLost(Exception):
+    """Задание вернули в очередь, пока воркер его писал; теперь оно у другого воркера."""
+
+
+def _owned(job):
+    # повторный захват задаёт новый started_at, так что чужой захват не совпадёт
+    return ExportJob.objects.filter(id=job.id, status=Status.RUNNING, started_at=job.started_at)
+
+
+class _Progress:
+    def __init__(self, job):
+        self.job = job
+        self.done = 0
+        self._beat_at = time.monotonic()
+
+    def add(self, rows):
+        before = self.done
+        self.done += rows
+        if (
+            self.done // PROGRESS_EVERY != before // PROGRESS_EVERY
+            or time.monotonic() - self._beat_at >= HEARTBEAT_SECONDS
+        ):
+            self.beat(rows_done=self.done)
+
+    def beat(self, **fields):
+        """Отметка жизни (вместе с полями прогресса); JobLost - задание уже не наше."""
+        alive = _owned(self.job).update(heartbeat_at=timezone.now(), **fields)
+        self._beat_at = time.monotonic()
+        if not alive:
+            raise JobLost(self.job.id)
+
+    def rows(self, iterable):
+        for row in iterable:
+            self.add(1)
+            yield row
+
+    def entries(self, iterable):
+        for employee, periods in iterable:
+            self.add(len(periods))
+            yield employee, periods
+
+
+def _rows_total(job):
+    if job.kind == Kind.REQUESTS_CSV:
+        return VacationRequest.objects.filter(status=VacationRequest.Status.APPROVED).count()
+    return schedule_store.count(job.year, job.manager_id)
+
+
+def _chunks(job, progress):
+    if job.kind == Kind.REQUESTS_CSV:
+        return exports.csv_chunks(exports.REQUESTS_HEADER, progress.rows(exports.approved_request_rows()))
+    if job.kind == Kind.SCHEDULE_CSV:
+        rows = (
+            row
+            for employee, periods in progress.entries(schedule_store.entries(job.year, job.manager_id))
+            for row in exports.schedule_entry_rows(employee, periods)
+        )
+        return exports.csv_chunks(exports.SCHEDULE_HEADER, rows)
+    return exports.schedule_print_chunks(job.year, job.manager_id, on_rows=progress.add)
+
+
+def run(job: ExportJob):
+    """
+    Пишет файл задания (сначала во временный, затем переименовывает); ошибку
+    сохраняет в job.error. Задание, которое за время работы вернули в
+    очередь, бросается: возвращается его текущее состояние из БД.
+    """
+    path = artifact_path(job)
+    # временный файл свой у каждого захвата: брошенный воркер не пишет в чужой
+    partial = path.with_name(f'{path.name}.{uuid.uuid4().hex}.part')
+    progress = _Progress(job)
+    try:
+        jobs_dir().mkdir(parents=True, exist_ok=True)
+        job.rows_total = _rows_total(job)
+        progress.beat(rows_total=job.rows_total)
+        with open(partial, 'w', encoding='utf-8', newline='') as artifact:
+            for chunk in _chunks(job, progress):
+                artifact.write(chunk)
+        progress.beat()
+        os.replace(partial, path)
+    except JobLost:
+        partial.unlink(missing_ok=True)
+        job.refresh_from_db()
+        return job
+    except Exception as exc:
+        partial.unlink(missing_ok=True)
+        job.status = Status.FAILED
+        job.error = str(exc) or exc.__class__.__name__
+    else:
+        job.status = Status.DONE
+        job.file_size = path.stat().st_size
+    job.rows_done = progress.done
+    job.finished_at = timezone.now()
+    _owned(job).update(
+        status=job.status,
+        error=job.error,
+        rows_done=job.rows_done,
+        rows_total=job.rows_total,
+        file_size=job.file_size,
+        finished_at=job.finished_at,
+    )
+    return job
+
+
+def purge(older_than):
+    """Удаляет задания (и их файлы), завершённые раньше older_than; возвращает число заданий."""
+    old = ExportJob.objects.filter(status__in=[Status.DONE, Status.FAILED], finished_at__lt=older_than)
+    count = 0
+    for job in old.iterator():
+        artifact_path(job).unlink(missing_ok=True)
+        job.delete()
+        count += 1
+    return count
@@ -0,0 +1,216 @@
+"""
+Потоковые выгрузки HR: CSV и печатная версия графика.
+
+Строки читаются из БД пачками (QuerySet.iterator) и уходят клиенту
+кусками по FLUSH_BYTES по мере формирования: память не зависит от размера
+выгрузки, а заголовок CSV отправляется до первого запроса к БД.
+
+Печатный график собирается из HTML-строк сотрудников, закэшированных
+по (год, сотрудник) в schedule_store; заново рендерятся только строки
+сотрудников, чей график или имя поменялись.
+"""
+import csv
+import io
+from itertools import chain, islice
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.html import escape
+
+from . import schedule_store
+from .models import User, VacationRequest
+
+# строк, забираемых из курсора БД за раз
+CHUNK_ROWS = 2000
+# размер куска ответа
+FLUSH_BYTES = 64 * 1024
+# сотрудников печатного графика за один проход по кэшу фрагментов
+PRINT_BATCH = 200
+
+REQUESTS_HEADER = ['ID', 'Employee', 'Start Date', 'End Date', 'Status', 'Created At', 'Confirmed']
+SCHEDULE_HEADER = [
+    'Сотрудник (логин)', 'ФИО', 'Менеджер', 'Начало отпуска',
+    'Конец отпуска', 'Дней', 'Подтверждено сотрудником',
+]
+
+
+def csv_chunks(header, rows):
+    """Заголовок отдельным куском (сразу), дальше строки кусками примерно по FLUSH_BYTES."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def _async_chunks(chunks):
+    # под ASGI синхронный итератор StreamingHttpResponse целиком собирается
+    # в память; отдаём куски по одному, чтение БД остаётся в потоке запроса
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def streaming_response(request, chunks, content_type):
+    content = _async_chunks(chunks) if isinstance(request, ASGIRequest) else chunks
+    return StreamingHttpResponse(content, content_type=content_type)
+
+
+def streaming_csv_response(request, filename, chunks):
+    response = streaming_response(request, chunks, 'text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def approved_request_rows():
+    """Строки выгрузки согласованных заявок (hr_export) по дате начала."""
+    # порядок индекса (status, start_date): строки идут без сортировки всей выборки
+    return (
+        VacationRequest.objects
+        .filter(status=VacationRequest.Status.APPROVED)
+        .order_by('start_date', 'id')
+        .values_list('id', 'user__username', 'start_date', 'end_date', 'status', 'created_at', 'confirmed_by_employee')
+        .iterator(chunk_size=CHUNK_ROWS)
+    )
+
+
+def schedule_entry_rows(employee, periods):
+    """Строки CSV графика для одного сотрудника."""
+    for period in periods:
+        yield [
+            employee['username'],
+            employee['full_name'],
+            employee['manager_name'],
+            period['start_date'].isoformat(),
+            period['end_date'].isoformat(),
+            period['days'],
+            "Да" if period['confirmed_by_employee'] else "Нет",
+        ]
+
+
+def schedule_rows(year, manager_id=None):
+    """Строки CSV графика отпусков (hr_schedule_export) из материализованного графика."""
+    for employee, periods in schedule_store.entries(year, manager_id):
+        yield from schedule_entry_rows(employee, periods)
+
+
+def _print_manager_label(manager_id, first_employee):
+    if not manager_id:
+        return ""
+    if first_employee is not None:
+        # имя менеджера уже пришло с первой строкой графика подразделения
+        name = first_employee[1]
+    else:
+        manager = User.objects.filter(id=manager_id, role=User.Roles.MANAGER).first()
+        if not manager:
+            return ""
+        name = schedule_store.full_name(manager.username, manager.first_name, manager.last_name)
+    return f" • Подразделение: {name}"
+
+
+def _print_row(employee, periods):
+    period_chunks = []
+    for p in periods:
+        confirm_suffix = "" if p["confirmed_by_employee"] else " <span class=\"chip-sub\">без подтверждения</span>"
+        period_chunks.append(
+            f"<div class='chip'>{escape(p['start_date'].isoformat())} - {escape(p['end_date'].isoformat())}"
+            f" ({p['days']} дн.){confirm_suffix}</div>"
+        )
+    periods_html = "".join(period_chunks) or "<div class='muted'>Нет утверждённых периодов</div>"
+    return (
+        "<tr>"
+        f"<td><div class='user-name'>{escape(employee['full_name'])}</div>"
+        f"<div class='muted'>{escape(employee['username'])}</div>"
+        f"<div class='muted small'>{escape(employee['manager_name'])}</div></td>"
+        f"<td>{periods_html}</td>"
+        "</tr>"
+    )
+
+
+def _print_rows(year, versions):
+    """
+    HTML-строки сотрудников: versions - пары (user_id, версия из schedule_store.employees).
+    Фрагменты берутся из кэша, недостающие рендерятся из графика.
+    """
+    cache = schedule_store.fragment_cache()
+    keys = {user_id: schedule_store.fragment_key(year, user_id, version) for user_id, version in versions}
+    fragments = cache.get_many(list(keys.values()))
+    missing = [user_id for user_id, key in keys.items() if key not in fragments]
+    if missing:
+        # строки читаются после версии: фрагмент не старее своего ключа
+        fresh = {
+            keys[employee['user_id']]: _print_row(employee, periods)
+            for employee, periods in schedule_store.entries(year, user_ids=missing)
+        }
+        cache.set_many(fresh)
+        fragments.update(fresh)
+    # сотрудник мог пропасть из графика между чтениями - просто пропускаем
+    return ''.join(fragments.get(key, '') for key in keys.values())
+
+
+def schedule_print_chunks(year, manager_id=None, on_rows=None):
+    """
+    Печатная версия графика (hr_schedule_print): шапка, строки сотрудников, подвал.
+
+    Строки уходят пачками по PRINT_BATCH сотрудников; on_rows(n) получает
+    число периодов в каждой пачке (прогресс фоновой выгрузки).
+    """
+    employees = schedule_store.employees(year, manager_id)
+    first = next(employees, None)
+    yield f"""
+    <!doctype html>
+    <html>
+      <head>
+        <meta charset="utf-8" />
+        <title>График отпусков {year}</title>
+        <style>
+          body {{ font-family: Arial, sans-serif; margin: 24px; }}
+          h1 {{ margin-bottom: 4px; }}
+          .muted {{ color: #666; font-size: 12px; }}
+          .small {{ font-size: 11px; }}
+          table {{ width: 100%; border-collapse: collapse; margin-top: 12px; }}
+          th, td {{ border: 1px solid #ddd; padding: 8px; vertical-align: top; }}
+          th {{ background: #f7f7f7; text-align: left; }}
+          .chip {{ display: inline-block; padding: 4px 8px; background: #eef6ff; border: 1px solid #d3e5ff; border-radius: 12px; margin: 2px; }}
+          .chip-sub {{ color: #a94442; font-size: 11px; }}
+          .user-name {{ font-weight: 600; }}
+          @media print {{
+            button {{ display: none; }}
+            body {{ margin: 0; padding: 0; }}
+          }}
+        </style>
+      </head>
+      <body>
+        <h1>График отпусков на {year} год</h1>
+        <div class="muted">Только согласованные заявки{escape(_print_manager_label(manager_id, first))}</div>
+        <table>
+          <thead>
+            <tr><th>Сотрудник</th><th>Периоды</th></tr>
+          </thead>
+          <tbody>
+            """
+    employees = chain([first], employees) if first is not None else iter(())
+    while batch := list(islice(employees, PRINT_BATCH)):
+        yield _print_rows(year, [(user_id, version) for user_id, _, _, version in batch])
+        if on_rows is not None:
+            on_rows(sum(periods for _, _, periods, _ in batch))
+    yield """
+          </tbody>
+        </table>
+        <button onclick="window.print()">Печать</button>
+      </body>
+    </html>
+    """
@@ -0,0 +1,151 @@
+"""
+Тепловая карта отсутствий HR: сколько сотрудников каждого подразделения
+в отпуске в каждый день года.
+
+Периоды берутся из материализованного графика (ScheduleEntry) - согласованные
+заявки года плюс заявки прошлого года, заходящие на январь; одним проходом
+по индексу (year, end_date, manager_id, start_date), без чтения строк
+таблицы. Дальше без перебора дней каждого отпуска:
+
+* разностный массив на подразделение: +1 в день начала, -1 в день после
+  конца (периоды обрезаются границами года);
+* префиксная сумма по строке массива - число отсутствующих по дням.
+
+Итого O(N + D * 366), где N - периоды года, D - подразделения. С NumPy
+оба шага векторизуются (np.add.at и cumsum по оси дней); без него -
+тот же алгоритм на списках.
+
+Подразделение - менеджер сотрудника (как фильтр графика и hr_departments),
+сотрудники без менеджера - отдельной строкой с manager_id = None.
+Свои заявки сотрудника не пересекаются (coverage.own_overlap), поэтому
+число периодов в день равно числу отсутствующих.
+
+Готовая карта года лежит в кэше schedule_fragments под версией журнала
+изменений HR (changes.hr_version): согласование, перенос, отмена, смена
+менеджера пишут в журнал, и следующий запрос в любом процессе строит карту
+заново, а кэш ответов (response_cache) не получит старую карту под новой
+версией.
+"""
+from itertools import accumulate
+
+from django.db.models import F, Func, IntegerField, Q, Value
+
+from . import schedule_store
+from .changes import hr_version
+from .models import ScheduleEntry, User
+
+try:
+    import numpy as np
+except ImportError:  # NumPy - необязательная зависимость, есть чистый Python
+    np = None
+
+
+class _DaysSince(Func):
+    """Целое число дней между датами (SQLite: разность julianday двух дат точная)."""
+    arg_joiner = ') - julianday('
+    template = 'CAST(julianday(%(expressions)s) AS INTEGER)'
+    output_field = IntegerField()
+
+    def get_db_converters(self, connection):
+        # SQLite уже отдаёт int, поштучный конвертер Django на десятках тысяч строк не нужен
+        return []
+
+
+def _periods(year):
+    """Периоды года: тройки (manager_id, смещения начала и конца от 1 января)."""
+    first, _ = schedule_store.year_range(year)
+    since = Value(first.isoformat())
+    # смещения считает БД: разбор дат в Python дороже всего остального расчёта
+    return list(
+        ScheduleEntry.objects
+        .filter(Q(year=year) | Q(year=year - 1, end_date__gte=first))
+        .values_list('manager_id', _DaysSince(F('start_date'), since), _DaysSince(F('end_date'), since))
+    )
+
+
+def _counts_python(periods, days_in_year):
+    diffs = {}
+    for manager_id, start, end in periods:
+        diff = diffs.get(manager_id)
+        if diff is None:
+            diff = diffs[manager_id] = [0] * (days_in_year + 1)
+        diff[max(start, 0)] += 1
+        diff[min(end + 1, days_in_year)] -= 1
+    return {
+        manager_id: list(accumulate(diff[:days_in_year]))
+        for manager_id, diff in diffs.items()
+    }
+
+
+def _counts_numpy(periods, days_in_year):
+    if not periods:
+        return {}
+    # None (без менеджера) -> NaN -> 0: id пользователей начинаются с 1
+    managers, starts, ends = np.nan_to_num(np.array(periods, dtype=np.float64)).astype(np.int64).T
+    departments, rows = np.unique(managers, return_inverse=True)
+    diff = np.zeros((len(departments), days_in_year + 1), dtype=np.int32)
+    np.add.at(diff, (rows, np.clip(starts, 0, days_in_year)), 1)
+    np.add.at(diff, (rows, np.clip(ends + 1, 0, days_in_year)), -1)
+    counts = np.cumsum(diff[:, :days_in_year], axis=1)
+    return {
+        (int(manager_id) or None): row.tolist()
+        for manager_id, row in zip(departments, counts)
+    }
+
+
+def _departments(manager_ids):
+    """Подписи подразделений в порядке hr_departments (фамилия, имя), без менеджера - в конце."""
+    managers = (
+        User.objects
+        .filter(id__in=[m for m in manager_ids if m is not None])
+        .order_by('last_name', 'first_name', 'id')
+        .values_list('id', 'username', 'first_name', 'last_name')
+    )
+    labels = [(m_id, schedule_store.full_name(username, first, last)) for m_id, username, first, last in managers]
+    # менеджера могли удалить, а график ещё не пересобран - подписываем id
+    known = {m_id for m_id, _ in labels}
+    labels += [(m_id, f'#{m_id}') for m_id in sorted(m for m in manager_ids if m is not None and m not in known)]
+    if None in manager_ids:
+        labels.append((None, ''))
+    return labels
+
+
+def _build(year):
+    first, last = schedule_store.year_range(year)
+    days_in_year = (last - first).days + 1
+    periods = _periods(year)
+    counts = (_counts_numpy if np is not None else _counts_python)(periods, days_in_year)
+    total = [sum(day) for day in zip(*counts.values())] if counts else [0] * days_in_year
+    return {
+        'year': year,
+        'start_date': first.isoformat(),
+        'days': days_in_year,
+        'departments': [
+            {
+                'manager_id': manager_id,
+                'full_name': full_name,
+                'counts': counts[manager_id],
+                'peak': max(counts[manager_id]),
+            }
+            for manager_id, full_name in _departments(counts.keys())
+        ],
+        'total': total,
+    }
+
+
+def year_heatmap(year):
+    """
+    Отсутствующие по дням года: dict(year, start_date, days, departments, total).
+
+    departments - список dict(manager_id, full_name, counts, peak), где
+    counts[i] - число сотрудников подразделения в отпуске в день
+    1 января + i; total - то же по всей организации.
+    """
+    cache = schedule_store.fragment_cache()
+    # версия до чтения графика: карта не старее своего ключа
+    key = schedule_store.heatmap_key(year, hr_version())
+    result = cache.get(key)
+    if result is None:
+        result = _build(year)
+        cache.set(key, result)
+    return result
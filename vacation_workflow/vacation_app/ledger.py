@@ -0,0 +1,258 @@
+"""
+Учёт резерва дней отпуска по балансу (user, year).
+
+VacationBalance хранит накопленные итоги:
+
+* reserved_days - дни заявок на согласовании и согласованных, но ещё не
+  подтверждённых сотрудником;
+* consumed_days - дни согласованных и подтверждённых заявок.
+
+Доступно к новой заявке: days_remaining - reserved_days - consumed_days.
+Итоги меняются в той же транзакции, что и заявка, одним условным UPDATE:
+условие "хватает ли дней" проверяется самой БД в момент записи, поэтому
+параллельные заявки не могут вместе превысить остаток.
+
+Вклад заявки до изменения берётся из строки, прочитанной до транзакции;
+чтобы два параллельных перехода (отклонение и удаление, например) не
+вернули одни и те же дни дважды, переход начинается с lock_unchanged:
+строка блокируется, только если она всё ещё в прочитанном состоянии.
+Создание и перенос заявки проверяют пересечения со своими заявками под
+lock_balances - иначе две параллельные заявки на одни даты обе пройдут
+проверку.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from . import production_calendar
+from .models import VacationBalance, VacationRequest
+
+RESERVED = 'reserved'
+CONSUMED = 'consumed'
+
+
+class InsufficientVacationDays(Exception):
+    def __init__(self, year, available, requested):
+        super().__init__(f'Недостаточно дней отпуска на {year} год')
+        self.year = year
+        self.available = available
+        self.requested = requested
+
+
+@dataclass(frozen=True)
+class LedgerState:
+    """Вклад одной заявки в баланс."""
+    user_id: int
+    year: int
+    days: int
+    bucket: str
+
+    def amounts(self):
+        reserved = self.days if self.bucket == RESERVED else 0
+        consumed = self.days if self.bucket == CONSUMED else 0
+        return reserved, consumed
+
+
+def request_days(start_date, end_date) -> int:
+    """Рабочих дней в периоде заявки (включая обе даты) по производственному календарю."""
+    return production_calendar.working_days(start_date, end_date)
+
+
+def _bucket(status, confirmed):
+    if status == VacationRequest.Status.APPROVED and confirmed:
+        return CONSUMED
+    if status in (VacationRequest.Status.PENDING, VacationRequest.Status.APPROVED):
+        return RESERVED
+    return None
+
+
+def state_of(request_obj: VacationRequest):
+    """Текущий вклад заявки в баланс; None - заявка дни не занимает."""
+    bucket = _bucket(request_obj.status, request_obj.confirmed_by_employee)
+    if bucket is None:
+        return None
+    return LedgerState(
+        user_id=request_obj.user_id,
+        year=request_obj.start_date.year,
+        # дни, сохранённые с заявкой: вклад не меняется от правок календаря,
+        # пока replace_years не пересчитает их вместе с итогами
+        days=request_obj.days,
+        bucket=bucket,
+    )
+
+
+# поля заявки, от которых зависит её вклад в баланс
+STATE_FIELDS = ('status', 'confirmed_by_employee', 'start_date', 'end_date', 'days')
+
+
+def snapshot(request_obj: VacationRequest):
+    """Поля вклада заявки как они прочитаны из БД - условие для lock_unchanged."""
+    return {name: getattr(request_obj, name) for name in STATE_FIELDS}
+
+
+def lock_unchanged(request_id, read_state):
+    """
+    Вызывать первой записью внутри transaction.atomic(): блокирует строку
+    заявки (условный UPDATE без изменений), если она всё ещё в состоянии
+    read_state. False - заявку успели изменить или удалить, её вклад,
+    считанный до транзакции, устарел, и apply вызывать нельзя.
+    """
+    return VacationRequest.objects.filter(id=request_id, **read_state).update(status=F('status')) == 1
+
+
+def lock_balances(user_id):
+    """
+    Блокирует строки балансов сотрудника до конца транзакции - пустой UPDATE
+    (select_for_update, который на SQLite тоже берёт блокировку записи).
+    Под ней проверка пересечений и запись заявки не перемежаются с такими
+    же у параллельного запроса того же сотрудника. Вызывать внутри
+    transaction.atomic(), после lock_unchanged, если он есть.
+    """
+    VacationBalance.objects.filter(user_id=user_id).update(reserved_days=F('reserved_days'))
+
+
+def available_days(user_id, year) -> int:
+    balance = VacationBalance.objects.filter(user_id=user_id, year=year).first()
+    if balance is None:
+        return 0
+    return max(balance.days_remaining - balance.reserved_days - balance.consumed_days, 0)
+
+
+def _adjust(user_id, year, reserved_delta, consumed_delta):
+    if not reserved_delta and not consumed_delta:
+        return
+    increase = reserved_delta + consumed_delta
+    qs = VacationBalance.objects.filter(user_id=user_id, year=year)
+    if increase > 0:
+        # проверка остатка и запись - один атомарный UPDATE
+        qs = qs.filter(days_remaining__gte=F('reserved_days') + F('consumed_days') + increase)
+    updated = qs.update(
+        reserved_days=Greatest(F('reserved_days') + reserved_delta, 0),
+        consumed_days=Greatest(F('consumed_days') + consumed_delta, 0),
+    )
+    if not updated and increase > 0:
+        raise InsufficientVacationDays(year, available_days(user_id, year), increase)
+
+
+def apply(old: LedgerState = None, new: LedgerState = None):
+    """
+    Переносит вклад заявки из состояния old в new.
+
+    Вызывать внутри transaction.atomic() вместе с записью самой заявки:
+    при нехватке дней бросается InsufficientVacationDays и транзакция
+    откатывается целиком.
+    """
+    if old and new and (old.user_id, old.year) == (new.user_id, new.year):
+        old_reserved, old_consumed = old.amounts()
+        new_reserved, new_consumed = new.amounts()
+        _adjust(new.user_id, new.year, new_reserved - old_reserved, new_consumed - old_consumed)
+        return
+    if old:
+        reserved, consumed = old.amounts()
+        _adjust(old.user_id, old.year, -reserved, -consumed)
+    if new:
+        reserved, consumed = new.amounts()
+        _adjust(new.user_id, new.year, reserved, consumed)
+
+
+def _release(deltas_by_balance):
+    """Уменьшения итогов без проверки остатка: UPDATE на каждое различное (год, дельты)."""
+    by_delta = defaultdict(list)
+    for (user_id, year), (reserved_delta, consumed_delta) in deltas_by_balance.items():
+        if reserved_delta or consumed_delta:
+            by_delta[(year, reserved_delta, consumed_delta)].append(user_id)
+    for (year, reserved_delta, consumed_delta), user_ids in by_delta.items():
+        VacationBalance.objects.filter(user_id__in=user_ids, year=year).update(
+            reserved_days=Greatest(F('reserved_days') + reserved_delta, 0),
+            consumed_days=Greatest(F('consumed_days') + consumed_delta, 0),
+        )
+
+
+def apply_many(changes):
+    """
+    Пакетный apply: changes - [(ключ, old, new)], где old и new одной заявки
+    лежат на одном балансе (меняется только статус).
+
+    Вклады суммируются по балансу (user, year). Балансы, где итог не растёт,
+    меняются общими UPDATE по одинаковым дельтам (как unread.increment);
+    где растёт - условным UPDATE на баланс. Если дней не хватает на всё
+    сразу, уменьшения применяются одной суммой, а увеличения - по одному
+    в порядке changes, пока хватает. Возвращает {ключ: InsufficientVacationDays}
+    для непрошедших изменений. Вызывать внутри transaction.atomic().
+    """
+    by_balance = defaultdict(list)
+    for key, old, new in changes:
+        state = new or old
+        if state is None:
+            continue
+        old_reserved, old_consumed = old.amounts() if old else (0, 0)
+        new_reserved, new_consumed = new.amounts() if new else (0, 0)
+        by_balance[(state.user_id, state.year)].append(
+            (key, new_reserved - old_reserved, new_consumed - old_consumed)
+        )
+
+    def total(deltas):
+        return sum(d[1] for d in deltas), sum(d[2] for d in deltas)
+
+    releases = {}
+    growing_balances = {}
+    for balance, deltas in by_balance.items():
+        reserved_delta, consumed_delta = total(deltas)
+        if reserved_delta + consumed_delta > 0:
+            growing_balances[balance] = deltas
+        else:
+            releases[balance] = (reserved_delta, consumed_delta)
+    _release(releases)
+
+    failed = {}
+    for (user_id, year), deltas in growing_balances.items():
+        try:
+            _adjust(user_id, year, *total(deltas))
+            continue
+        except InsufficientVacationDays:
+            # условный UPDATE ничего не записал - раскладываем по заявкам
+            pass
+        _adjust(user_id, year, *total([d for d in deltas if d[1] + d[2] <= 0]))
+        for key, reserved_delta, consumed_delta in deltas:
+            if reserved_delta + consumed_delta <= 0:
+                continue
+            try:
+                _adjust(user_id, year, reserved_delta, consumed_delta)
+            except InsufficientVacationDays as exc:
+                failed[key] = exc
+    return failed
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    """Пересчитывает итоги с нуля по заявкам (восстановление и первичное заполнение)."""
+    requests = VacationRequest.objects.all()
+    balances = VacationBalance.objects.all()
+    if user_ids is not None:
+        requests = requests.filter(user_id__in=user_ids)
+        balances = balances.filter(user_id__in=user_ids)
+
+    totals = defaultdict(lambda: [0, 0])
+    for req in requests.only('user_id', 'start_date', 'days', 'status', 'confirmed_by_employee'):
+        state = state_of(req)
+        if state is None:
+            continue
+        reserved, consumed = state.amounts()
+        totals[(state.user_id, state.year)][0] += reserved
+        totals[(state.user_id, state.year)][1] += consumed
+
+    existing = {(b.user_id, b.year): b for b in balances}
+    to_update = []
+    for key, balance in existing.items():
+        balance.reserved_days, balance.consumed_days = totals.pop(key, (0, 0))
+        to_update.append(balance)
+    VacationBalance.objects.bulk_update(to_update, ['reserved_days', 'consumed_days'], batch_size=1000)
+    # заявки без строки баланса: заводим пустой баланс, чтобы резерв был виден
+    VacationBalance.objects.bulk_create([
+        VacationBalance(user_id=user_id, year=year, days_remaining=0, reserved_days=r, consumed_days=c)
+        for (user_id, year), (r, c) in totals.items()
+    ], batch_size=1000)
+    return len(to_update) + len(totals)
@@ -0,0 +1,317 @@
+"""
+Общая на процесс шина изменений для SSE-подписчиков.
+
+Вместо того чтобы каждое SSE-соединение само опрашивало БД, один фоновый
+поток на процесс раз в LIVE_POLL_INTERVAL секунд читает новые записи журнала
+изменений (ChangeLogEntry, один запрос по диапазону первичного ключа)
+и раскладывает события по подпискам. Подписка описывается набором "зон"
+(scopes), которые видит пользователь:
+
+* ('user', id)    - собственные заявки, уведомления и профиль;
+* ('manager', id) - заявки и профили подчинённых;
+* ('hr',)         - всё подряд.
+
+Для соединения стоимость ожидания - чтение из собственной очереди.
+Под ASGI подписка держит asyncio-очередь, и тысячи простаивающих
+соединений обслуживаются одним event loop без отдельного потока на каждое.
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .changes import global_version
+from .models import ChangeLogEntry, User
+
+logger = logging.getLogger(__name__)
+
+SCOPE_HR = ('hr',)
+
+
+def user_scope(user_id):
+    return ('user', user_id)
+
+
+def manager_scope(manager_id):
+    return ('manager', manager_id)
+
+
+def scopes_for_user(user):
+    """Набор зон, изменения в которых должен видеть пользователь."""
+    role = getattr(user, 'role', None)
+    scopes = {user_scope(user.id)}
+    if role == User.Roles.MANAGER:
+        scopes.add(manager_scope(user.id))
+    elif role == User.Roles.HR:
+        scopes.add(SCOPE_HR)
+    return scopes
+
+
+class Subscription:
+    """Очередь событий одного SSE-соединения."""
+
+    def __init__(self, scopes):
+        self.scopes = frozenset(scopes)
+        # события схлопываются: клиенту достаточно знать, что что-то поменялось
+        self._queue = queue.Queue(maxsize=1)
+
+    def notify(self, version):
+        try:
+            self._queue.put_nowait(version)
+        except queue.Full:
+            pass
+
+    def get(self, timeout=None):
+        """Ждёт следующего события; None - если за timeout ничего не пришло."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription:
+    """Подписка для асинхронного SSE: события доставляются в event loop соединения."""
+
+    def __init__(self, scopes, loop=None):
+        self.scopes = frozenset(scopes)
+        self._loop = loop or asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=1)
+
+    def notify(self, version):
+        # вызывается из потока шины, поэтому только через call_soon_threadsafe
+        try:
+            self._loop.call_soon_threadsafe(self._put, version)
+        except RuntimeError:
+            # event loop уже закрыт - соединение всё равно умирает
+            pass
+
+    def _put(self, version):
+        try:
+            self._queue.put_nowait(version)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class ChangeBus:
+    def __init__(self, interval=None):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # scope -> set[Subscription]
+        self._all = set()
+        self._thread = None
+        self._last_seen = None
+
+    def subscribe(self, scopes):
+        return self.add(Subscription(scopes))
+
+    def add(self, subscription):
+        with self._lock:
+            self._register(subscription)
+        return subscription
+
+    def try_subscribe(self, scopes):
+        return self.try_add(Subscription(scopes))
+
+    def try_add(self, subscription):
+        """
+        add с лимитом LIVE_SSE_MAX_CONNECTIONS: None - мест нет. Проверка и
+        регистрация под одной блокировкой, так что одновременные подключения
+        не проходят сверх лимита.
+        """
+        limit = getattr(settings, 'LIVE_SSE_MAX_CONNECTIONS', None)
+        with self._lock:
+            if limit and len(self._all) >= limit:
+                return None
+            self._register(subscription)
+        return subscription
+
+    def _register(self, subscription):
+        self._all.add(subscription)
+        for scope in subscription.scopes:
+            self._subscriptions.setdefault(scope, set()).add(subscription)
+        if self._last_seen is None:
+            # первая подписка фиксирует точку отсчёта, чтобы не потерять
+            # изменения до первого тика опроса
+            self._last_seen = global_version()
+        self._ensure_started()
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._all.discard(subscription)
+            for scope in subscription.scopes:
+                subs = self._subscriptions.get(scope)
+                if subs is None:
+                    continue
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscriptions[scope]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._all)
+
+    def publish(self, scopes, version):
+        with self._lock:
+            targets = set()
+            for scope in scopes:
+                targets.update(self._subscriptions.get(scope, ()))
+        for subscription in targets:
+            subscription.notify(version)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='live-change-bus', daemon=True)
+        self._thread.start()
+
+    def _get_interval(self):
+        if self.interval is not None:
+            return self.interval
+        return getattr(settings, 'LIVE_POLL_INTERVAL', 2)
+
+    def _run(self):
+        while True:
+            time.sleep(self._get_interval())
+            with self._lock:
+                idle = not self._subscriptions
+                if idle:
+                    # без подписчиков БД не трогаем, а при следующей подписке
+                    # начинаем отсчёт заново
+                    self._last_seen = None
+            if idle:
+                continue
+            try:
+                close_old_connections()
+                scopes, latest = self._poll()
+                if scopes:
+                    self.publish(scopes, latest)
+            except Exception:
+                logger.exception('Live change bus poll failed')
+
+    def _poll(self):
+        """Одна проверка на весь процесс: какие зоны затронуты с прошлой версии."""
+        since = self._last_seen
+        if since is None:
+            return set(), None
+        scopes = set()
+        latest = since
+
+        entries = (
+            ChangeLogEntry.objects
+            .filter(id__gt=since)
+            .order_by('id')
+            .values_list('id', 'scope_user', 'scope_manager', 'hr_visible')
+        )
+        for version, owner_id, manager_id, hr_visible in entries:
+            if owner_id:
+                scopes.add(user_scope(owner_id))
+            if manager_id:
+                scopes.add(manager_scope(manager_id))
+            if hr_visible:
+                scopes.add(SCOPE_HR)
+            latest = version
+
+        self._last_seen = latest
+        return scopes, latest
+
+
+change_bus = ChangeBus()
+
+
+def format_change_event(version):
+    payload = json.dumps({
+        "type": "change",
+        "version": version,
+    })
+    return f"event: change\ndata: {payload}\n\n"
+
+
+# комментарий-пинг держит соединение открытым и выявляет отвалившихся клиентов
+HEARTBEAT = ": ping\n\n"
+
+
+def _events(subscription, heartbeat):
+    try:
+        while True:
+            version = subscription.get(timeout=heartbeat)
+            yield HEARTBEAT if version is None else format_change_event(version)
+    finally:
+        change_bus.unsubscribe(subscription)
+
+
+async def _async_events(subscription, heartbeat):
+    try:
+        while True:
+            version = await subscription.get(timeout=heartbeat)
+            yield HEARTBEAT if version is None else format_change_event(version)
+    finally:
+        change_bus.unsubscribe(subscription)
+
+
+class _SubscribedStream:
+    """
+    Тело SSE-ответа поверх уже зарегистрированной подписки.
+
+    Подписка занимает место в лимите с момента открытия, поэтому снимается
+    и в close(): Django вызывает его при закрытии ответа, даже если поток
+    так и не начали читать (у генератора finally тогда не выполнится).
+    """
+
+    def __init__(self, subscription, events):
+        self._subscription = subscription
+        self._events = events
+
+    def close(self):
+        change_bus.unsubscribe(self._subscription)
+
+
+class EventStream(_SubscribedStream):
+    def __iter__(self):
+        return self._events
+
+
+class AsyncEventStream(_SubscribedStream):
+    def __aiter__(self):
+        return self._events
+
+
+def open_event_stream(scopes, heartbeat):
+    """Синхронный SSE-поток (WSGI): один поток на соединение, но без запросов к БД. None - лимит подключений исчерпан."""
+    subscription = change_bus.try_subscribe(scopes)
+    if subscription is None:
+        return None
+    return EventStream(subscription, _events(subscription, heartbeat))
+
+
+async def open_async_event_stream(scopes, heartbeat):
+    """Асинхронный SSE-поток (ASGI): соединение - это корутина в event loop.
+
+    None - лимит подключений исчерпан. При разрыве соединения ASGI-обработчик
+    отменяет стрим, и подписка снимается в finally.
+    """
+    # первая подписка может сходить в БД за точкой отсчёта
+    subscription = await sync_to_async(change_bus.try_add)(AsyncSubscription(scopes))
+    if subscription is None:
+        return None
+    return AsyncEventStream(subscription, _async_events(subscription, heartbeat))
+
+
+async def async_event_stream(scopes, heartbeat):
+    """Асинхронный поток без лимита подключений (замеры bench_live_sse)."""
+    subscription = AsyncSubscription(scopes)
+    await sync_to_async(change_bus.add)(subscription)
+    async for chunk in _async_events(subscription, heartbeat):
+        yield chunk
@@ -0,0 +1,14 @@
+"""Helpers shared by the bench_* commands."""
+import resource
+
+
+def current_rss_mb():
+    """Current RSS from /proc (Linux); falls back to peak RSS elsewhere."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
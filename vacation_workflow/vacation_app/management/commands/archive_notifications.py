@@ -0,0 +1,132 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from vacation_app.changes import Action, record_notifications
+from vacation_app.models import ArchivedNotification, Notification
+
+ARCHIVED_FIELDS = (
+    "id",
+    "user_id",
+    "type",
+    "request_id",
+    "remind_days",
+    "message",
+    "message_version",
+    "created_at",
+)
+
+
+class Command(BaseCommand):
+    """
+    Move read notifications older than --days into ArchivedNotification
+    (or delete them with --drop).
+
+    Rows are processed in batches of --batch-size, each in its own short
+    transaction, with an optional --pause between batches so that SQLite
+    writers (the app itself) are never locked out for long. Unread
+    notifications are never touched, so the unread counters stay valid.
+    Every batch records DELETE entries in the change journal in the same
+    transaction, so the recipients' ETags, cached responses and live
+    clients see the notifications leave the active list.
+    Archived items remain available through `GET /api/notifications?history=1`.
+    """
+
+    help = "Archive (or drop) read notifications older than N days in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="Only notifications created more than this many days ago (default: 90).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows moved per transaction (default: 500).",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.05,
+            help="Seconds to sleep between batches to let other writers in (default: 0.05).",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Delete old read notifications instead of archiving them.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Stop after this many rows (default: no limit).",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] < 0:
+            raise CommandError("--days must not be negative")
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be positive")
+
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        action = "Dropping" if options["drop"] else "Archiving"
+        self.stdout.write(self.style.NOTICE(
+            f"{action} read notifications created before {cutoff:%Y-%m-%d %H:%M}"
+        ))
+
+        old = Notification.objects.filter(is_read=True, created_at__lt=cutoff).order_by("id")
+        limit = options["limit"]
+        moved = 0
+        batches = 0
+        last_id = 0
+        started = time.perf_counter()
+        while limit is None or moved < limit:
+            size = options["batch_size"] if limit is None else min(options["batch_size"], limit - moved)
+            count, last_id = self._move_batch(old, last_id, size, options["drop"])
+            if not count:
+                break
+            moved += count
+            batches += 1
+            if options["pause"]:
+                time.sleep(options["pause"])
+        elapsed = time.perf_counter() - started
+
+        rate = moved / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. {'Dropped' if options['drop'] else 'Archived'} {moved} notifications "
+            f"in {batches} batches, {elapsed:.1f}s ({rate:.0f} rows/s)."
+        ))
+
+    def _move_batch(self, old, after_id, size, drop):
+        """One short transaction: copy (unless drop) and delete up to `size` rows."""
+        rows = list(old.filter(id__gt=after_id).values(*ARCHIVED_FIELDS)[:size])
+        if not rows:
+            return 0, after_id
+        ids = [row["id"] for row in rows]
+        gone = set()
+        # The transaction starts with a write: SQLite then waits for the write
+        # lock (busy timeout) instead of failing with "database is locked" when
+        # another writer commits between our read and our first write.
+        with transaction.atomic():
+            if not drop:
+                ArchivedNotification.objects.bulk_create(
+                    [ArchivedNotification(**row) for row in rows],
+                    ignore_conflicts=True,
+                )
+                # rows deleted meanwhile (e.g. together with their request)
+                gone = set(ids) - set(Notification.objects.filter(id__in=ids).values_list("id", flat=True))
+                if gone:
+                    ArchivedNotification.objects.filter(id__in=gone).delete()
+            Notification.objects.filter(id__in=ids).delete()
+            # with --drop rows deleted meanwhile get a second tombstone, which is harmless
+            record_notifications(
+                ((row["id"], row["user_id"]) for row in rows if row["id"] not in gone),
+                action=Action.DELETE,
+            )
+        return len(rows), ids[-1]
@@ -0,0 +1,135 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from vacation_app import production_calendar, schedule_store
+from vacation_app.models import User, VacationRequest
+
+from ._bench import current_rss_mb
+
+INSERT_BATCH = 5000
+
+
+class Command(BaseCommand):
+    """
+    Benchmark the streaming CSV exports on synthetic data.
+
+    Inside a transaction that is rolled back at the end, the command creates
+    --users employees with --rows approved vacation requests in total, then
+    calls `hr_export` and `hr_schedule_export` the way the server does and
+    consumes the streamed body. For every export it reports:
+
+    - time to the first byte (CSV header) and to the first data chunk;
+    - total time, size and throughput;
+    - resident memory growth while streaming (sampled on every chunk).
+    """
+
+    help = "Measure time-to-first-byte and peak RSS of the CSV exports on N synthetic rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=1_000_000,
+            help="Synthetic approved requests to export (default: 1000000).",
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=20_000,
+            help="Synthetic employees the requests are spread over (default: 20000).",
+        )
+
+    def handle(self, *args, **options):
+        rows, users = options["rows"], options["users"]
+        if rows <= 0 or users <= 0:
+            raise CommandError("--rows and --users must be positive")
+
+        year = date.today().year
+        with transaction.atomic():
+            started = time.perf_counter()
+            hr = self._create_data(rows, users, year)
+            self.stdout.write(self.style.NOTICE(
+                f"Created {rows} requests for {users} employees in {time.perf_counter() - started:.1f}s"
+            ))
+            # bulk_create bypasses the signals, so build the materialized schedule explicitly
+            started = time.perf_counter()
+            schedule_store.rebuild(years=[year])
+            self.stdout.write(self.style.NOTICE(
+                f"Rebuilt the {year} schedule in {time.perf_counter() - started:.1f}s"
+            ))
+            self.stdout.write(
+                f"{'export':>20} {'ttfb_ms':>8} {'first_rows_ms':>14} {'total_s':>8} "
+                f"{'mb':>8} {'rows/s':>9} {'rss_growth_mb':>14}"
+            )
+            self._measure(hr, "hr_export", {})
+            self._measure(hr, "hr_schedule_export", {"year": year})
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("Done. Synthetic data rolled back."))
+
+    def _create_data(self, rows, users, year):
+        hr = User.objects.create(username="bench_csv_hr", role=User.Roles.HR)
+        manager = User.objects.create(username="bench_csv_manager", role=User.Roles.MANAGER)
+        for offset in range(0, users, INSERT_BATCH):
+            User.objects.bulk_create([
+                User(
+                    username=f"bench_csv_{i}",
+                    last_name=f"Сотрудник{i:06d}",
+                    first_name="Бенч",
+                    manager=manager,
+                )
+                for i in range(offset, min(offset + INSERT_BATCH, users))
+            ])
+        user_ids = list(
+            User.objects.filter(username__startswith="bench_csv_", role=User.Roles.EMPLOYEE)
+            .values_list("id", flat=True)
+        )
+
+        first_day = date(year, 1, 1)
+        for offset in range(0, rows, INSERT_BATCH):
+            VacationRequest.objects.bulk_create([
+                VacationRequest(
+                    user_id=user_ids[i % len(user_ids)],
+                    start_date=first_day + timedelta(days=i % 360),
+                    end_date=first_day + timedelta(days=i % 360 + 4),
+                    # bulk_create bypasses the signal that counts working days
+                    days=production_calendar.working_days(
+                        first_day + timedelta(days=i % 360), first_day + timedelta(days=i % 360 + 4)
+                    ),
+                    status=VacationRequest.Status.APPROVED,
+                    confirmed_by_employee=bool(i % 2),
+                )
+                for i in range(offset, min(offset + INSERT_BATCH, rows))
+            ])
+        return hr
+
+    def _measure(self, hr, url_name, params):
+        path = reverse(url_name)
+        request = RequestFactory().get(path, params)
+        request.user = hr
+
+        baseline = peak = current_rss_mb()
+        started = time.perf_counter()
+        response = resolve(path).func(request)
+        ttfb = first_rows = None
+        size = lines = 0
+        for chunk in response.streaming_content:
+            now = time.perf_counter()
+            if ttfb is None:
+                ttfb = now - started
+            elif first_rows is None:
+                first_rows = now - started
+            size += len(chunk)
+            lines += chunk.count(b"\n")
+            peak = max(peak, current_rss_mb())
+        total = time.perf_counter() - started
+
+        data_rows = max(lines - 1, 0)
+        self.stdout.write(
+            f"{url_name:>20} {ttfb * 1000:>8.1f} {(first_rows or total) * 1000:>14.1f} {total:>8.1f} "
+            f"{size / 1024 / 1024:>8.1f} {data_rows / total:>9.0f} {peak - baseline:>14.1f}"
+        )
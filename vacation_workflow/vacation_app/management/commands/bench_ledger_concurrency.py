@@ -0,0 +1,258 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from vacation_app import ledger
+from vacation_app.models import User, VacationBalance, VacationRequest
+
+PREFIX = "bench_ledger_"
+# attempts per call when SQLite reports "database is locked" (writers collided)
+LOCK_RETRIES = 50
+TRANSITION_URLS = {
+    "approve": "manager_approve",
+    "reject": "manager_reject",
+    "delete": "delete_request",
+    "confirm": "confirm_request",
+}
+
+
+class Command(BaseCommand):
+    """
+    Stress the balance ledger with concurrent request writes.
+
+    Every round creates a fresh employee whose balance covers exactly
+    --capacity requests of five working days, plus --calls // 2 rejected
+    requests of the same length. Then --calls threads start at once: half
+    of them create a new request (`create_request`), the other half have
+    the manager approve one of the rejected requests (`manager_approve`).
+    Each call is a separate view call on its own database connection,
+    just like concurrent HTTP requests.
+
+    After each round the command checks that:
+
+    - reserved_days + consumed_days never exceeds days_remaining;
+    - exactly --capacity calls succeeded and every other call was refused
+      with "not enough days" (InsufficientVacationDays -> 400);
+    - reserved_days equals the days of the employee's active requests.
+
+    Then every request left active gets a reject (manager), a delete and a
+    confirm (employee) fired at once; each call must either succeed or be
+    refused with 400/404/409. The balance totals after this phase must equal
+    what `ledger.rebuild()` computes from the requests - a transition
+    applied twice would show up as a difference.
+
+    Any violation fails the command. The synthetic users are deleted at
+    the end; the change journal keeps their entries.
+    """
+
+    help = (
+        "Fire concurrent create/approve and reject/delete/confirm calls at one balance "
+        "and verify it is never overbooked or double-released."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--calls",
+            type=int,
+            default=24,
+            help="Concurrent calls per round, half creates and half approves (default: 24).",
+        )
+        parser.add_argument(
+            "--capacity",
+            type=int,
+            default=7,
+            help="Requests the balance can hold (default: 7).",
+        )
+        parser.add_argument("--rounds", type=int, default=5, help="Rounds to run (default: 5).")
+
+    def handle(self, *args, **options):
+        calls, capacity, rounds = options["calls"], options["capacity"], options["rounds"]
+        if calls < 2 or capacity < 0 or rounds <= 0:
+            raise CommandError("--calls must be at least 2, --capacity non-negative, --rounds positive")
+
+        year = date.today().year + 1
+        weeks = self._full_weeks(year)
+        # creates take the first weeks, the rejected requests the next ones
+        if len(weeks) < calls:
+            raise CommandError(f"{year} has only {len(weeks)} five-day weeks, lower --calls")
+
+        User.objects.filter(username__startswith=PREFIX).delete()
+        manager = User.objects.create(username=f"{PREFIX}manager", role=User.Roles.MANAGER)
+        failures = []
+        try:
+            self.stdout.write(
+                f"{'round':>5} {'ok':>4} {'refused':>7} {'errors':>6} {'lock_retries':>12} "
+                f"{'reserved':>8} {'allowance':>9} {'seconds':>8} {'transitions':>11} {'drift':>5}"
+            )
+            for round_no in range(1, rounds + 1):
+                failures += self._round(round_no, manager, year, weeks, calls, capacity)
+        finally:
+            User.objects.filter(username__startswith=PREFIX).delete()
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(failure)
+            raise CommandError(f"{len(failures)} check(s) failed")
+        expected = min(capacity, calls)
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {rounds} round(s), {expected} of {calls} calls accepted each time, balance never overbooked, "
+            "totals matched a rebuild after concurrent transitions."
+        ))
+
+    def _full_weeks(self, year):
+        monday = date(year, 1, 1) + timedelta(days=-date(year, 1, 1).weekday() % 7)
+        weeks = []
+        while monday.year == year:
+            friday = monday + timedelta(days=4)
+            if friday.year == year and ledger.request_days(monday, friday) == 5:
+                weeks.append((monday, friday))
+            monday += timedelta(days=7)
+        return weeks
+
+    def _round(self, round_no, manager, year, weeks, calls, capacity):
+        employee = User.objects.create(
+            username=f"{PREFIX}{round_no}", role=User.Roles.EMPLOYEE, manager=manager,
+        )
+        allowance = capacity * 5
+        VacationBalance.objects.create(user=employee, year=year, days_remaining=allowance)
+        creates = calls - calls // 2
+        rejected = [
+            VacationRequest.objects.create(
+                user=employee, start_date=start, end_date=end, status=VacationRequest.Status.REJECTED,
+            ).id
+            for start, end in weeks[creates:calls]
+        ]
+
+        jobs = [("create", employee, start, end) for start, end in weeks[:creates]]
+        jobs += [("approve", manager, pk, None) for pk in rejected]
+        started = time.perf_counter()
+        results, lock_retries = self._run_concurrently(jobs)
+        seconds = time.perf_counter() - started
+
+        balance = VacationBalance.objects.get(user=employee, year=year)
+        active_days = sum(
+            VacationRequest.objects
+            .filter(user=employee, status__in=[VacationRequest.Status.PENDING, VacationRequest.Status.APPROVED])
+            .values_list("days", flat=True)
+        )
+        ok, refused = results["ok"], results["refused"]
+        errors = sum(results.values()) - ok - refused
+        used = balance.reserved_days + balance.consumed_days
+        self.stdout.write(
+            f"{round_no:>5} {ok:>4} {refused:>7} {errors:>6} {lock_retries['total']:>12} "
+            f"{used:>8} {allowance:>9} {seconds:>8.2f}",
+            ending="",
+        )
+
+        failures = []
+        if used > balance.days_remaining:
+            failures.append(f"round {round_no}: overbooked, {used} days taken of {balance.days_remaining}")
+        expected = min(capacity, calls)
+        if ok != expected or refused != calls - expected or errors:
+            failures.append(
+                f"round {round_no}: expected {expected} accepted and {calls - expected} refused, "
+                f"got {dict(results)}"
+            )
+        if balance.reserved_days != active_days:
+            failures.append(
+                f"round {round_no}: reserved_days {balance.reserved_days} != {active_days} days of active requests"
+            )
+        return failures + self._transitions(round_no, manager, employee, year)
+
+    def _transitions(self, round_no, manager, employee, year):
+        """Reject, delete and confirm every active request at once, then compare with a rebuild."""
+        active = list(
+            VacationRequest.objects
+            .filter(user=employee, status__in=[VacationRequest.Status.PENDING, VacationRequest.Status.APPROVED])
+            .values_list("id", flat=True)
+        )
+        jobs = [("reject", manager, pk, None) for pk in active]
+        jobs += [(action, employee, pk, None) for pk in active for action in ("delete", "confirm")]
+        results, _ = self._run_concurrently(jobs)
+
+        balance = VacationBalance.objects.get(user=employee, year=year)
+        totals = (balance.reserved_days, balance.consumed_days)
+        ledger.rebuild(user_ids=[employee.id])
+        balance.refresh_from_db()
+        rebuilt = (balance.reserved_days, balance.consumed_days)
+        drift = sum(abs(a - b) for a, b in zip(totals, rebuilt))
+        self.stdout.write(f" {len(jobs):>11} {drift:>5}")
+
+        failures = []
+        unexpected = {
+            status: count for status, count in results.items()
+            if status not in ("ok", "refused", "http_404", "http_409")
+        }
+        if unexpected:
+            failures.append(f"round {round_no}: unexpected transition results {unexpected}")
+        if totals != rebuilt:
+            failures.append(
+                f"round {round_no}: reserved/consumed {totals} after transitions, rebuild gives {rebuilt}"
+            )
+        return failures
+
+    def _run_concurrently(self, jobs):
+        """Start all jobs behind one barrier; returns (Counter of results, Counter of lock retries)."""
+        jobs = list(jobs)
+        random.shuffle(jobs)
+        results = Counter()
+        lock_retries = Counter()
+        if not jobs:
+            return results, lock_retries
+        barrier = threading.Barrier(len(jobs))
+        results_lock = threading.Lock()
+
+        def worker(job):
+            try:
+                barrier.wait()
+                try:
+                    status, retries = self._call(*job)
+                except Exception as exc:
+                    status, retries = type(exc).__name__, 0
+                with results_lock:
+                    results[status] += 1
+                    lock_retries["total"] += retries
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(job,)) for job in jobs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, lock_retries
+
+    def _call(self, action, user, first, second):
+        if action == "create":
+            path = reverse("create_request")
+            body = json.dumps({"start_date": first.isoformat(), "end_date": second.isoformat()})
+            accepted = 201
+        else:
+            path = reverse(TRANSITION_URLS[action], args=[first])
+            body = ""
+            accepted = 200
+        for attempt in range(LOCK_RETRIES):
+            request = RequestFactory().post(path, body, content_type="application/json")
+            request.user = user
+            try:
+                match = resolve(path)
+                response = match.func(request, *match.args, **match.kwargs)
+            except OperationalError as exc:
+                if "locked" not in str(exc):
+                    raise
+                time.sleep(random.uniform(0.001, 0.01))
+                continue
+            if response.status_code == accepted:
+                return "ok", attempt
+            if response.status_code == 400 and "overlapping_request" not in json.loads(response.content):
+                return "refused", attempt
+            return f"http_{response.status_code}", attempt
+        return "locked", LOCK_RETRIES
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vacation_app.live import async_event_stream, change_bus, user_scope
+
+from ._bench import current_rss_mb
+
+
+class Command(BaseCommand):
+    """
+    Benchmark idle async SSE subscribers on the shared change bus.
+
+    For each requested connection count the command opens that many
+    `async_event_stream` consumers inside one event loop (exactly what the
+    ASGI `live_sse_async` view serves), lets them idle and reports:
+
+    - resident memory of the process;
+    - CPU seconds burnt while idling;
+    - time to fan one change event out to every subscriber.
+    """
+
+    help = "Measure memory/CPU of N idle async SSE subscribers (connection count vs RSS/CPU)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--connections",
+            default="100,1000,5000",
+            help="Comma-separated subscriber counts to measure (default: 100,1000,5000).",
+        )
+        parser.add_argument(
+            "--idle",
+            type=float,
+            default=5.0,
+            help="Seconds to idle at each level while sampling CPU (default: 5).",
+        )
+        parser.add_argument(
+            "--heartbeat",
+            type=float,
+            default=15.0,
+            help="Heartbeat interval passed to the streams (default: 15).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            levels = sorted({int(x) for x in options["connections"].split(",") if x.strip()})
+        except ValueError:
+            raise CommandError("--connections must be a comma-separated list of integers")
+        if not levels or levels[0] <= 0:
+            raise CommandError("--connections must contain positive integers")
+
+        self.stdout.write(self.style.NOTICE(
+            f"Benchmarking async SSE subscribers: {levels}, idle {options['idle']}s per level"
+        ))
+        self.stdout.write(f"{'connections':>12} {'rss_mb':>10} {'kb/conn':>10} {'idle_cpu_s':>11} {'fanout_ms':>10}")
+        asyncio.run(self._run(levels, options["idle"], options["heartbeat"]))
+
+    async def _run(self, levels, idle, heartbeat):
+        received = 0
+        target = 0
+        all_received = asyncio.Event()
+
+        async def consume(scopes):
+            nonlocal received
+            async for chunk in async_event_stream(scopes, heartbeat):
+                if chunk.startswith("event: change"):
+                    received += 1
+                    if received >= target:
+                        all_received.set()
+
+        baseline_rss = current_rss_mb()
+        tasks = []
+        try:
+            for level in levels:
+                while len(tasks) < level:
+                    tasks.append(asyncio.ensure_future(consume({user_scope(-len(tasks) - 1)})))
+                # ждём, пока все подписки зарегистрируются на шине
+                while change_bus.subscriber_count() < level:
+                    await asyncio.sleep(0.05)
+
+                cpu_before = time.process_time()
+                await asyncio.sleep(idle)
+                idle_cpu = time.process_time() - cpu_before
+                rss = current_rss_mb()
+
+                received = 0
+                target = level
+                all_received.clear()
+                started = time.perf_counter()
+                change_bus.publish({user_scope(-i - 1) for i in range(level)}, level)
+                await asyncio.wait_for(all_received.wait(), timeout=60)
+                fanout_ms = (time.perf_counter() - started) * 1000
+
+                per_conn_kb = (rss - baseline_rss) * 1024 / level
+                self.stdout.write(
+                    f"{level:>12} {rss:>10.1f} {per_conn_kb:>10.2f} {idle_cpu:>11.3f} {fanout_ms:>10.1f}"
+                )
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Subscribers left on the bus: {change_bus.subscriber_count()}"
+        ))
@@ -0,0 +1,140 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from vacation_app.models import User
+
+# (role, url name, query parameters); "{manager}" is replaced with the id
+# of the manager the check runs as
+HOT_VIEWS = (
+    ("employee", "vacation_balance", {}),
+    ("employee", "my_requests", {}),
+    ("employee", "my_requests", {"date_from": "2025-01-01", "date_to": "2025-12-31"}),
+    ("employee", "notifications_list", {}),
+    ("employee", "notifications_unread_count", {}),
+    ("employee", "live_changes", {"since": "1"}),
+    ("manager", "manager_requests", {}),
+    ("manager", "manager_requests", {"status": "pending"}),
+    ("manager", "vacation_balances", {}),
+    ("manager", "live_changes", {"since": "1"}),
+    ("hr", "hr_requests", {}),
+    ("hr", "hr_requests", {"status": "approved", "date_from": "2025-01-01", "date_to": "2025-12-31"}),
+    ("hr", "hr_requests", {"manager_id": "{manager}"}),
+    ("hr", "hr_schedule", {"year": "2025"}),
+    ("hr", "hr_schedule", {"year": "2025", "manager_id": "{manager}"}),
+    ("hr", "hr_schedule_export", {"year": "2025"}),
+    ("hr", "hr_heatmap", {"year": "2025"}),
+    ("hr", "hr_schedule_print", {"year": "2025"}),
+    ("hr", "hr_schedule_print", {"year": "2025", "manager_id": "{manager}"}),
+    ("hr", "hr_departments", {}),
+    ("hr", "notifications_list", {}),
+    ("hr", "live_changes", {"since": "1"}),
+)
+
+# "SCAN <table>" without an index is a full table scan; scans of subqueries,
+# CTEs and constant rows are not
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW|\(|CTE )(?P<table>\S+)(?!.*\bUSING\b)")
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    """
+    Query-plan regression check for the hot API views.
+
+    Every view listed in HOT_VIEWS is called as the first user of the
+    corresponding role (inside a transaction that is rolled back), the
+    SELECTs it issues are captured and run through `EXPLAIN QUERY PLAN`.
+    The command fails if any of them falls back to a full table scan, e.g.
+    after an index was dropped or a filter was rewritten so that SQLite can
+    no longer use it (a function applied to the column instead of a range).
+    A view that cannot be checked because its role has no user fails the
+    command as well: a skipped query is not a passing one.
+
+    SQLite only: the plan format is backend-specific.
+    """
+
+    help = "Fail if a hot view's query needs a full table scan (EXPLAIN QUERY PLAN, SQLite)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--allow",
+            default="",
+            help="Comma-separated tables whose full scans are tolerated.",
+        )
+        parser.add_argument(
+            "--show-plans",
+            action="store_true",
+            help="Print the plan of every captured query, not only the failing ones.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("check_query_plans supports SQLite only")
+        allowed = {table.strip() for table in options["allow"].split(",") if table.strip()}
+
+        users = {role: User.objects.filter(role=role).order_by("id").first() for role in User.Roles.values}
+        factory = RequestFactory()
+        failures = 0
+        checked = 0
+        skipped = []
+        with transaction.atomic():
+            for role, url_name, params in HOT_VIEWS:
+                user = users.get(role)
+                if user is None:
+                    self.stdout.write(self.style.ERROR(f"skip {url_name}: no {role} user"))
+                    skipped.append(f"{role} {url_name}")
+                    continue
+                manager = users.get("manager")
+                params = {
+                    key: value.format(manager=manager.id if manager else 0)
+                    for key, value in params.items()
+                }
+                path = reverse(url_name)
+                request = factory.get(path, params)
+                request.user = user
+                with CaptureQueriesContext(connection) as captured:
+                    response = resolve(path).func(request)
+                    if response.streaming:
+                        # streamed views query the database while the body is consumed
+                        for _ in response.streaming_content:
+                            pass
+                if response.status_code != 200:
+                    raise CommandError(f"{url_name} {params} as {role} answered {response.status_code}")
+
+                label = f"{role:<8} {url_name} {params or ''}".rstrip()
+                selects = [q["sql"] for q in captured.captured_queries if q["sql"].lstrip().upper().startswith("SELECT")]
+                view_failures = 0
+                for sql in selects:
+                    checked += 1
+                    plan = query_plan(sql)
+                    scans = [
+                        detail for detail in plan
+                        if FULL_SCAN.match(detail) and FULL_SCAN.match(detail).group("table") not in allowed
+                    ]
+                    if options["show_plans"] or scans:
+                        self.stdout.write(f"  {sql}")
+                        for detail in plan:
+                            style = self.style.ERROR if detail in scans else str
+                            self.stdout.write(style(f"    {detail}"))
+                    view_failures += bool(scans)
+                status = self.style.ERROR("FULL SCAN") if view_failures else self.style.SUCCESS("ok")
+                self.stdout.write(f"{status} {label}: {len(selects)} queries")
+                failures += view_failures
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"{failures} of {checked} queries fall back to a full table scan")
+        if skipped:
+            raise CommandError(
+                f"{len(skipped)} view(s) not checked, create a user for every role: {', '.join(skipped)}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Done. {checked} queries use indexes."))
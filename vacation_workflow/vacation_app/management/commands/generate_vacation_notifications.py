@@ -1,9 +1,21 @@
-from datetime import timedelta
+import time
+from datetime import date
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
 from django.utils import timezone
 
-from vacation_app.models import VacationRequest, Notification, User
+from vacation_app import reminders
+
+
+def _parse_offsets(raw):
+    try:
+        offsets = sorted({int(x) for x in raw.split(",") if x.strip()}, reverse=True)
+    except ValueError:
+        raise CommandError(f"Offsets must be a comma-separated list of integers, got {raw!r}")
+    if any(offset < 0 for offset in offsets):
+        raise CommandError("Offsets must not be negative")
+    return tuple(offsets)
 
 
 class Command(BaseCommand):
@@ -11,146 +23,127 @@ class Command(BaseCommand):
     Generate reminder notifications for upcoming approved vacations.
 
     Logic:
-    - For all fully approved vacation requests (see _get_base_queryset),
-      look at the start_date.
-    - If start_date is in exactly 14 days -> create `vacation_reminder_14d`
-      notifications for:
+    - For all fully approved vacation requests (approved and confirmed by
+      the employee), look at the start_date.
+    - For every offset N (default 14 and 0) create a reminder for requests
+      starting in exactly N days:
+        * 14 days -> `vacation_reminder_14d`
+        * 0 days (today) -> `vacation_start_today`
+        * any other offset -> `reminder_upcoming` with `remind_days=N`
+    - Recipients:
         * employee (owner of request)
         * employee's manager (if exists)
-        * all HR users
-    - If start_date is today -> create `vacation_start_today` notifications
-      for:
-        * employee
-        * employee's manager (if exists)
+        * HR role, for offsets listed in --hr-offsets (default 14): one
+          BroadcastNotification per request instead of a row per HR user
+
+    Processed days are tracked per shard in ReminderWatermark. A run
+    covers every day since the watermark (catch-up after missed cron runs
+    or daemon downtime) plus today, with one start_date range query per
+    offset. `--serve` keeps the command running and repeats this every
+    --interval seconds.
 
     The command is idempotent for the same request/user/type: it will not
-    create duplicate notifications if they already exist.
+    create duplicate notifications if they already exist (also enforced by
+    the `notification_reminder_unique` constraint).
     """
 
-    help = "Generate reminder notifications for upcoming vacations (14 days / today)."
+    help = "Generate reminder notifications for upcoming vacations (14 days / today by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--offsets",
+            default=",".join(str(x) for x in reminders.DEFAULT_OFFSETS),
+            help="Comma-separated days before start to remind at (default: 14,0), e.g. 30,14,1,0.",
+        )
+        parser.add_argument(
+            "--hr-offsets",
+            default=",".join(str(x) for x in reminders.DEFAULT_HR_OFFSETS),
+            help="Offsets at which the HR role gets a broadcast reminder as well (default: 14).",
+        )
+        parser.add_argument(
+            "--shard",
+            default="0/1",
+            help="Process only requests with user_id %% n == i, given as i/n (default: 0/1).",
+        )
+        parser.add_argument(
+            "--since",
+            type=date.fromisoformat,
+            help="Replay days starting from this date (YYYY-MM-DD) instead of the stored watermark.",
+        )
+        parser.add_argument(
+            "--max-catchup-days",
+            type=int,
+            default=31,
+            help="Never replay more than this many days back (default: 31).",
+        )
+        parser.add_argument(
+            "--serve",
+            action="store_true",
+            help="Run as a daemon: process, sleep --interval seconds, repeat.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=3600,
+            help="Seconds between runs in --serve mode (default: 3600).",
+        )
 
     def handle(self, *args, **options):
+        offsets = _parse_offsets(options["offsets"])
+        hr_offsets = _parse_offsets(options["hr_offsets"])
+        try:
+            shard = reminders.Shard.parse(options["shard"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if not offsets:
+            raise CommandError("At least one offset is required")
+
+        run = dict(
+            offsets=offsets,
+            hr_offsets=hr_offsets,
+            shard=shard,
+            max_days=options["max_catchup_days"],
+        )
+
+        if not options["serve"]:
+            self._run_once(since=options["since"], **run)
+            return
+
+        self.stdout.write(self.style.NOTICE(
+            f"Serving reminders for shard {shard.key}, offsets {list(offsets)}, every {options['interval']}s"
+        ))
+        since = options["since"]
+        try:
+            while True:
+                close_old_connections()
+                try:
+                    self._run_once(since=since, **run)
+                    # --since действует только на первый проход, дальше - по отметке
+                    since = None
+                except Exception as exc:
+                    # демон не должен умирать из-за временной ошибки БД
+                    self.stderr.write(self.style.ERROR(f"Reminder run failed: {exc}"))
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.NOTICE("Stopped."))
+
+    def _run_once(self, since, offsets, hr_offsets, shard, max_days):
         today = timezone.localdate()
         self.stdout.write(self.style.NOTICE(f"Generating vacation notifications for {today}"))
 
-        qs = self._get_base_queryset()
-
-        created_count = 0
-        skipped_count = 0
-
-        hr_users = list(User.objects.filter(role="hr"))
-
-        for req in qs:
-            if not req.start_date:
-                continue
-
-            delta_days = (req.start_date - today).days
-
-            # Only future or today's vacations интересуют
-            if delta_days < 0:
-                continue
-
-            if delta_days == 14:
-                # 14 days before start
-                created, skipped = self._create_notifications_for_request(
-                    request=req,
-                    notif_type="vacation_reminder_14d",
-                    hr_users=hr_users,
-                    today=today,
-                )
-                created_count += created
-                skipped_count += skipped
-
-            if delta_days == 0:
-                # starts today
-                created, skipped = self._create_notifications_for_request(
-                    request=req,
-                    notif_type="vacation_start_today",
-                    hr_users=hr_users,
-                    today=today,
-                    include_hr=False,  # по требованиям HR достаточно 14-дневного напоминания
-                )
-                created_count += created
-                skipped_count += skipped
+        date_from, created_count, skipped_count = reminders.catch_up(
+            today,
+            offsets=offsets,
+            hr_offsets=hr_offsets,
+            shard=shard,
+            since=since,
+            max_days=max_days,
+        )
+        if date_from is not None and date_from < today:
+            self.stdout.write(f"Caught up missed days {date_from}..{today}")
 
         self.stdout.write(
             self.style.SUCCESS(
                 f"Done. Created {created_count} notifications, skipped {skipped_count} duplicates."
             )
         )
-
-    def _get_base_queryset(self):
-        """
-        Base queryset for vacations that should participate in reminders.
-
-        Здесь мы используем максимально "широкое" условие по статусам,
-        чтобы не упасть, если коды слегка отличаются, но при этом
-        фокусируемся только на действительно утверждённых заявках.
-
-        При необходимости можно сузить фильтр под фактические статусы.
-        """
-        qs = VacationRequest.objects.all()
-
-        # Если в модели есть поле confirmed_by_employee, то ограничиваемся только подтверждёнными
-        if hasattr(VacationRequest, "confirmed_by_employee"):
-            qs = qs.filter(confirmed_by_employee=True)
-
-        # Пытаемся отфильтровать "утверждённые" статусы, но мягко:
-        # если статус не совпадает ни с одним перечисленным, просто ничего страшного -
-        # queryset вернёт 0 строк и команда отработает без ошибок.
-        APPROVED_STATUSES = [
-            "approved",
-            "hr_approved",
-            "manager_approved",
-        ]
-
-        try:
-            qs = qs.filter(status__in=APPROVED_STATUSES)
-        except Exception:
-            # На всякий случай - если поле status устроено иначе, не ломаем команду
-            pass
-
-        return qs.select_related("user", "user__manager")
-
-    def _create_notifications_for_request(
-        self,
-        request: VacationRequest,
-        notif_type: str,
-        hr_users,
-        today,
-        include_hr: bool = True,
-    ):
-        """
-        Create notifications of a given type for:
-        - employee (mandatory)
-        - manager (if exists)
-        - HRs (optionally)
-
-        Returns:
-            (created_count, skipped_count)
-        """
-        created = 0
-        skipped = 0
-
-        employee = request.user
-        manager = getattr(employee, "manager", None)
-
-        # Собираем список получателей
-        recipients = [employee]
-        if manager is not None:
-            recipients.append(manager)
-        if include_hr:
-            recipients.extend(hr_users)
-
-        for user in recipients:
-            obj, was_created = Notification.objects.get_or_create(
-                user=user,
-                request=request,
-                type=notif_type,
-            )
-            if was_created:
-                created += 1
-            else:
-                skipped += 1
-
-        return created, skipped
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vacation_app import org_import
+
+
+class Command(BaseCommand):
+    """
+    Load users, roles, managers and yearly vacation balances from a CSV file.
+
+    The first line is a header; `username` is required, the other columns
+    (first_name, last_name, role, manager, year, days_remaining) are
+    optional. A column that is absent leaves the field alone. One line per
+    user and year; a user's fields must agree across their lines. `manager`
+    is the manager's username: it may appear later in the file or exist
+    only in the database. An empty manager clears it.
+
+    The file is parsed line by line and diffed against the database. With
+    --dry-run only the diff is printed; otherwise it is written in batched
+    transactions (see vacation_app/org_import.py). Re-running the same file
+    is a no-op, so an interrupted load can simply be repeated.
+    """
+
+    help = "Import users, managers, roles and per-year vacation balances from CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header line.")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would change; nothing is written.",
+        )
+        parser.add_argument(
+            "--show",
+            type=int,
+            default=20,
+            help=f"Print up to this many changes (at most {org_import.MAX_CHANGES}, default 20).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as csv_file:
+                report = org_import.run(csv_file, dry_run=options["dry_run"])
+        except OSError as exc:
+            raise CommandError(f"Cannot read {options['path']}: {exc}")
+        except org_import.OrgImportError as exc:
+            for error in exc.errors:
+                self.stderr.write(error)
+            raise CommandError(f"{len(exc.errors)} error(s), nothing was imported")
+
+        result = report.as_dict()
+        for change in result["changes"][:max(options["show"], 0)]:
+            fields = ", ".join(f"{name}: {old!r} -> {new!r}" for name, (old, new) in change["changes"].items())
+            self.stdout.write(f"  line {change['line']}: {change['action']} {change['username']} {fields}")
+        users, balances = result["users"], result["balances"]
+        self.stdout.write(
+            f"Users: {users['created']} new, {users['updated']} changed, {users['unchanged']} unchanged. "
+            f"Balances: {balances['created']} new, {balances['updated']} changed, "
+            f"{balances['unchanged']} unchanged, {balances['overdrawn']} below days already taken."
+        )
+        timings = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in result["seconds"].items())
+        self.stdout.write(f"{result['rows']} rows: {timings} ({result['rows_per_second']} rows/s).")
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING("Dry run: nothing was written."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Done."))
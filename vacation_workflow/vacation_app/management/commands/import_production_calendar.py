@@ -0,0 +1,83 @@
+import csv
+from collections import defaultdict
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from vacation_app import production_calendar
+from vacation_app.models import Holiday
+
+KINDS = {kind.value for kind in Holiday.Kind}
+
+
+class Command(BaseCommand):
+    """
+    Import a yearly production calendar from a CSV file.
+
+    One day per line: `date,kind,name`. `date` is YYYY-MM-DD. `kind` is one
+    of holiday (a public holiday), day_off (a weekday off because a holiday
+    was moved) or workday (a working Saturday/Sunday because of such a
+    move); it defaults to holiday. `name` is optional. Blank lines and lines
+    starting with # are skipped, as is a header line starting with "date".
+    Only days that differ from a plain Monday..Friday week need to be listed.
+
+    Every year present in the file (plus any --year) is replaced as a whole.
+    Working days of the requests touching those years are recounted, and
+    the balance totals, HR schedule and change journal are updated to match.
+    """
+
+    help = "Import holidays and moved working days of a production calendar from CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file: date,kind,name per line.")
+        parser.add_argument(
+            "--year",
+            type=int,
+            action="append",
+            dest="years",
+            default=[],
+            help="Also replace this year even if the file has no days for it (can be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        days_by_year = defaultdict(list)
+        for year in options["years"]:
+            days_by_year[year]
+        seen = set()
+        try:
+            with open(options["path"], encoding="utf-8", newline="") as calendar_file:
+                for line_no, row in enumerate(csv.reader(calendar_file), start=1):
+                    if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+                        continue
+                    if line_no == 1 and row[0].strip().lower() == "date":
+                        continue
+                    day, kind, name = self._parse(line_no, row)
+                    if day in seen:
+                        raise CommandError(f"Line {line_no}: {day} is listed twice")
+                    seen.add(day)
+                    days_by_year[day.year].append((day, kind, name))
+        except OSError as exc:
+            raise CommandError(f"Cannot read {options['path']}: {exc}")
+
+        if not days_by_year:
+            raise CommandError("No calendar days found; nothing to import")
+        recounted = production_calendar.replace_years(dict(days_by_year))
+        for year in sorted(days_by_year):
+            non_working, working = production_calendar.year_overrides(year)
+            self.stdout.write(
+                f"{year}: {len(non_working)} weekdays off, {len(working)} working weekend days"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Done. Imported {len(seen)} days; recounted {recounted} requests."
+        ))
+
+    def _parse(self, line_no, row):
+        try:
+            day = date.fromisoformat(row[0].strip())
+        except ValueError:
+            raise CommandError(f"Line {line_no}: bad date {row[0]!r}, expected YYYY-MM-DD")
+        kind = row[1].strip() if len(row) > 1 and row[1].strip() else Holiday.Kind.HOLIDAY
+        if kind not in KINDS:
+            raise CommandError(f"Line {line_no}: unknown kind {kind!r}, expected one of {', '.join(sorted(KINDS))}")
+        name = row[2].strip() if len(row) > 2 else ""
+        return day, kind, name
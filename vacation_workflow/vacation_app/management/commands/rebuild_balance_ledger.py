@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from vacation_app import ledger
+
+
+class Command(BaseCommand):
+    """
+    Recompute reserved/consumed totals of every VacationBalance from requests.
+
+    The totals are normally maintained incrementally by the views; use this
+    after manual data fixes or bulk imports that bypass them.
+    """
+
+    help = "Rebuild reserved/consumed day totals of vacation balances from requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Only rebuild balances of this user id (can be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        count = ledger.rebuild(user_ids=options["user_ids"])
+        self.stdout.write(self.style.SUCCESS(f"Done. Rebuilt {count} balances."))
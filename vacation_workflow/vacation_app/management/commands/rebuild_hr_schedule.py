@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from vacation_app import schedule_store
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the materialized HR vacation schedule (ScheduleEntry) from requests.
+
+    The schedule is normally maintained incrementally by signals on request
+    and profile saves; use this after manual data fixes or bulk updates that
+    bypass save().
+    """
+
+    help = "Rebuild the materialized HR vacation schedule from approved requests."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--year",
+            type=int,
+            action="append",
+            dest="years",
+            help="Only rebuild the schedule of this year (can be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        count = schedule_store.rebuild(years=options["years"])
+        self.stdout.write(self.style.SUCCESS(f"Done. Rebuilt {count} schedule entries."))
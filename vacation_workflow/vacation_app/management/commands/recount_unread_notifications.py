@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from vacation_app import unread
+
+
+class Command(BaseCommand):
+    """
+    Recompute the denormalized unread notification counter of every user.
+
+    The counter is normally maintained incrementally when notifications are
+    created and read; use this after manual data fixes (e.g. deleting
+    notifications in the admin).
+    """
+
+    help = "Recompute per-user unread notification counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Only recount this user id (can be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        count = unread.recount(user_ids=options["user_ids"])
+        self.stdout.write(self.style.SUCCESS(f"Done. Recounted {count} users."))
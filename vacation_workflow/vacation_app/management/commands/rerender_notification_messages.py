@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from vacation_app import notification_texts
+from vacation_app.models import BroadcastNotification, Notification
+
+
+class Command(BaseCommand):
+    """
+    Re-render stored notification messages built with an older template version.
+
+    Messages are rendered once, when a notification is created, and stored
+    together with `notification_texts.TEMPLATE_VERSION`. After changing the
+    texts, bump the version and run this command (pages of the list are also
+    re-rendered lazily when served). Also fills messages of notifications
+    created before messages were stored.
+    """
+
+    help = "Re-render stored notification messages after a template change."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-render every message, not only outdated ones.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows per batch (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model in (Notification, BroadcastNotification):
+            qs = model.objects.order_by("id")
+            if options["all"]:
+                qs.update(message_version=0)
+            qs = qs.exclude(message_version=notification_texts.TEMPLATE_VERSION)
+            count = 0
+            last_id = 0
+            while True:
+                batch = list(qs.filter(id__gt=last_id)[:options["batch_size"]])
+                if not batch:
+                    break
+                count += notification_texts.refresh_stale(batch)
+                last_id = batch[-1].id
+            self.stdout.write(f"{model.__name__}: {count} messages re-rendered")
+            total += count
+        self.stdout.write(self.style.SUCCESS(f"Done. Re-rendered {total} messages."))
@@ -0,0 +1,96 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from vacation_app import export_jobs
+
+
+class Command(BaseCommand):
+    """
+    Worker for background HR exports (ExportJob).
+
+    Takes queued jobs one by one (several workers may run side by side: a
+    job is claimed with a conditional UPDATE), writes the artifact into
+    settings.EXPORT_JOBS_DIR and records progress on the job while
+    writing. A running job's heartbeat is refreshed at least every
+    export_jobs.HEARTBEAT_SECONDS; jobs whose heartbeat is older than
+    --stale-after seconds (the worker died) are put back into the queue,
+    while slow but live jobs are left alone. Finished jobs older than
+    --keep-days are deleted together with their files.
+
+    By default the command keeps polling the queue every --interval
+    seconds; `--once` drains the queue and exits.
+    """
+
+    help = "Process queued HR export jobs (writes files to EXPORT_JOBS_DIR)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the jobs currently queued and exit.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds between queue polls when idle (default: 2).",
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=300,
+            help="Requeue running jobs without a heartbeat for this many seconds (default: 300).",
+        )
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=7,
+            help="Delete finished jobs and their files after this many days (default: 7).",
+        )
+
+    def handle(self, *args, **options):
+        if not options["once"]:
+            self.stdout.write(self.style.NOTICE(
+                f"Serving export jobs from {export_jobs.jobs_dir()}, polling every {options['interval']}s"
+            ))
+        processed = 0
+        try:
+            while True:
+                close_old_connections()
+                now = timezone.now()
+                requeued = export_jobs.requeue_stale(now - timedelta(seconds=options["stale_after"]))
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f"Requeued {requeued} stale jobs"))
+                purged = export_jobs.purge(now - timedelta(days=options["keep_days"]))
+                if purged:
+                    self.stdout.write(f"Purged {purged} old jobs")
+
+                job = export_jobs.claim_next()
+                if job is None:
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+                    continue
+
+                started = time.perf_counter()
+                job = export_jobs.run(job)
+                processed += 1
+                elapsed = time.perf_counter() - started
+                if job.status == job.Status.DONE:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Job #{job.id} {job.kind}: {job.rows_done} rows, {job.file_size} bytes in {elapsed:.1f}s"
+                    ))
+                elif job.status != job.Status.FAILED:
+                    self.stdout.write(self.style.WARNING(
+                        f"Job #{job.id} {job.kind} was requeued while running, abandoned after {elapsed:.1f}s"
+                    ))
+                else:
+                    self.stderr.write(self.style.ERROR(f"Job #{job.id} {job.kind} failed: {job.error}"))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.NOTICE("Stopped."))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Done. Processed {processed} export jobs."))
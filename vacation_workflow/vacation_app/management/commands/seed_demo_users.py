@@ -3,6 +3,7 @@ from django.db import transaction
 
 from datetime import date, timedelta
 
+from vacation_app import ledger
 from vacation_app.models import User, VacationBalance, VacationRequest
 
 import random
@@ -144,6 +145,9 @@ class Command(BaseCommand):
                 },
             )
 
+            # заявки созданы напрямую, поэтому резерв/расход балансов пересчитываем
+            ledger.rebuild(user_ids=[employee.id, manager.id, hr.id])
+
             self.stdout.write(
                 self.style.SUCCESS(
                     "Demo vacation requests created for employee: "
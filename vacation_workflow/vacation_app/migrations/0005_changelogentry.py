@@ -0,0 +1,29 @@
+# Generated by Django 4.2.13 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0004_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('request', 'Vacation Request'), ('notification', 'Notification'), ('balance', 'Vacation Balance'), ('user', 'User')], max_length=20)),
+                ('entity_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Created or Updated'), ('delete', 'Deleted')], default='upsert', max_length=10)),
+                ('scope_user', models.BigIntegerField(blank=True, null=True)),
+                ('scope_manager', models.BigIntegerField(blank=True, null=True)),
+                ('hr_visible', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['scope_user', 'id'], name='changelog_user_version'), models.Index(fields=['scope_manager', 'id'], name='changelog_manager_version'), models.Index(fields=['hr_visible', 'id'], name='changelog_hr_version')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-18 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0005_changelogentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vacationrequest',
+            index=models.Index(fields=['created_at', 'id'], name='request_created_keyset'),
+        ),
+    ]
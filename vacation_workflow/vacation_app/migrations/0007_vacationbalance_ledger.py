@@ -0,0 +1,48 @@
+# Generated by Django 4.2.13 on 2026-10-18 08:48
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def fill_ledger(apps, schema_editor):
+    """Первичное заполнение резерва/расхода по существующим заявкам."""
+    VacationBalance = apps.get_model('vacation_app', 'VacationBalance')
+    VacationRequest = apps.get_model('vacation_app', 'VacationRequest')
+
+    totals = defaultdict(lambda: [0, 0])
+    for req in VacationRequest.objects.exclude(status='rejected').iterator():
+        days = (req.end_date - req.start_date).days + 1
+        key = (req.user_id, req.start_date.year)
+        if req.status == 'approved' and req.confirmed_by_employee:
+            totals[key][1] += days
+        else:
+            totals[key][0] += days
+
+    for (user_id, year), (reserved, consumed) in totals.items():
+        VacationBalance.objects.update_or_create(
+            user_id=user_id,
+            year=year,
+            defaults={'reserved_days': reserved, 'consumed_days': consumed},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0006_vacationrequest_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vacationbalance',
+            name='consumed_days',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vacationbalance',
+            name='reserved_days',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.13 on 2026-10-18 08:51
+
+from django.db import migrations, models
+from django.db.models import Min
+
+REMINDER_TYPES = ['vacation_reminder_14d', 'vacation_start_today']
+
+
+def drop_duplicate_reminders(apps, schema_editor):
+    """Оставляет по одному напоминанию на (user, request, type) перед созданием ограничения."""
+    Notification = apps.get_model('vacation_app', 'Notification')
+    reminders = Notification.objects.filter(type__in=REMINDER_TYPES)
+    keep_ids = (
+        reminders
+        .values('user_id', 'request_id', 'type')
+        .annotate(keep_id=Min('id'))
+        .values_list('keep_id', flat=True)
+    )
+    reminders.exclude(id__in=list(keep_ids)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0007_vacationbalance_ledger'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='type',
+            field=models.CharField(choices=[('request_approved', 'Request Approved'), ('request_rejected', 'Request Rejected'), ('request_created', 'Request Created'), ('reminder_upcoming', 'Upcoming Vacation Reminder'), ('request_rescheduled', 'Request Rescheduled'), ('vacation_reminder_14d', 'Vacation Starts In 14 Days'), ('vacation_start_today', 'Vacation Starts Today')], default='request_created', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='vacationrequest',
+            index=models.Index(fields=['start_date', 'status'], name='request_start_status'),
+        ),
+        migrations.RunPython(drop_duplicate_reminders, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('type__in', ['vacation_reminder_14d', 'vacation_start_today'])), fields=('user', 'request', 'type'), name='notification_reminder_unique'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.13 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+def fill_remind_days(apps, schema_editor):
+    """Старые напоминания: offset следует из типа."""
+    Notification = apps.get_model('vacation_app', 'Notification')
+    Notification.objects.filter(type='vacation_reminder_14d').update(remind_days=14)
+    Notification.objects.filter(type='vacation_start_today').update(remind_days=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0008_notification_reminder_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=50, unique=True)),
+                ('last_date', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name='notification',
+            name='notification_reminder_unique',
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='remind_days',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_remind_days, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('type__in', ['vacation_reminder_14d', 'vacation_start_today', 'reminder_upcoming'])), fields=('user', 'request', 'type', 'remind_days'), name='notification_reminder_unique'),
+        ),
+    ]
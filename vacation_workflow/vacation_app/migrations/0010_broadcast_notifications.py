@@ -0,0 +1,46 @@
+# Generated by Django 4.2.13 on 2026-10-18 08:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0009_reminder_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BroadcastReadState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='broadcast_read_state', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('read_up_to', models.BigIntegerField(default=0)),
+                ('read_ids', models.JSONField(blank=True, default=list)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='changelogentry',
+            name='entity',
+            field=models.CharField(choices=[('request', 'Vacation Request'), ('notification', 'Notification'), ('balance', 'Vacation Balance'), ('user', 'User'), ('broadcast', 'Broadcast Notification')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='BroadcastNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('employee', 'Employee'), ('manager', 'Manager'), ('hr', 'HR')], max_length=20)),
+                ('type', models.CharField(choices=[('request_approved', 'Request Approved'), ('request_rejected', 'Request Rejected'), ('request_created', 'Request Created'), ('reminder_upcoming', 'Upcoming Vacation Reminder'), ('request_rescheduled', 'Request Rescheduled'), ('vacation_reminder_14d', 'Vacation Starts In 14 Days'), ('vacation_start_today', 'Vacation Starts Today')], max_length=50)),
+                ('remind_days', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='vacation_app.vacationrequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['role', 'id'], name='broadcast_role_id')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='broadcastnotification',
+            constraint=models.UniqueConstraint(fields=('role', 'request', 'type', 'remind_days'), name='broadcast_unique'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.13 on 2026-10-18 08:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0010_broadcast_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastnotification',
+            name='message',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='broadcastnotification',
+            name='message_version',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='message',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='message_version',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='broadcastnotification',
+            index=models.Index(fields=['role', 'created_at', 'id'], name='broadcast_role_keyset'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='notification_user_keyset'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.13 on 2026-10-18 08:59
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_unread(apps, schema_editor):
+    """Начальные значения счётчика: личные непрочитанные + непрочитанные broadcast роли."""
+    User = apps.get_model('vacation_app', 'User')
+    Notification = apps.get_model('vacation_app', 'Notification')
+    BroadcastNotification = apps.get_model('vacation_app', 'BroadcastNotification')
+    BroadcastReadState = apps.get_model('vacation_app', 'BroadcastReadState')
+
+    personal = dict(
+        Notification.objects.filter(is_read=False)
+        .values('user_id')
+        .annotate(unread=Count('id'))
+        .values_list('user_id', 'unread')
+    )
+    states = {state.user_id: state for state in BroadcastReadState.objects.all()}
+    users = list(User.objects.all())
+    for user in users:
+        shared = BroadcastNotification.objects.filter(role=user.role, created_at__gte=user.date_joined)
+        state = states.get(user.id)
+        if state is not None:
+            shared = shared.filter(id__gt=state.read_up_to).exclude(id__in=state.read_ids)
+        user.unread_notifications = personal.get(user.id, 0) + shared.count()
+    User.objects.bulk_update(users, ['unread_notifications'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0011_notification_messages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_unread, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0012_user_unread_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedNotification',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type', models.CharField(choices=[('request_approved', 'Request Approved'), ('request_rejected', 'Request Rejected'), ('request_created', 'Request Created'), ('reminder_upcoming', 'Upcoming Vacation Reminder'), ('request_rescheduled', 'Request Rescheduled'), ('vacation_reminder_14d', 'Vacation Starts In 14 Days'), ('vacation_start_today', 'Vacation Starts Today')], max_length=50)),
+                ('remind_days', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('message', models.TextField(blank=True, default='')),
+                ('message_version', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='vacation_app.vacationrequest')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at', 'id'], name='archived_user_keyset')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0013_archived_notification'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_unread'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['manager', 'role'], name='user_manager_role'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'last_name', 'first_name'], name='user_role_name'),
+        ),
+        migrations.AddIndex(
+            model_name='vacationrequest',
+            index=models.Index(fields=['status', 'start_date'], name='request_status_start'),
+        ),
+        migrations.AddIndex(
+            model_name='vacationrequest',
+            index=models.Index(fields=['user', 'start_date'], name='request_user_start'),
+        ),
+    ]
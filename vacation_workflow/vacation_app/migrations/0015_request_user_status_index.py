@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0014_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vacationrequest',
+            index=models.Index(fields=['user', 'status', 'start_date'], name='request_user_status_start'),
+        ),
+    ]
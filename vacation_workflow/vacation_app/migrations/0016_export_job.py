@@ -0,0 +1,38 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0015_request_user_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('requests_csv', 'Approved Requests CSV'), ('schedule_csv', 'Schedule CSV'), ('schedule_print', 'Schedule Print (HTML)')], max_length=20)),
+                ('year', models.PositiveIntegerField(blank=True, null=True)),
+                ('manager_id', models.BigIntegerField(blank=True, null=True)),
+                ('data_version', models.BigIntegerField(default=0)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('rows_done', models.PositiveIntegerField(default=0)),
+                ('rows_total', models.PositiveIntegerField(blank=True, null=True)),
+                ('file_name', models.CharField(blank=True, default='', max_length=255)),
+                ('file_size', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'year', 'manager_id', 'data_version'], name='export_job_params'), models.Index(fields=['status', 'id'], name='export_job_queue')],
+            },
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def _full_name(username, first_name, last_name):
+    return (f"{first_name} {last_name}".strip() or username).strip()
+
+
+def fill_schedule(apps, schema_editor):
+    """Начальное наполнение графика из согласованных заявок."""
+    ScheduleEntry = apps.get_model('vacation_app', 'ScheduleEntry')
+    VacationRequest = apps.get_model('vacation_app', 'VacationRequest')
+
+    approved = (
+        VacationRequest.objects.filter(status='approved')
+        .select_related('user', 'user__manager')
+        .order_by('id')
+    )
+    batch = []
+    for request_obj in approved.iterator(chunk_size=2000):
+        user = request_obj.user
+        manager = user.manager
+        batch.append(ScheduleEntry(
+            request_id=request_obj.id,
+            year=request_obj.start_date.year,
+            user_id=user.id,
+            manager_id=user.manager_id,
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            full_name=_full_name(user.username, user.first_name, user.last_name),
+            manager_name=_full_name(manager.username, manager.first_name, manager.last_name) if manager else '',
+            start_date=request_obj.start_date,
+            end_date=request_obj.end_date,
+            days=(request_obj.end_date - request_obj.start_date).days + 1,
+            confirmed_by_employee=request_obj.confirmed_by_employee,
+        ))
+        if len(batch) >= 2000:
+            ScheduleEntry.objects.bulk_create(batch)
+            batch = []
+    ScheduleEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0016_export_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleEntry',
+            fields=[
+                ('request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='schedule_entry', serialize=False, to='vacation_app.vacationrequest')),
+                ('year', models.PositiveIntegerField()),
+                ('manager_id', models.BigIntegerField(blank=True, null=True)),
+                ('username', models.CharField(max_length=150)),
+                ('first_name', models.CharField(blank=True, max_length=150)),
+                ('last_name', models.CharField(blank=True, max_length=150)),
+                ('full_name', models.CharField(max_length=301)),
+                ('manager_name', models.CharField(blank=True, max_length=301)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('days', models.PositiveIntegerField()),
+                ('confirmed_by_employee', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='vacationrequest',
+            name='request_user_status_start',
+        ),
+        migrations.AddField(
+            model_name='scheduleentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleentry',
+            index=models.Index(fields=['year', 'last_name', 'first_name', 'user', 'start_date'], name='schedule_year_order'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleentry',
+            index=models.Index(fields=['year', 'manager_id', 'last_name', 'first_name', 'user', 'start_date'], name='schedule_manager_order'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleentry',
+            index=models.Index(fields=['manager_id'], name='schedule_manager'),
+        ),
+        migrations.RunPython(fill_schedule, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0017_schedule_entry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='scheduleentry',
+            index=models.Index(fields=['user', 'year', 'start_date'], name='schedule_user_year'),
+        ),
+    ]
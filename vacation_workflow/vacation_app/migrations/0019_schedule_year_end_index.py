@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0018_schedule_user_year_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='scheduleentry',
+            index=models.Index(fields=['year', 'end_date', 'manager_id', 'start_date', 'days'], name='schedule_year_end'),
+        ),
+    ]
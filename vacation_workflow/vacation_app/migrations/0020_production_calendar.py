@@ -0,0 +1,83 @@
+# Generated by Django 4.2.13 on 2026-10-18 10:01
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def _weekdays(start_date, end_date):
+    """Понедельник..пятница в [start_date, end_date]: календарь пока пуст."""
+    days = (end_date - start_date).days + 1
+    weeks, rest = divmod(days, 7)
+    first = start_date.weekday()
+    return weeks * 5 + sum(1 for i in range(rest) if (first + i) % 7 < 5)
+
+
+def fill_working_days(apps, schema_editor):
+    """Дни заявок - рабочие; итоги балансов и дни в графике HR пересчитываются под них."""
+    VacationRequest = apps.get_model('vacation_app', 'VacationRequest')
+    VacationBalance = apps.get_model('vacation_app', 'VacationBalance')
+    ScheduleEntry = apps.get_model('vacation_app', 'ScheduleEntry')
+
+    totals = defaultdict(lambda: [0, 0])
+    batch = []
+    for req in VacationRequest.objects.order_by('id').iterator(chunk_size=2000):
+        req.days = _weekdays(req.start_date, req.end_date)
+        batch.append(req)
+        if req.status != 'rejected':
+            key = (req.user_id, req.start_date.year)
+            totals[key][1 if req.status == 'approved' and req.confirmed_by_employee else 0] += req.days
+        if len(batch) >= 2000:
+            VacationRequest.objects.bulk_update(batch, ['days'])
+            batch = []
+    VacationRequest.objects.bulk_update(batch, ['days'])
+
+    balances = list(VacationBalance.objects.all())
+    for balance in balances:
+        balance.reserved_days, balance.consumed_days = totals.get((balance.user_id, balance.year), (0, 0))
+    VacationBalance.objects.bulk_update(balances, ['reserved_days', 'consumed_days'], batch_size=1000)
+
+    batch = []
+    for entry in ScheduleEntry.objects.order_by('request_id').iterator(chunk_size=2000):
+        entry.days = _weekdays(entry.start_date, entry.end_date)
+        batch.append(entry)
+        if len(batch) >= 2000:
+            ScheduleEntry.objects.bulk_update(batch, ['days'])
+            batch = []
+    ScheduleEntry.objects.bulk_update(batch, ['days'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0019_schedule_year_end_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('kind', models.CharField(choices=[('holiday', 'Нерабочий праздничный день'), ('day_off', 'Перенесённый выходной'), ('workday', 'Рабочий день (перенос)')], default='holiday', max_length=20)),
+                ('name', models.CharField(blank=True, max_length=200)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='scheduleentry',
+            name='schedule_year_end',
+        ),
+        migrations.AddField(
+            model_name='vacationrequest',
+            name='days',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleentry',
+            index=models.Index(fields=['year', 'end_date', 'manager_id', 'start_date'], name='schedule_year_end'),
+        ),
+        migrations.RunPython(fill_working_days, migrations.RunPython.noop),
+    ]
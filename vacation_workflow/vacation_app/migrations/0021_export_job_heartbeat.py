@@ -0,0 +1,40 @@
+# Generated by Django 4.2.13 on 2026-10-18 10:34
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    """Из дублей активных заданий с одинаковыми параметрами остаётся самое раннее."""
+    ExportJob = apps.get_model('vacation_app', 'ExportJob')
+    seen = set()
+    duplicates = []
+    active = ExportJob.objects.filter(status__in=['queued', 'running']).order_by('id')
+    for job_id, kind, year, manager_id, version in active.values_list(
+        'id', 'kind', 'year', 'manager_id', 'data_version',
+    ):
+        key = (kind, year or 0, manager_id or 0, version)
+        if key in seen:
+            duplicates.append(job_id)
+        seen.add(key)
+    ExportJob.objects.filter(id__in=duplicates).update(status='failed', error='Дубль активного задания')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0020_production_calendar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='exportjob',
+            constraint=models.UniqueConstraint(models.F('kind'), django.db.models.functions.comparison.Coalesce('year', 0), django.db.models.functions.comparison.Coalesce('manager_id', 0), models.F('data_version'), condition=models.Q(('status__in', ['queued', 'running'])), name='export_job_active_params'),
+        ),
+    ]
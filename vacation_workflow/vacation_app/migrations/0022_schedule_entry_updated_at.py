@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vacation_app', '0021_export_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduleentry',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Coalesce
 
 
 class User(AbstractUser):
@@ -14,6 +15,16 @@ class User(AbstractUser):
     first_name = models.CharField(max_length=150, blank=True)
     last_name = models.CharField(max_length=150, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # непрочитанные уведомления (личные + broadcast роли), ведётся в unread.py
+    unread_notifications = models.PositiveIntegerField(default=0)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # команда менеджера и отбор по роли (списки, журнал изменений)
+            models.Index(fields=['manager', 'role'], name='user_manager_role'),
+            # список подразделений (менеджеры по фамилии)
+            models.Index(fields=['role', 'last_name', 'first_name'], name='user_role_name'),
+        ]
 
     def __str__(self):
         return f"{self.username} ({self.role})"
@@ -34,6 +45,21 @@ class VacationRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     confirmed_by_employee = models.BooleanField(default=False)
+    # рабочих дней по производственному календарю (production_calendar.py);
+    # считается при сохранении дат и расходуется из баланса (ledger.py)
+    days = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # keyset-пагинация списков заявок по (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='request_created_keyset'),
+            # выборка заявок, начинающихся в заданный день (напоминания)
+            models.Index(fields=['start_date', 'status'], name='request_start_status'),
+            # согласованные заявки за период (график HR)
+            models.Index(fields=['status', 'start_date'], name='request_status_start'),
+            # заявки сотрудника по датам (свой список, пересечения, баланс за год)
+            models.Index(fields=['user', 'start_date'], name='request_user_start'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} {self.start_date} - {self.end_date} ({self.status})"
@@ -49,6 +75,31 @@ class VacationSchedule(models.Model):
         return f"{self.user.username} schedule {self.year}"
 
 
+class Holiday(models.Model):
+    """
+    День производственного календаря, отличающийся от обычной недели
+    (понедельник..пятница рабочие): праздник или перенесённый выходной
+    в будни, либо рабочая суббота/воскресенье по переносу.
+
+    Заполняется командой import_production_calendar; рабочие дни по нему
+    считает production_calendar.py.
+    """
+    class Kind(models.TextChoices):
+        HOLIDAY = 'holiday', 'Нерабочий праздничный день'
+        DAY_OFF = 'day_off', 'Перенесённый выходной'
+        WORKDAY = 'workday', 'Рабочий день (перенос)'
+
+    date = models.DateField(unique=True)
+    kind = models.CharField(max_length=20, choices=Kind.choices, default=Kind.HOLIDAY)
+    name = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date} {self.get_kind_display()}"
+
+
 class Notification(models.Model):
     class Type(models.TextChoices):
         REQUEST_APPROVED = 'request_approved', 'Request Approved'
@@ -56,6 +107,8 @@ class Notification(models.Model):
         REQUEST_CREATED = 'request_created', 'Request Created'
         REMINDER_UPCOMING = 'reminder_upcoming', 'Upcoming Vacation Reminder'
         REQUEST_RESCHEDULED = 'request_rescheduled', 'Request Rescheduled'
+        VACATION_REMINDER_14D = 'vacation_reminder_14d', 'Vacation Starts In 14 Days'
+        VACATION_START_TODAY = 'vacation_start_today', 'Vacation Starts Today'
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
     type = models.CharField(
@@ -66,10 +119,176 @@ class Notification(models.Model):
     request = models.ForeignKey(VacationRequest, null=True, blank=True, on_delete=models.CASCADE)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # за сколько дней до начала отпуска отправлено напоминание (только для напоминаний)
+    remind_days = models.PositiveSmallIntegerField(null=True, blank=True)
+    # готовый текст (notification_texts.py) и версия шаблонов, по которой он построен
+    message = models.TextField(blank=True, default='')
+    message_version = models.PositiveSmallIntegerField(default=0)
+
+    # напоминания создаются пакетно командой generate_vacation_notifications;
+    # повторный запуск не должен плодить дубликаты
+    REMINDER_TYPES = (Type.VACATION_REMINDER_14D, Type.VACATION_START_TODAY, Type.REMINDER_UPCOMING)
+
+    class Meta:
+        indexes = [
+            # страницы списка уведомлений пользователя по (created_at, id)
+            models.Index(fields=['user', 'created_at', 'id'], name='notification_user_keyset'),
+            # непрочитанные пользователя (массовое прочтение, пересчёт счётчика)
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_unread'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'request', 'type', 'remind_days'],
+                condition=models.Q(type__in=['vacation_reminder_14d', 'vacation_start_today', 'reminder_upcoming']),
+                name='notification_reminder_unique',
+            ),
+        ]
 
     def __str__(self):
         return f"Notification for {self.user.username}: {self.type}"
 
+
+class ArchivedNotification(models.Model):
+    """
+    Прочитанные уведомления старше срока хранения (команда archive_notifications).
+
+    id совпадает с id исходного Notification. Основная таблица остаётся
+    маленькой, а архив доступен в списке уведомлений по ?history=1.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    type = models.CharField(max_length=50, choices=Notification.Type.choices)
+    request = models.ForeignKey(VacationRequest, null=True, blank=True, on_delete=models.CASCADE)
+    remind_days = models.PositiveSmallIntegerField(null=True, blank=True)
+    message = models.TextField(blank=True, default='')
+    message_version = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='archived_user_keyset'),
+        ]
+
+    def __str__(self):
+        return f"Archived notification for {self.user_id}: {self.type}"
+
+class BroadcastNotification(models.Model):
+    """
+    Уведомление сразу для всех пользователей роли.
+
+    Хранится одной строкой вместо строки на каждого получателя; что
+    пользователь уже прочитал, хранит BroadcastReadState.
+    """
+    role = models.CharField(max_length=20, choices=User.Roles.choices)
+    type = models.CharField(max_length=50, choices=Notification.Type.choices)
+    request = models.ForeignKey(VacationRequest, null=True, blank=True, on_delete=models.CASCADE)
+    remind_days = models.PositiveSmallIntegerField(null=True, blank=True)
+    message = models.TextField(blank=True, default='')
+    message_version = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['role', 'id'], name='broadcast_role_id'),
+            models.Index(fields=['role', 'created_at', 'id'], name='broadcast_role_keyset'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['role', 'request', 'type', 'remind_days'],
+                name='broadcast_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Broadcast for {self.role}: {self.type}"
+
+
+class BroadcastReadState(models.Model):
+    """
+    Прочитанные пользователем broadcast-уведомления: все с id <= read_up_to
+    плюс отдельные id выше него в read_ids. Когда прочитанные id смыкаются
+    с read_up_to, отметка сдвигается, поэтому список остаётся коротким.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='broadcast_read_state',
+    )
+    read_up_to = models.BigIntegerField(default=0)
+    read_ids = models.JSONField(default=list, blank=True)
+
+    def is_read(self, broadcast_id):
+        return broadcast_id <= self.read_up_to or broadcast_id in self.read_ids
+
+    def __str__(self):
+        return f"Broadcasts read by {self.user_id}: <= {self.read_up_to} + {len(self.read_ids)}"
+
+
+class ReminderWatermark(models.Model):
+    """Последний день, за который сгенерированы напоминания (отдельно для каждого шарда)."""
+    key = models.CharField(max_length=50, unique=True)
+    last_date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Reminders {self.key}: {self.last_date}"
+
+
+class ScheduleEntry(models.Model):
+    """
+    Материализованный график отпусков HR: строка на согласованную заявку
+    с уже посчитанными именами и длительностью (schedule_store.py).
+
+    Обновляется сигналами при сохранении заявок и профилей, пересобирается
+    командой rebuild_hr_schedule.
+    """
+    request = models.OneToOneField(
+        VacationRequest,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='schedule_entry',
+    )
+    year = models.PositiveIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # текущий менеджер сотрудника (фильтр по подразделению), без FK - копия User.manager_id
+    manager_id = models.BigIntegerField(null=True, blank=True)
+    username = models.CharField(max_length=150)
+    first_name = models.CharField(max_length=150, blank=True)
+    last_name = models.CharField(max_length=150, blank=True)
+    full_name = models.CharField(max_length=301)
+    manager_name = models.CharField(max_length=301, blank=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    # рабочие дни заявки (VacationRequest.days), не календарная длина периода
+    days = models.PositiveIntegerField()
+    confirmed_by_employee = models.BooleanField(default=False)
+    # время последней записи строки - из него собирается версия фрагмента печати сотрудника
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # порядок графика: по фамилии и имени, периоды сотрудника подряд
+    ORDERING = ('last_name', 'first_name', 'user_id', 'start_date')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['year', 'last_name', 'first_name', 'user', 'start_date'], name='schedule_year_order'),
+            models.Index(
+                fields=['year', 'manager_id', 'last_name', 'first_name', 'user', 'start_date'],
+                name='schedule_manager_order',
+            ),
+            # переименование менеджера
+            models.Index(fields=['manager_id'], name='schedule_manager'),
+            # дорендер строк печати для пачки сотрудников (exports._print_rows)
+            models.Index(fields=['user', 'year', 'start_date'], name='schedule_user_year'),
+            # тепловая карта отсутствий (heatmap.py): покрывающий, строки таблицы не читаются
+            models.Index(fields=['year', 'end_date', 'manager_id', 'start_date'], name='schedule_year_end'),
+        ]
+
+    def __str__(self):
+        return f"{self.username} {self.start_date} - {self.end_date}"
+
+
 class VacationBalance(models.Model):
     user = models.ForeignKey(
         User,
@@ -78,6 +297,9 @@ class VacationBalance(models.Model):
     )
     year = models.IntegerField(default=2025)
     days_remaining = models.PositiveIntegerField(default=0)
+    # итоги по заявкам года, ведутся в ledger.py вместе с записью заявки
+    reserved_days = models.PositiveIntegerField(default=0)
+    consumed_days = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ('user', 'year')
@@ -85,3 +307,103 @@ class VacationBalance(models.Model):
 
     def __str__(self):
         return f'{self.user.username} - {self.year}: {self.days_remaining} дн.'
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Журнал изменений: id записи - глобальная монотонная версия данных.
+
+    Каждая запись говорит, какая сущность поменялась и в чьей зоне видимости:
+    scope_user - владелец данных, scope_manager - его руководитель,
+    hr_visible - видно ли изменение HR (личные уведомления - нет).
+    """
+
+    class Entity(models.TextChoices):
+        REQUEST = 'request', 'Vacation Request'
+        NOTIFICATION = 'notification', 'Notification'
+        BALANCE = 'balance', 'Vacation Balance'
+        USER = 'user', 'User'
+        BROADCAST = 'broadcast', 'Broadcast Notification'
+
+    class Action(models.TextChoices):
+        UPSERT = 'upsert', 'Created or Updated'
+        DELETE = 'delete', 'Deleted'
+
+    entity = models.CharField(max_length=20, choices=Entity.choices)
+    entity_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=Action.choices, default=Action.UPSERT)
+    # без FK: записи (в том числе об удалении) переживают удаление пользователя
+    scope_user = models.BigIntegerField(null=True, blank=True)
+    scope_manager = models.BigIntegerField(null=True, blank=True)
+    hr_visible = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['scope_user', 'id'], name='changelog_user_version'),
+            models.Index(fields=['scope_manager', 'id'], name='changelog_manager_version'),
+            models.Index(fields=['hr_visible', 'id'], name='changelog_hr_version'),
+        ]
+
+    def __str__(self):
+        return f'#{self.id} {self.action} {self.entity}:{self.entity_id}'
+
+
+class ExportJob(models.Model):
+    """
+    Фоновая выгрузка HR (export_jobs.py): файл пишет воркер run_export_jobs.
+
+    data_version - версия данных HR в журнале на момент постановки; задание
+    с теми же параметрами и той же версией переиспользуется, а активное
+    (в очереди или в работе) может быть только одно. heartbeat_at воркер
+    обновляет, пока пишет файл: задание без свежей отметки считается
+    брошенным и возвращается в очередь.
+    """
+
+    class Kind(models.TextChoices):
+        REQUESTS_CSV = 'requests_csv', 'Approved Requests CSV'
+        SCHEDULE_CSV = 'schedule_csv', 'Schedule CSV'
+        SCHEDULE_PRINT = 'schedule_print', 'Schedule Print (HTML)'
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    year = models.PositiveIntegerField(null=True, blank=True)
+    # фильтр по подразделению (id менеджера), не FK: это параметр выгрузки
+    manager_id = models.BigIntegerField(null=True, blank=True)
+    data_version = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    requested_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    rows_done = models.PositiveIntegerField(default=0)
+    rows_total = models.PositiveIntegerField(null=True, blank=True)
+    file_name = models.CharField(max_length=255, blank=True, default='')
+    file_size = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # поиск готовой выгрузки с теми же параметрами
+            models.Index(fields=['kind', 'year', 'manager_id', 'data_version'], name='export_job_params'),
+            # очередь воркера
+            models.Index(fields=['status', 'id'], name='export_job_queue'),
+        ]
+        constraints = [
+            # параллельные постановки одной выгрузки не создают дублей; NULL в
+            # уникальном индексе не совпадают между собой, поэтому через Coalesce
+            models.UniqueConstraint(
+                'kind', Coalesce('year', 0), Coalesce('manager_id', 0), 'data_version',
+                condition=models.Q(status__in=['queued', 'running']),
+                name='export_job_active_params',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Export #{self.id} {self.kind} {self.year or ''} ({self.status})"
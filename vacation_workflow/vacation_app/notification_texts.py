@@ -0,0 +1,149 @@
+"""
+Тексты уведомлений.
+
+Текст рендерится один раз при создании уведомления и хранится в
+message вместе с версией шаблонов (message_version). Если тексты здесь
+меняются, TEMPLATE_VERSION увеличивают: устаревшие сообщения
+перерисовываются при выдаче страницы списка или командой
+rerender_notification_messages.
+"""
+from .models import Notification, VacationRequest
+
+TEMPLATE_VERSION = 1
+
+
+def days_label(days: int) -> str:
+    """1 день, 2 дня, 5 дней."""
+    if days % 10 == 1 and days % 100 != 11:
+        word = "день"
+    elif 2 <= days % 10 <= 4 and not 12 <= days % 100 <= 14:
+        word = "дня"
+    else:
+        word = "дней"
+    return f"{days} {word}"
+
+
+def render_message(notif_type, req=None, viewer_id=None, remind_days=None):
+    """
+    Текст уведомления типа notif_type о заявке req (с загруженным req.user)
+    для получателя viewer_id. viewer_id=None - читатель не владелец заявки
+    (так рендерятся broadcast-уведомления роли).
+    """
+    # Будем показывать имя сотрудника только, если уведомление читает не он сам
+    employee_label = ""
+    is_self = False
+
+    if req and req.user:
+        u = req.user
+        full_name = (f"{u.first_name} {u.last_name}".strip() or u.username).strip()
+        is_self = (viewer_id == u.id)
+
+        if not is_self:
+            employee_label = f" сотрудника {full_name}"
+
+    # Далее тексты зависят и от типа уведомления, и от того, кто его читает
+
+    if notif_type == Notification.Type.REQUEST_APPROVED and req:
+        if is_self:
+            return (
+                f"Ваша заявка №{req.id} на отпуск "
+                f"с {req.start_date.isoformat()} по {req.end_date.isoformat()} - согласована менеджером."
+            )
+        return (
+            f"Заявка №{req.id}{employee_label} на отпуск "
+            f"с {req.start_date.isoformat()} по {req.end_date.isoformat()} - согласована менеджером."
+        )
+
+    if notif_type == Notification.Type.REQUEST_REJECTED and req:
+        if is_self:
+            return (
+                f"Ваша заявка №{req.id} на отпуск "
+                f"с {req.start_date.isoformat()} по {req.end_date.isoformat()} - отклонена менеджером."
+            )
+        return (
+            f"Заявка №{req.id}{employee_label} на отпуск "
+            f"с {req.start_date.isoformat()} по {req.end_date.isoformat()} - отклонена менеджером."
+        )
+
+    if notif_type == Notification.Type.REQUEST_CREATED and req:
+        if is_self:
+            return (
+                f"Вы создали заявку №{req.id} на отпуск "
+                f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
+            )
+        return (
+            f"Создана новая заявка №{req.id}{employee_label} на отпуск "
+            f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
+        )
+
+    if notif_type == Notification.Type.REQUEST_RESCHEDULED and req:
+        if is_self:
+            return (
+                f"Вы изменили период заявки №{req.id} на отпуск. "
+                f"Новый период: {req.start_date.isoformat()} - {req.end_date.isoformat()}."
+            )
+        return (
+            f"Сотрудник{employee_label} изменил период заявки №{req.id} на отпуск. "
+            f"Новый период: {req.start_date.isoformat()} - {req.end_date.isoformat()}."
+        )
+
+    if notif_type == "vacation_reminder_14d" and req:
+        if is_self:
+            return (
+                f"До начала вашего отпуска №{req.id} осталось 14 дней "
+                f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
+            )
+        return (
+            f"До начала отпуска №{req.id}{employee_label} осталось 14 дней "
+            f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
+        )
+
+    if notif_type == Notification.Type.REMINDER_UPCOMING and req and remind_days is not None:
+        days_left = days_label(remind_days)
+        if is_self:
+            return (
+                f"До начала вашего отпуска №{req.id} осталось {days_left} "
+                f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
+            )
+        return (
+            f"До начала отпуска №{req.id}{employee_label} осталось {days_left} "
+            f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
+        )
+
+    if notif_type == "vacation_start_today" and req:
+        if is_self:
+            return (
+                f"Сегодня начинается ваш отпуск №{req.id} "
+                f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
+            )
+        return (
+            f"Сегодня начинается отпуск №{req.id}{employee_label} "
+            f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
+        )
+
+    return "Уведомление"
+
+
+def refresh_stale(objects):
+    """
+    Перерисовывает тексты, построенные по старой версии шаблонов.
+
+    objects - уведомления одной модели (Notification или BroadcastNotification).
+    Заявки с сотрудниками грузятся одним запросом, запись - одним bulk_update.
+    Возвращает число обновлённых объектов.
+    """
+    stale = [obj for obj in objects if obj.message_version != TEMPLATE_VERSION]
+    if not stale:
+        return 0
+    request_ids = {obj.request_id for obj in stale if obj.request_id}
+    requests = VacationRequest.objects.select_related('user').in_bulk(request_ids)
+    for obj in stale:
+        obj.message = render_message(
+            obj.type,
+            requests.get(obj.request_id),
+            getattr(obj, 'user_id', None),
+            obj.remind_days,
+        )
+        obj.message_version = TEMPLATE_VERSION
+    type(stale[0]).objects.bulk_update(stale, ['message', 'message_version'])
+    return len(stale)
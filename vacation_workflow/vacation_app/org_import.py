@@ -0,0 +1,553 @@
+"""
+Загрузка оргструктуры и балансов из CSV: пользователи, роли, менеджеры
+и остатки отпусков по годам.
+
+Файл с заголовком; обязательна колонка username, остальные - first_name,
+last_name, role, manager (username руководителя), year, days_remaining -
+по необходимости. Отсутствующая колонка не трогает поле, присутствующая -
+задаёт его (пустой manager - без руководителя). Строка на сотрудника и
+год, поля сотрудника в его строках должны совпадать; year и
+days_remaining задаются вместе или оба пусты.
+
+Разбор потоковый: файл читается построчно, в памяти - только сжатое
+описание сотрудников и балансов. Ссылки на менеджеров разрешаются в
+памяти (менеджер может стоять в файле позже подчинённого или быть только
+в БД), текущее состояние читается пачками по username и user_id. План -
+разница с БД: кого создать, что у кого поменять. В режиме dry_run план
+и есть результат, иначе он записывается пачками по BATCH_ROWS строк,
+каждая в своей транзакции:
+
+* новые пользователи - bulk_create по уровням подчинения, менеджер раньше
+  подчинённых, так что менеджер задаётся сразу (пароль не задан, вход -
+  после сброса пароля);
+* изменённые роли и менеджеры - UPDATE на каждое значение (со сменой
+  роли пересчитывается счётчик непрочитанных), имена - bulk_update,
+  строки графика HR - schedule_store.sync_users;
+* балансы - bulk_create, изменённые остатки - UPDATE на каждое значение.
+
+Менеджер сотрудника получает роль manager (вьюхи команды открыты только
+ей): пользователь, названный в колонке manager, становится менеджером,
+если роль ему не задана явно; явная другая роль у менеджера или
+понижение менеджера, у которого остаются подчинённые, - ошибка.
+
+Ошибки формата, ссылок и циклы подчинения собираются до записи (до
+MAX_ERRORS с номерами строк), запись начинается только при их
+отсутствии. Повторная загрузка того же файла ничего не меняет, поэтому
+прерванную запись можно просто повторить. Все изменения попадают в журнал (changes.py), так что кэши
+ответов и живые клиенты их видят.
+"""
+import csv
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from . import schedule_store, unread
+from .changes import Entity, record_changes
+from .models import User, VacationBalance
+
+USER_COLUMNS = ('first_name', 'last_name', 'role', 'manager')
+BALANCE_COLUMNS = ('year', 'days_remaining')
+COLUMNS = ('username',) + USER_COLUMNS + BALANCE_COLUMNS
+ROLES = frozenset(User.Roles.values)
+NAME_MAX_LENGTH = 150
+MIN_YEAR, MAX_YEAR = 2000, 2100
+
+BATCH_ROWS = 1000
+# строк в одном UPDATE ... CASE у bulk_update (переименования)
+UPDATE_BATCH = 100
+# IN (...) при чтении текущего состояния
+CHUNK_ROWS = 2000
+MAX_ERRORS = 50
+# изменений в отчёте; счётчики - по всем
+MAX_CHANGES = 200
+
+
+class OrgImportError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors[0] if errors else 'Ошибка загрузки')
+        self.errors = errors
+
+
+@dataclass
+class _Parsed:
+    rows: int = 0
+    # username -> (строка, {поле: значение})
+    users: dict = field(default_factory=dict)
+    # (username, год) -> (строка, остаток)
+    balances: dict = field(default_factory=dict)
+
+
+@dataclass
+class Report:
+    dry_run: bool
+    rows: int = 0
+    users_created: int = 0
+    users_updated: int = 0
+    users_unchanged: int = 0
+    balances_created: int = 0
+    balances_updated: int = 0
+    balances_unchanged: int = 0
+    # остаток меньше уже занятых заявками дней
+    overdrawn: int = 0
+    changes: list = field(default_factory=list)
+    timings: dict = field(default_factory=dict)
+
+    def add_change(self, change):
+        if len(self.changes) < MAX_CHANGES:
+            self.changes.append(change)
+
+    def as_dict(self):
+        total = sum(self.timings.values())
+        return {
+            'dry_run': self.dry_run,
+            'rows': self.rows,
+            'users': {
+                'created': self.users_created,
+                'updated': self.users_updated,
+                'unchanged': self.users_unchanged,
+            },
+            'balances': {
+                'created': self.balances_created,
+                'updated': self.balances_updated,
+                'unchanged': self.balances_unchanged,
+                'overdrawn': self.overdrawn,
+            },
+            'changes': self.changes,
+            'changes_truncated': self.users_created + self.users_updated
+            + self.balances_created + self.balances_updated > len(self.changes),
+            'seconds': {name: round(seconds, 3) for name, seconds in self.timings.items()},
+            'rows_per_second': round(self.rows / total) if total else None,
+        }
+
+
+def _clean_user(line_no, values, errors):
+    role = values.get('role')
+    if role is not None and role not in ROLES:
+        errors.append(f'Строка {line_no}: неизвестная роль {role!r}, ожидается одна из {", ".join(sorted(ROLES))}')
+    for name in ('first_name', 'last_name'):
+        if len(values.get(name) or '') > NAME_MAX_LENGTH:
+            errors.append(f'Строка {line_no}: {name} длиннее {NAME_MAX_LENGTH} символов')
+
+
+def _clean_balance(line_no, year_raw, days_raw, errors):
+    if not year_raw and not days_raw:
+        return None
+    if not year_raw or not days_raw:
+        errors.append(f'Строка {line_no}: year и days_remaining задаются вместе')
+        return None
+    try:
+        year, days = int(year_raw), int(days_raw)
+    except ValueError:
+        errors.append(f'Строка {line_no}: year и days_remaining должны быть целыми числами')
+        return None
+    if not MIN_YEAR <= year <= MAX_YEAR or days < 0:
+        errors.append(f'Строка {line_no}: год вне {MIN_YEAR}..{MAX_YEAR} или отрицательный остаток')
+        return None
+    return year, days
+
+
+def parse(lines):
+    """
+    Разбирает CSV построчно: lines - итерируемое строк (файл, поток загрузки).
+    Ошибки копятся до MAX_ERRORS и бросаются одним OrgImportError.
+    """
+    reader = csv.reader(lines)
+    parsed = _Parsed()
+    errors = []
+    header = next(reader, None)
+    columns = [name.strip().lower() for name in header or ()]
+    if 'username' not in columns:
+        raise OrgImportError(['Строка 1: нужен заголовок с колонкой username'])
+    unknown = [name for name in columns if name not in COLUMNS]
+    if unknown or len(set(columns)) != len(columns):
+        raise OrgImportError([f'Строка 1: неизвестные или повторные колонки: {", ".join(unknown) or "повтор"}'])
+    user_columns = [name for name in USER_COLUMNS if name in columns]
+    with_balances = all(name in columns for name in BALANCE_COLUMNS)
+    if not with_balances and any(name in columns for name in BALANCE_COLUMNS):
+        raise OrgImportError(['Строка 1: колонки year и days_remaining задаются вместе'])
+
+    for line_no, row in enumerate(reader, start=2):
+        if len(errors) >= MAX_ERRORS:
+            break
+        if not any(cell.strip() for cell in row):
+            continue
+        parsed.rows += 1
+        if len(row) != len(columns):
+            errors.append(f'Строка {line_no}: ожидается {len(columns)} колонок, получено {len(row)}')
+            continue
+        cells = dict(zip(columns, (cell.strip() for cell in row)))
+        username = cells['username']
+        try:
+            if len(username) > NAME_MAX_LENGTH:
+                raise ValidationError('too long')
+            User.username_validator(username)
+        except ValidationError:
+            errors.append(f'Строка {line_no}: некорректный username {username!r}')
+            continue
+        values = {name: cells[name] for name in user_columns}
+        if values.get('manager') == username:
+            errors.append(f'Строка {line_no}: {username} не может быть своим менеджером')
+
+        known = parsed.users.get(username)
+        if known is None:
+            _clean_user(line_no, values, errors)
+            parsed.users[username] = (line_no, values)
+        elif known[1] != values:
+            errors.append(f'Строка {line_no}: данные {username} расходятся со строкой {known[0]}')
+
+        if with_balances:
+            balance = _clean_balance(line_no, cells['year'], cells['days_remaining'], errors)
+            if balance is not None:
+                year, days = balance
+                previous = parsed.balances.get((username, year))
+                if previous is not None:
+                    errors.append(f'Строка {line_no}: баланс {username} на {year} уже задан в строке {previous[0]}')
+                else:
+                    parsed.balances[(username, year)] = (line_no, days)
+    if errors:
+        raise OrgImportError(errors)
+    return parsed
+
+
+def _chunks(items, size=CHUNK_ROWS):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+@dataclass
+class _Plan:
+    # id -> username загруженных пользователей и менеджеров (для подписей и id)
+    usernames: dict
+    # username -> dict(id, first_name, last_name, role, manager_id) из БД
+    existing: dict
+    # username -> username итогового менеджера или None (сотрудники файла)
+    managers: dict
+    # новые пользователи по уровням подчинения: менеджер создаётся раньше подчинённого
+    creates: list
+    # username -> {поле: значение} - изменить существующих
+    updates: dict
+    # (username, год) -> остаток - создать; id баланса -> (username, остаток) - изменить
+    balance_creates: dict
+    balance_updates: dict
+
+
+def _load_users(usernames):
+    existing = {}
+    for chunk in _chunks(usernames):
+        for user_id, username, first_name, last_name, role, manager_id in (
+            User.objects
+            .filter(username__in=chunk)
+            .values_list('id', 'username', 'first_name', 'last_name', 'role', 'manager_id')
+        ):
+            existing[username] = {
+                'id': user_id,
+                'first_name': first_name,
+                'last_name': last_name,
+                'role': role,
+                'manager_id': manager_id,
+            }
+    return existing
+
+
+def _levels(parsed, managers, errors):
+    """
+    Уровень в цепочке подчинения после загрузки (0 - без менеджера);
+    managers - итоговые менеджеры сотрудников файла и их цепочек в БД.
+    Нужен только порядок создания, поэтому уровень сотрудника вне файла
+    считается так же. Цикл подчинения - ошибка.
+    """
+    levels = {}
+    for username in parsed.users:
+        chain, on_chain = [], set()
+        node = username
+        while node in managers and node not in levels:
+            if node in on_chain:
+                errors.append(f'Строка {parsed.users[username][0]}: цикл подчинения через {node}')
+                levels.update((member, 0) for member in chain)
+                break
+            chain.append(node)
+            on_chain.add(node)
+            node = managers[node]
+        else:
+            base = levels.get(node, -1)
+            levels.update((member, base + i) for i, member in enumerate(reversed(chain), start=1))
+    return levels
+
+
+def _manager_roles(parsed, existing, managers, errors):
+    """
+    Роли менеджеров после загрузки. Возвращает {username: строка} тех, кого
+    надо повысить до manager (строка - первого подчинённого в файле);
+    конфликты с явной ролью и понижение менеджера с подчинёнными - в errors.
+    """
+    promoted = {}
+    for username, (line_no, _) in parsed.users.items():
+        manager = managers[username]
+        if not manager or manager in promoted:
+            continue
+        manager_line, manager_values = parsed.users.get(manager, (None, {}))
+        role = manager_values.get('role')
+        if role is None:
+            current = existing.get(manager)
+            if current is None or current['role'] != User.Roles.MANAGER:
+                promoted[manager] = line_no
+        elif role != User.Roles.MANAGER:
+            errors.append(
+                f'Строка {manager_line}: {manager} - менеджер {username} (строка {line_no}), '
+                f'роль должна быть {User.Roles.MANAGER}, а не {role}'
+            )
+
+    demoted = {
+        existing[username]['id']: line_no
+        for username, (line_no, values) in parsed.users.items()
+        if username in existing and existing[username]['role'] == User.Roles.MANAGER
+        and values.get('role', User.Roles.MANAGER) != User.Roles.MANAGER
+    }
+    for chunk in _chunks(demoted):
+        # подчинённые из файла уже проверены выше - остаются те, кого в файле нет
+        remaining = (
+            User.objects
+            .filter(manager_id__in=chunk)
+            .exclude(username__in=list(parsed.users))
+            .values_list('manager_id', 'username')
+        )
+        for manager_id, subordinate in remaining:
+            # одной ошибки на менеджера достаточно
+            line_no = demoted.pop(manager_id, None)
+            if line_no is not None:
+                errors.append(
+                    f'Строка {line_no}: у менеджера остаётся подчинённый {subordinate}, '
+                    f'роль должна быть {User.Roles.MANAGER}'
+                )
+    return promoted
+
+
+def _plan(parsed, report):
+    referenced = {values['manager'] for _, values in parsed.users.values() if values.get('manager')}
+    existing = _load_users(set(parsed.users) | referenced)
+    usernames = {values['id']: username for username, values in existing.items()}
+    # цепочки менеджеров вверх до корня - запрос на уровень оргструктуры:
+    # цикл может замкнуться через сотрудников, которых в файле нет
+    manager_ids = {values['id']: values['manager_id'] for values in existing.values()}
+    missing_ids = {m for m in manager_ids.values() if m and m not in manager_ids}
+    while missing_ids:
+        for chunk in _chunks(missing_ids):
+            rows = User.objects.filter(id__in=chunk).values_list('id', 'username', 'manager_id')
+            for user_id, username, manager_id in rows:
+                usernames[user_id] = username
+                manager_ids[user_id] = manager_id
+        missing_ids = {m for m in manager_ids.values() if m and m not in manager_ids}
+
+    errors = []
+    # username -> username менеджера после загрузки (None - без менеджера)
+    managers = {
+        usernames[user_id]: usernames.get(manager_id)
+        for user_id, manager_id in manager_ids.items()
+        if usernames[user_id] not in parsed.users
+    }
+    for username, (line_no, values) in parsed.users.items():
+        if 'manager' in values:
+            manager = values['manager'] or None
+            if manager and manager not in parsed.users and manager not in existing:
+                errors.append(f'Строка {line_no}: менеджер {manager!r} не найден ни в файле, ни в системе')
+        else:
+            current = existing.get(username)
+            manager = usernames.get(current['manager_id']) if current else None
+        managers[username] = manager
+        if len(errors) >= MAX_ERRORS:
+            break
+    if not errors:
+        levels = _levels(parsed, managers, errors)
+    if not errors:
+        promoted = _manager_roles(parsed, existing, managers, errors)
+    if errors:
+        raise OrgImportError(errors[:MAX_ERRORS])
+
+    creates = {}
+    updates = {}
+    for username, line_no in promoted.items():
+        if username not in parsed.users:
+            # менеджер только в БД: роль меняется без строки в файле, строка - его подчинённого
+            updates[username] = {'role': User.Roles.MANAGER}
+            report.users_updated += 1
+            report.add_change({'line': line_no, 'username': username, 'action': 'update_user', 'changes': {
+                'role': [existing[username]['role'], User.Roles.MANAGER],
+            }})
+    for username, (line_no, values) in parsed.users.items():
+        if username in promoted:
+            values = dict(values, role=User.Roles.MANAGER)
+        current = existing.get(username)
+        if current is None:
+            creates.setdefault(levels[username], []).append((username, values))
+            report.users_created += 1
+            report.add_change({'line': line_no, 'username': username, 'action': 'create_user', 'changes': {
+                name: [None, value] for name, value in values.items() if value
+            }})
+            continue
+        old = dict(current, manager=usernames.get(current['manager_id'], '') if current['manager_id'] else '')
+        diff = {name: [old[name], value] for name, value in values.items() if old[name] != value}
+        if diff:
+            updates[username] = values
+            report.users_updated += 1
+            report.add_change({'line': line_no, 'username': username, 'action': 'update_user', 'changes': diff})
+        else:
+            report.users_unchanged += 1
+
+    years = {year for _, year in parsed.balances}
+    balances = {}
+    for chunk in _chunks({existing[u]['id'] for u, _ in parsed.balances if u in existing}):
+        for balance_id, user_id, year, days, reserved, consumed in (
+            VacationBalance.objects
+            .filter(user_id__in=chunk, year__in=years)
+            .values_list('id', 'user_id', 'year', 'days_remaining', 'reserved_days', 'consumed_days')
+        ):
+            balances[(usernames[user_id], year)] = (balance_id, days, reserved + consumed)
+
+    balance_creates, balance_updates = {}, {}
+    for (username, year), (line_no, days) in parsed.balances.items():
+        current = balances.get((username, year))
+        if current is None:
+            balance_creates[(username, year)] = days
+            report.balances_created += 1
+            report.add_change({
+                'line': line_no, 'username': username, 'action': 'create_balance',
+                'changes': {'year': [None, year], 'days_remaining': [None, days]},
+            })
+            continue
+        balance_id, old_days, taken = current
+        if days < taken:
+            report.overdrawn += 1
+        if days == old_days:
+            report.balances_unchanged += 1
+            continue
+        balance_updates[balance_id] = (username, days)
+        report.balances_updated += 1
+        report.add_change({
+            'line': line_no, 'username': username, 'action': 'update_balance',
+            'changes': {'year': [year, year], 'days_remaining': [old_days, days]},
+        })
+    return _Plan(
+        usernames=usernames,
+        existing=existing,
+        managers=managers,
+        creates=[creates[level] for level in sorted(creates)],
+        updates=updates,
+        balance_creates=balance_creates,
+        balance_updates=balance_updates,
+    )
+
+
+def _write(plan):
+    now = timezone.now()
+    ids = {username: user_id for user_id, username in plan.usernames.items()}
+
+    def manager_id(username):
+        manager = plan.managers[username]
+        return ids[manager] if manager else None
+
+    # уровни по порядку: id менеджера известен к моменту вставки подчинённого
+    for level in plan.creates:
+        for chunk in _chunks(level, BATCH_ROWS):
+            with transaction.atomic():
+                created = User.objects.bulk_create([
+                    User(
+                        username=username,
+                        first_name=values.get('first_name', ''),
+                        last_name=values.get('last_name', ''),
+                        role=values.get('role') or User.Roles.EMPLOYEE,
+                        manager_id=manager_id(username),
+                        password=make_password(None),
+                    )
+                    for username, values in chunk
+                ])
+                record_changes(Entity.USER, ((user.id, user.id, user.manager_id) for user in created))
+            ids.update((user.username, user.id) for user in created)
+
+    for chunk in _chunks(plan.updates.items(), BATCH_ROWS):
+        # роль и менеджер у многих общие - UPDATE на значение; имена - bulk_update
+        by_role, by_manager = defaultdict(list), defaultdict(list)
+        renamed, journal, schedule = [], [], []
+        for username, values in chunk:
+            current = plan.existing[username]
+            user_id = current['id']
+            final = dict(current, **{name: value for name, value in values.items() if name != 'manager'})
+            final['manager_id'] = manager_id(username)
+            if final['role'] != current['role']:
+                by_role[final['role']].append(user_id)
+            if final['manager_id'] != current['manager_id']:
+                by_manager[final['manager_id']].append(user_id)
+                if current['manager_id'] is not None:
+                    # прежний менеджер тоже должен узнать, что сотрудник ушёл из команды
+                    journal.append((user_id, user_id, current['manager_id']))
+            if (final['first_name'], final['last_name']) != (current['first_name'], current['last_name']):
+                renamed.append(User(
+                    id=user_id, first_name=final['first_name'], last_name=final['last_name'], updated_at=now,
+                ))
+            if any(current[name] != final[name] for name in ('first_name', 'last_name', 'manager_id')):
+                schedule.append(user_id)
+            journal.append((user_id, user_id, final['manager_id']))
+        with transaction.atomic():
+            for role, user_ids in by_role.items():
+                User.objects.filter(id__in=user_ids).update(role=role, updated_at=now)
+                # broadcast видны по роли - счётчик непрочитанных считаем заново
+                unread.recount(user_ids)
+            for new_manager_id, user_ids in by_manager.items():
+                User.objects.filter(id__in=user_ids).update(manager_id=new_manager_id, updated_at=now)
+            # CASE из bulk_update растёт с пачкой - пачки поменьше
+            User.objects.bulk_update(renamed, ['first_name', 'last_name', 'updated_at'], batch_size=UPDATE_BATCH)
+            # UPDATE в обход save(): сигнал user_saved не сработает
+            schedule_store.sync_users(schedule)
+            record_changes(Entity.USER, journal)
+
+    for chunk in _chunks(plan.balance_creates.items(), BATCH_ROWS):
+        with transaction.atomic():
+            created = VacationBalance.objects.bulk_create([
+                VacationBalance(user_id=ids[username], year=year, days_remaining=days)
+                for (username, year), days in chunk
+            ])
+            record_changes(Entity.BALANCE, (
+                (balance.id, balance.user_id, manager_id(username))
+                for balance, ((username, _), _) in zip(created, chunk)
+            ))
+
+    for chunk in _chunks(plan.balance_updates.items(), BATCH_ROWS):
+        # остатков различных значений немного: UPDATE на значение, как unread.increment
+        by_days = defaultdict(list)
+        for balance_id, (_, days) in chunk:
+            by_days[days].append(balance_id)
+        with transaction.atomic():
+            for days, balance_ids in by_days.items():
+                VacationBalance.objects.filter(id__in=balance_ids).update(days_remaining=days)
+            record_changes(Entity.BALANCE, (
+                (balance_id, ids[username], manager_id(username))
+                for balance_id, (username, _) in chunk
+            ))
+
+
+def run(lines, dry_run=False):
+    """
+    Загружает CSV из lines (итерируемое строк); dry_run - только план.
+    Возвращает Report со счётчиками, первыми MAX_CHANGES изменениями и
+    временем этапов; ошибки - OrgImportError.
+    """
+    report = Report(dry_run=dry_run)
+    started = time.perf_counter()
+    parsed = parse(lines)
+    report.rows = parsed.rows
+    report.timings['parse'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    plan = _plan(parsed, report)
+    report.timings['plan'] = time.perf_counter() - started
+
+    if not dry_run:
+        started = time.perf_counter()
+        _write(plan)
+        report.timings['write'] = time.perf_counter() - started
+    return report
@@ -0,0 +1,118 @@
+"""
+Keyset-пагинация списков по (created_at, id).
+
+Курсор - непрозрачная строка с меткой и id последней отданной строки.
+Следующая страница выбирается условием "строго раньше курсора", поэтому
+стоимость запроса не зависит от номера страницы, в отличие от OFFSET.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, pk: int) -> str:
+    raw = f'{created_at.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _cursor_parts(cursor: str):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+    except (ValueError, UnicodeDecodeError):
+        raise PaginationError('Некорректный курсор')
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_raw, pk_raw = _cursor_parts(cursor)
+        return datetime.fromisoformat(created_raw), int(pk_raw)
+    except ValueError:
+        raise PaginationError('Некорректный курсор')
+
+
+def encode_merged_cursor(created_at: datetime, source: int, pk: int) -> str:
+    raw = f'{created_at.isoformat()}|{source}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_merged_cursor(cursor: str):
+    try:
+        created_raw, source_raw, pk_raw = _cursor_parts(cursor)
+        return datetime.fromisoformat(created_raw), int(source_raw), int(pk_raw)
+    except ValueError:
+        raise PaginationError('Некорректный курсор')
+
+
+def parse_limit(raw) -> int:
+    if raw in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PaginationError('limit должен быть числом')
+    if limit <= 0:
+        raise PaginationError('limit должен быть больше нуля')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def keyset_page(qs, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Страница qs от новых к старым: (объекты, курсор следующей страницы или None).
+
+    qs не должен быть отсортирован - порядок (-created_at, -id) задаётся здесь.
+    """
+    qs = qs.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    # берём на одну строку больше, чтобы понять, есть ли следующая страница
+    items = list(qs[:limit + 1])
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return items, next_cursor
+
+
+def merged_keyset_page(sources, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Одна лента из нескольких таблиц от новых к старым: ([(метка, объект)], курсор или None).
+
+    sources - {метка: qs}, метки - целые числа. id разных таблиц независимы
+    и между собой не сравниваются: порядок ленты - (created_at, метка, id)
+    по убыванию, при равном created_at строки таблицы с большей меткой идут
+    раньше. Курсор хранит метку последней строки, поэтому строки с той же
+    меткой времени из другой таблицы не пропадают и не повторяются. Из
+    каждой таблицы берётся limit + 1 строк; не попавшие на страницу лежат
+    за курсором и придут следующей страницей.
+    """
+    position = decode_merged_cursor(cursor) if cursor else None
+    rows = []
+    for source, qs in sources.items():
+        qs = qs.order_by('-created_at', '-id')
+        if position:
+            created_at, last_source, pk = position
+            before = Q(created_at__lt=created_at)
+            if source < last_source:
+                before |= Q(created_at=created_at)
+            elif source == last_source:
+                before |= Q(created_at=created_at, id__lt=pk)
+            qs = qs.filter(before)
+        rows += [(source, obj) for obj in qs[:limit + 1]]
+    rows.sort(key=lambda row: (row[1].created_at, row[0], row[1].id), reverse=True)
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        source, last = page[-1]
+        next_cursor = encode_merged_cursor(last.created_at, source, last.id)
+    return page, next_cursor
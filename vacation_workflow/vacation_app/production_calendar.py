@@ -0,0 +1,164 @@
+"""
+Производственный календарь: рабочие дни с учётом праздников и переносов.
+
+Дни заявки - рабочие дни её периода: выходные и нерабочие праздничные дни
+баланс не расходуют. Обычная неделя (понедельник..пятница рабочие)
+поправляется записями Holiday: праздник или перенесённый выходной в будни,
+рабочая суббота по переносу.
+
+Для каждого года строится массив накопленных рабочих дней
+
+    prefix[i] = рабочих дней в [1 января, 1 января + i),  i = 0..365(366)
+
+и рабочие дни периода внутри года - prefix[конец + 1] - prefix[начало],
+для периода через Новый год - хвост одного года плюс начало следующего:
+O(1) на период без обращения к БД.
+
+Записи Holiday читаются одним запросом на процесс и перечитываются не чаще
+раза в settings.PRODUCTION_CALENDAR_TTL секунд (импорт календаря в другом
+процессе); в своём процессе правка Holiday сбрасывает массивы сразу
+(signals.py). Массивы года строятся при первом обращении к нему.
+"""
+import threading
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .changes import Entity, record_changes
+from .models import Holiday, User, VacationBalance, VacationRequest
+
+CHUNK_ROWS = 2000
+
+_lock = threading.Lock()
+# (время загрузки, {дата: рабочий ли}, {год: prefix})
+_state = None
+
+
+def invalidate():
+    global _state
+    _state = None
+
+
+def _current():
+    global _state
+    state = _state
+    if state is None or time.monotonic() - state[0] > settings.PRODUCTION_CALENDAR_TTL:
+        with _lock:
+            state = _state
+            if state is None or time.monotonic() - state[0] > settings.PRODUCTION_CALENDAR_TTL:
+                overrides = {
+                    day: kind == Holiday.Kind.WORKDAY
+                    for day, kind in Holiday.objects.values_list('date', 'kind')
+                }
+                state = _state = (time.monotonic(), overrides, {})
+    return state
+
+
+def _prefix(year):
+    _, overrides, prefixes = _current()
+    prefix = prefixes.get(year)
+    if prefix is None:
+        first = date(year, 1, 1)
+        days_in_year = (date(year + 1, 1, 1) - first).days
+        working = (
+            overrides.get(day, day.weekday() < 5)
+            for day in (first + timedelta(days=i) for i in range(days_in_year))
+        )
+        # гонка двух потоков безвредна: оба построят одинаковый массив
+        prefix = prefixes[year] = [0, *accumulate(working)]
+    return prefix
+
+
+def working_days(start_date, end_date) -> int:
+    """Рабочих дней в [start_date, end_date] включительно."""
+    total = 0
+    for year in range(start_date.year, end_date.year + 1):
+        prefix = _prefix(year)
+        first = date(year, 1, 1)
+        lo = (max(start_date, first) - first).days
+        hi = (min(end_date, date(year, 12, 31)) - first).days + 1
+        if hi > lo:
+            total += prefix[hi] - prefix[lo]
+    return total
+
+
+def year_overrides(year):
+    """Отличия года от обычной недели: (нерабочие дни, рабочие дни) - списки дат."""
+    _, overrides, _ = _current()
+    days = sorted((day, working) for day, working in overrides.items() if day.year == year)
+    return [day for day, working in days if not working], [day for day, working in days if working]
+
+
+def _years_filter(years):
+    in_years = Q()
+    for year in years:
+        in_years |= Q(start_date__lte=date(year, 12, 31), end_date__gte=date(year, 1, 1))
+    return in_years
+
+
+def replace_years(days_by_year):
+    """
+    Заменяет календарь годов: days_by_year - {год: [(дата, kind, name), ...]}.
+
+    Дни заявок, задевающих эти годы, пересчитываются; по сотрудникам, у кого
+    они поменялись, пересобираются итоги балансов (ledger.rebuild) и строки
+    графика HR, изменения пишутся в журнал. Возвращает число заявок
+    с изменившимися днями.
+    """
+    try:
+        with transaction.atomic():
+            return _replace_years(days_by_year)
+    finally:
+        # и после отката: массивы могли успеть собраться по незакоммиченным записям
+        invalidate()
+
+
+def _replace_years(days_by_year):
+    from . import ledger, schedule_store
+
+    years = sorted(days_by_year)
+    if not years:
+        return 0
+    Holiday.objects.filter(date__year__in=years).delete()
+    Holiday.objects.bulk_create([
+        Holiday(date=day, kind=kind, name=name)
+        for year in years
+        for day, kind, name in days_by_year[year]
+    ])
+    invalidate()
+
+    changed = []
+    requests = (
+        VacationRequest.objects
+        .filter(_years_filter(years))
+        .only('id', 'user_id', 'start_date', 'end_date', 'days', 'status')
+        .order_by('id')
+    )
+    for request_obj in requests.iterator(chunk_size=CHUNK_ROWS):
+        days = working_days(request_obj.start_date, request_obj.end_date)
+        if days != request_obj.days:
+            request_obj.days = days
+            changed.append(request_obj)
+    VacationRequest.objects.bulk_update(changed, ['days'], batch_size=CHUNK_ROWS)
+    if not changed:
+        return 0
+
+    user_ids = sorted({r.user_id for r in changed})
+    ledger.rebuild(user_ids=user_ids)
+    approved = [r.id for r in changed if r.status == VacationRequest.Status.APPROVED]
+    for i in range(0, len(approved), CHUNK_ROWS):
+        schedule_store.sync_requests(approved[i:i + CHUNK_ROWS])
+
+    # итоги и дни поменялись в обход вьюх - сообщаем клиентам и кэшам через журнал
+    managers = {}
+    for i in range(0, len(user_ids), CHUNK_ROWS):
+        managers.update(User.objects.filter(id__in=user_ids[i:i + CHUNK_ROWS]).values_list('id', 'manager_id'))
+    record_changes(Entity.REQUEST, ((r.id, r.user_id, managers.get(r.user_id)) for r in changed))
+    for i in range(0, len(user_ids), CHUNK_ROWS):
+        balances = VacationBalance.objects.filter(user_id__in=user_ids[i:i + CHUNK_ROWS]).values_list('id', 'user_id')
+        record_changes(Entity.BALANCE, ((b_id, user_id, managers.get(user_id)) for b_id, user_id in balances))
+    return len(changed)
@@ -0,0 +1,236 @@
+"""
+Генерация напоминаний о предстоящих отпусках.
+
+Напоминание за N дней (offset) получают сотрудник и его менеджер, для
+offset из списка HR - ещё и роль HR (одно broadcast-уведомление на заявку). Обработанные дни отмечаются в
+ReminderWatermark: если запуск пропущен, следующий догоняет все
+пропущенные дни одним запросом на каждый offset (диапазон start_date
+по индексу), а не день за днём.
+
+Работу можно разделить между несколькими процессами по user_id заявки
+(Shard(index, count)); у каждого шарда своя отметка.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Max
+from django.db.models.functions import Mod
+
+from . import broadcasts, unread
+from .changes import record_notifications
+from .models import BroadcastNotification, Notification, ReminderWatermark, User, VacationRequest
+from .notification_texts import TEMPLATE_VERSION, render_message
+
+DEFAULT_OFFSETS = (14, 0)
+# по требованиям HR достаточно 14-дневного напоминания
+DEFAULT_HR_OFFSETS = (14,)
+
+# размер пачки id заявок в IN (...) и строк в bulk_create
+BATCH_SIZE = 500
+
+
+@dataclass(frozen=True)
+class Shard:
+    index: int = 0
+    count: int = 1
+
+    @classmethod
+    def parse(cls, raw):
+        """'i/n' -> Shard(i, n)."""
+        try:
+            index, count = (int(part) for part in raw.split('/'))
+        except ValueError:
+            raise ValueError('Шард задаётся как i/n, например 0/4')
+        if count <= 0 or not 0 <= index < count:
+            raise ValueError('Номер шарда должен быть в диапазоне 0..n-1')
+        return cls(index, count)
+
+    @property
+    def key(self):
+        return f'{self.index}/{self.count}'
+
+    def filter(self, qs):
+        if self.count == 1:
+            return qs
+        return qs.annotate(shard=Mod(F('user_id'), self.count)).filter(shard=self.index)
+
+
+def reminder_type(offset):
+    if offset == 14:
+        return Notification.Type.VACATION_REMINDER_14D
+    if offset == 0:
+        return Notification.Type.VACATION_START_TODAY
+    return Notification.Type.REMINDER_UPCOMING
+
+
+def _base_queryset():
+    """Заявки, о которых напоминаем: согласованные и подтверждённые сотрудником."""
+    return VacationRequest.objects.filter(
+        status=VacationRequest.Status.APPROVED,
+        confirmed_by_employee=True,
+    )
+
+
+def get_watermark(shard=Shard()):
+    return (
+        ReminderWatermark.objects
+        .filter(key=shard.key)
+        .values_list('last_date', flat=True)
+        .first()
+    )
+
+
+def set_watermark(last_date, shard=Shard()):
+    ReminderWatermark.objects.update_or_create(key=shard.key, defaults={'last_date': last_date})
+
+
+def generate(date_from, date_to, offsets=DEFAULT_OFFSETS, hr_offsets=DEFAULT_HR_OFFSETS, shard=Shard()):
+    """
+    Создаёт напоминания за дни date_from..date_to включительно.
+
+    Для дня D и offset N напоминаем о заявках, начинающихся D + N, поэтому
+    весь диапазон дней по одному offset - один запрос по start_date.
+    HR получают одно broadcast-уведомление на заявку, а не строку на
+    каждого сотрудника HR. Возвращает (created, skipped).
+    """
+    created = 0
+    skipped = 0
+    for offset in offsets:
+        rows = list(
+            shard.filter(_base_queryset())
+            .filter(start_date__range=(date_from + timedelta(days=offset), date_to + timedelta(days=offset)))
+            .values_list('id', 'user_id', 'user__manager_id')
+        )
+        for start in range(0, len(rows), BATCH_SIZE):
+            batch = rows[start:start + BATCH_SIZE]
+            batch_created, batch_skipped = _create_personal(batch, offset)
+            created += batch_created
+            skipped += batch_skipped
+            if offset in hr_offsets:
+                batch_created, batch_skipped = _create_hr_broadcasts(batch, offset)
+                created += batch_created
+                skipped += batch_skipped
+    return created, skipped
+
+
+def _requests_with_owners(request_ids):
+    """Заявки пачки вместе с сотрудниками - для текстов уведомлений, один запрос."""
+    return VacationRequest.objects.select_related('user').in_bulk(set(request_ids))
+
+
+def _create_personal(rows, offset):
+    """Личные напоминания сотруднику и его менеджеру."""
+    notif_type = reminder_type(offset)
+    wanted = set()
+    for request_id, user_id, manager_id in rows:
+        wanted.add((user_id, request_id))
+        if manager_id:
+            wanted.add((manager_id, request_id))
+
+    request_ids = [request_id for request_id, _, _ in rows]
+    existing = set(
+        Notification.objects
+        .filter(type=notif_type, remind_days=offset, request_id__in=request_ids)
+        .values_list('user_id', 'request_id')
+    )
+    missing = wanted - existing
+    if not missing:
+        return 0, len(wanted)
+
+    requests = _requests_with_owners(request_id for _, request_id in missing)
+    with transaction.atomic():
+        last_id = Notification.objects.aggregate(last=Max('id'))['last'] or 0
+        # ignore_conflicts: параллельный запуск не упадёт на уникальном индексе
+        Notification.objects.bulk_create(
+            [
+                Notification(
+                    user_id=recipient_id,
+                    request_id=request_id,
+                    type=notif_type,
+                    remind_days=offset,
+                    message=render_message(notif_type, requests[request_id], recipient_id, offset),
+                    message_version=TEMPLATE_VERSION,
+                )
+                for recipient_id, request_id in missing
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        # при ignore_conflicts id не возвращаются - добираем только что вставленные
+        new_rows = list(
+            Notification.objects
+            .filter(id__gt=last_id, type=notif_type, remind_days=offset, request_id__in=request_ids)
+            .values_list('id', 'user_id')
+        )
+        record_notifications(new_rows)
+        unread.increment(Counter(user_id for _, user_id in new_rows))
+
+    return len(new_rows), len(wanted) - len(new_rows)
+
+
+def _create_hr_broadcasts(rows, offset):
+    """Одно broadcast-напоминание для роли HR на каждую заявку."""
+    notif_type = reminder_type(offset)
+    request_ids = [request_id for request_id, _, _ in rows]
+    existing = set(
+        BroadcastNotification.objects
+        .filter(role=User.Roles.HR, type=notif_type, remind_days=offset, request_id__in=request_ids)
+        .values_list('request_id', flat=True)
+    )
+    missing = [request_id for request_id in request_ids if request_id not in existing]
+    if not missing:
+        return 0, len(request_ids)
+
+    requests = _requests_with_owners(missing)
+    with transaction.atomic():
+        last_id = broadcasts.last_id()
+        BroadcastNotification.objects.bulk_create(
+            [
+                BroadcastNotification(
+                    role=User.Roles.HR,
+                    type=notif_type,
+                    request_id=request_id,
+                    remind_days=offset,
+                    message=render_message(notif_type, requests[request_id], None, offset),
+                    message_version=TEMPLATE_VERSION,
+                )
+                for request_id in missing
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        new_ids = list(
+            BroadcastNotification.objects
+            .filter(id__gt=last_id, role=User.Roles.HR, type=notif_type, remind_days=offset, request_id__in=missing)
+            .values_list('id', flat=True)
+        )
+        broadcasts.record_broadcasts((broadcast_id, User.Roles.HR) for broadcast_id in new_ids)
+        unread.increment_role(User.Roles.HR, len(new_ids))
+
+    return len(new_ids), len(request_ids) - len(new_ids)
+
+
+def catch_up(today, offsets=DEFAULT_OFFSETS, hr_offsets=DEFAULT_HR_OFFSETS, shard=Shard(), since=None, max_days=None):
+    """
+    Обрабатывает все дни после отметки шарда по today включительно и
+    сдвигает отметку. Без отметки (первый запуск) обрабатывается только today.
+    Сам today обрабатывается при каждом запуске: заявки, согласованные
+    в течение дня, получат напоминание при следующем пробуждении.
+
+    since - принудительно начать с этой даты; max_days - не догонять дальше
+    стольких дней назад. Возвращает (date_from, created, skipped);
+    date_from = None, если since позже today.
+    """
+    if since is None:
+        watermark = get_watermark(shard)
+        since = min(watermark + timedelta(days=1), today) if watermark else today
+    if max_days is not None:
+        since = max(since, today - timedelta(days=max_days))
+    if since > today:
+        return None, 0, 0
+
+    created, skipped = generate(since, today, offsets, hr_offsets, shard)
+    set_watermark(today, shard)
+    return since, created, skipped
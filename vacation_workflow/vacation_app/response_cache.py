@@ -0,0 +1,176 @@
+"""
+Кэш готовых JSON-ответов горячих GET-эндпоинтов в памяти процесса.
+
+Списки подразделений, график HR, балансы и заявки команды одинаковы для
+всех кадровиков (или для менеджера и его повторных опросов), а пересчитываются
+на каждый запрос. Ответ кэшируется по ключу
+
+    (эндпоинт, зона видимости, дата, параметры запроса) -> (версия данных, тело)
+
+Зона - ('hr',) для всех кадровиков, ('manager', id) для менеджера,
+('user', id) для сотрудника (как у подписок live.py). Версия - id последней
+записи журнала изменений в этой зоне: каждая запись из views.py сдвигает
+её, и старый ответ просто перестаёт совпадать - без TTL и без устаревших
+ответов. На ключ хранится только последняя версия, вытеснение - LRU
+по суммарному размеру тел (settings.RESPONSE_CACHE_MAX_BYTES).
+
+Кэш у каждого процесса свой: корректность держится на версии из БД,
+процессы лишь прогревают его независимо. Счётчики попаданий и промахов -
+GET /api/hr/response_cache.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from .changes import hr_version, latest_version
+from .models import User
+
+# оценка накладных расходов на запись сверх тела ответа (ключ, кортеж, узел словаря)
+ENTRY_OVERHEAD = 256
+
+
+def scope_of(user):
+    """Зона видимости пользователя для ключа кэша."""
+    role = getattr(user, 'role', None)
+    if role == User.Roles.HR:
+        return ('hr',)
+    if role == User.Roles.MANAGER:
+        return ('manager', user.id)
+    return ('user', user.id)
+
+
+def scope_version(user):
+    # для HR - общая версия зоны, чтобы кадровики делили один ответ
+    if getattr(user, 'role', None) == User.Roles.HR:
+        return hr_version()
+    return latest_version(user)
+
+
+def request_version(request):
+    """scope_version пользователя запроса - один раз на запрос (её же берут ETag в etags.py)."""
+    version = getattr(request, '_scope_version', None)
+    if version is None:
+        version = request._scope_version = scope_version(request.user)
+    return version
+
+
+class _EndpointStats:
+    __slots__ = ('hits', 'misses')
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+
+class ResponseCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (version, content_type, content)
+        self._bytes = 0
+        self._evictions = 0
+        self._stats = {}  # endpoint -> _EndpointStats
+
+    @staticmethod
+    def _size(content):
+        return len(content) + ENTRY_OVERHEAD
+
+    def _endpoint(self, endpoint):
+        stats = self._stats.get(endpoint)
+        if stats is None:
+            stats = self._stats[endpoint] = _EndpointStats()
+        return stats
+
+    def get(self, key, version):
+        """(content_type, content) для ключа в версии version или None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            stats = self._endpoint(key[0])
+            if entry is None or entry[0] != version:
+                stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            stats.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, version, content_type, content):
+        size = self._size(content)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None:
+                if current[0] > version:
+                    # параллельный запрос уже положил более свежую версию
+                    return
+                self._bytes -= self._size(current[2])
+            self._entries[key] = (version, content_type, content)
+            self._entries.move_to_end(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= self._size(evicted)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            hits = sum(s.hits for s in self._stats.values())
+            misses = sum(s.misses for s in self._stats.values())
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self._evictions,
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / (hits + misses), 3) if hits + misses else None,
+                'endpoints': {
+                    endpoint: {'hits': s.hits, 'misses': s.misses}
+                    for endpoint, s in sorted(self._stats.items())
+                },
+            }
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_BYTES)
+
+
+def cached_response(endpoint):
+    """
+    Декоратор GET-вьюхи: отдаёт ответ из кэша, пока версия данных зоны не сдвинулась.
+
+    Кэшируются только ответы 200; заголовок X-Cache (HIT/MISS) помогает
+    при настройке размера кэша.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not response_cache.max_bytes:
+                return view(request, *args, **kwargs)
+            params = tuple(sorted((name, tuple(values)) for name, values in request.GET.lists()))
+            # дата в ключе: без ?year вьюхи берут текущий год
+            key = (endpoint, scope_of(request.user), date.today(), tuple(sorted(kwargs.items())), params)
+            # версию читаем до данных: запись между чтениями даст ответ новее
+            # своей версии (следующий запрос просто промахнётся), но не наоборот
+            version = request_version(request)
+            cached = response_cache.get(key, version)
+            if cached is not None:
+                content_type, content = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Cache'] = 'HIT'
+                return response
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                response_cache.put(key, version, response['Content-Type'], response.content)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
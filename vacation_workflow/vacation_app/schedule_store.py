@@ -0,0 +1,250 @@
+"""
+Материализованный график отпусков HR (ScheduleEntry).
+
+График года - согласованные заявки с началом в этом году, по сотрудникам
+в порядке фамилии и имени. Раньше каждый экран графика (JSON, CSV, печать)
+собирал его заново из заявок и профилей; теперь строки графика лежат
+готовыми и читаются по индексу (year[, manager_id], фамилия, имя, ...)
+без сортировки и join.
+
+Строки поддерживаются инкрементально (signals.py):
+
+* сохранение заявки - строка создаётся, обновляется или удаляется
+  (согласование, перенос, подтверждение, отклонение);
+* удаление заявки или пользователя - строка уходит каскадом;
+* смена имени или менеджера в профиле - правятся строки сотрудника
+  и строки его подчинённых (имя менеджера).
+
+Массовые изменения в обход save() (QuerySet.update) синхронизируют
+через sync_requests() и sync_users(); восстановление и прогрев после деплоя - команда
+rebuild_hr_schedule.
+
+HTML-строки печатного графика кэшируются в settings.CACHES['schedule_fragments']
+с ключом (год, сотрудник, версия). Версия - число строк сотрудника
+в графике года и самое позднее их updated_at: любая запись строки (или её
+удаление) даёт новую версию, поэтому устаревший фрагмент не читается ни
+в одном процессе, даже если кэш у каждого процесса свой; старые ключи
+уходят по TIMEOUT. В том же кэше лежит тепловая карта отсутствий года
+(heatmap.py) - с версией журнала изменений HR в ключе.
+"""
+from datetime import date
+from itertools import groupby
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ScheduleEntry, User, VacationRequest
+
+CHUNK_ROWS = 2000
+FRAGMENT_CACHE = 'schedule_fragments'
+
+# поля профиля, от которых зависят строки графика
+USER_FIELDS = frozenset({'username', 'first_name', 'last_name', 'manager', 'manager_id'})
+
+
+def full_name(username, first_name, last_name):
+    return (f"{first_name} {last_name}".strip() or username).strip()
+
+
+def year_range(year):
+    """Границы года для фильтра по диапазону дат (индексируемый, в отличие от выражения над годом)."""
+    return date(year, 1, 1), date(year, 12, 31)
+
+
+def fragment_cache():
+    return caches[FRAGMENT_CACHE]
+
+
+def fragment_key(year, user_id, version):
+    return f'schedule-print:{year}:{user_id}:{version}'
+
+
+def heatmap_key(year, version):
+    return f'schedule-heatmap:{year}:{version}'
+
+
+def _user_values(user: User):
+    manager = user.manager
+    return {
+        'user_id': user.id,
+        'manager_id': user.manager_id,
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'full_name': full_name(user.username, user.first_name, user.last_name),
+        'manager_name': full_name(manager.username, manager.first_name, manager.last_name) if manager else '',
+    }
+
+
+def _entry(request_obj: VacationRequest, user_values):
+    return ScheduleEntry(
+        request_id=request_obj.id,
+        year=request_obj.start_date.year,
+        start_date=request_obj.start_date,
+        end_date=request_obj.end_date,
+        days=request_obj.days,
+        confirmed_by_employee=request_obj.confirmed_by_employee,
+        **user_values,
+    )
+
+
+def sync_requests(request_ids):
+    """Приводит строки графика заявок request_ids к текущему состоянию заявок."""
+    request_ids = list(request_ids)
+    if not request_ids:
+        return
+    approved = list(
+        VacationRequest.objects
+        .filter(id__in=request_ids, status=VacationRequest.Status.APPROVED)
+        .select_related('user', 'user__manager')
+    )
+    users = {}
+    entries = []
+    for request_obj in approved:
+        if request_obj.user_id not in users:
+            users[request_obj.user_id] = _user_values(request_obj.user)
+        entries.append(_entry(request_obj, users[request_obj.user_id]))
+    with transaction.atomic():
+        ScheduleEntry.objects.filter(request_id__in=request_ids).delete()
+        ScheduleEntry.objects.bulk_create(entries)
+
+
+def sync_request(request_obj: VacationRequest):
+    sync_requests([request_obj.id])
+
+
+def sync_user(user: User):
+    """Имя или менеджер сотрудника поменялись: правим его строки и строки подчинённых."""
+    values = _user_values(user)
+    values.pop('user_id')
+    # UPDATE по queryset не трогает auto_now - версию строк двигаем сами
+    now = timezone.now()
+    own = ScheduleEntry.objects.filter(user_id=user.id)
+    team = ScheduleEntry.objects.filter(manager_id=user.id)
+    own.update(**values, updated_at=now)
+    team.update(manager_name=values['full_name'], updated_at=now)
+
+
+def sync_users(user_ids):
+    """
+    Пакетный sync_user (загрузка оргструктуры, UPDATE в обход save()):
+    строки сотрудников user_ids и их подчинённых пересобираются из заявок.
+    Пачка без строк в графике стоит одного запроса.
+    """
+    user_ids = list(user_ids)
+    for i in range(0, len(user_ids), CHUNK_ROWS):
+        chunk = user_ids[i:i + CHUNK_ROWS]
+        request_ids = list(
+            ScheduleEntry.objects
+            .filter(Q(user_id__in=chunk) | Q(manager_id__in=chunk))
+            .values_list('request_id', flat=True)
+        )
+        for j in range(0, len(request_ids), CHUNK_ROWS):
+            sync_requests(request_ids[j:j + CHUNK_ROWS])
+
+
+@transaction.atomic
+def rebuild(years=None):
+    """Пересобирает график с нуля (все годы или только years); возвращает число строк."""
+    stale = ScheduleEntry.objects.all()
+    approved = (
+        VacationRequest.objects
+        .filter(status=VacationRequest.Status.APPROVED)
+        .select_related('user', 'user__manager')
+        .order_by('id')
+    )
+    if years is not None:
+        stale = stale.filter(year__in=years)
+        in_years = Q()
+        for year in years:
+            in_years |= Q(start_date__range=year_range(year))
+        approved = approved.filter(in_years)
+    stale.delete()
+    transaction.on_commit(fragment_cache().clear)
+
+    users = {}
+    batch = []
+    count = 0
+    for request_obj in approved.iterator(chunk_size=CHUNK_ROWS):
+        if request_obj.user_id not in users:
+            users[request_obj.user_id] = _user_values(request_obj.user)
+        batch.append(_entry(request_obj, users[request_obj.user_id]))
+        if len(batch) >= CHUNK_ROWS:
+            ScheduleEntry.objects.bulk_create(batch)
+            count += len(batch)
+            batch = []
+    ScheduleEntry.objects.bulk_create(batch)
+    return count + len(batch)
+
+
+def _year_entries(year, manager_id=None, user_ids=None):
+    qs = ScheduleEntry.objects.filter(year=year)
+    if manager_id:
+        qs = qs.filter(manager_id=manager_id)
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+    return qs
+
+
+def entries(year, manager_id=None, user_ids=None):
+    """
+    График года: пары (сотрудник, периоды) в порядке фамилии и имени.
+
+    Сотрудник - dict(user_id, username, full_name, manager_id, manager_name),
+    период - dict(id, start_date, end_date, confirmed_by_employee, days).
+    Строки читаются курсором по индексу, без сортировки всей выборки;
+    с user_ids - только эти сотрудники, в порядке user_id.
+    """
+    qs = _year_entries(year, manager_id, user_ids)
+    # для выборки по сотрудникам порядок пачки задаёт вызывающий - идём по индексу (user, year, start_date)
+    order = ('user_id', 'start_date') if user_ids is not None else ScheduleEntry.ORDERING
+    rows = qs.order_by(*order).values_list(
+        'user_id', 'username', 'full_name', 'manager_id', 'manager_name',
+        'request_id', 'start_date', 'end_date', 'confirmed_by_employee', 'days',
+    ).iterator(chunk_size=CHUNK_ROWS)
+    for user_id, user_rows in groupby(rows, key=lambda row: row[0]):
+        periods = []
+        employee = None
+        for _, username, name, row_manager_id, manager_name, request_id, start, end, confirmed, days in user_rows:
+            if employee is None:
+                employee = {
+                    'user_id': user_id,
+                    'username': username,
+                    'full_name': name,
+                    'manager_id': row_manager_id,
+                    'manager_name': manager_name,
+                }
+            periods.append({
+                'id': request_id,
+                'start_date': start,
+                'end_date': end,
+                'confirmed_by_employee': confirmed,
+                'days': days,
+            })
+        yield employee, periods
+
+
+def employees(year, manager_id=None):
+    """
+    Сотрудники графика года в порядке выдачи: четвёрки (user_id, manager_name,
+    число периодов, версия строк сотрудника для fragment_key).
+    """
+    rows = (
+        _year_entries(year, manager_id)
+        .order_by(*ScheduleEntry.ORDERING)
+        .values_list('user_id', 'manager_name', 'updated_at')
+        .iterator(chunk_size=CHUNK_ROWS)
+    )
+    for user_id, user_rows in groupby(rows, key=lambda row: row[0]):
+        _, manager_name, latest = next(user_rows)
+        periods = 1
+        for _, _, updated_at in user_rows:
+            periods += 1
+            latest = max(latest, updated_at)
+        yield user_id, manager_name, periods, f'{periods}-{latest.timestamp():.6f}'
+
+
+def count(year, manager_id=None):
+    return _year_entries(year, manager_id).count()
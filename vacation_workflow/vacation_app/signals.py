@@ -0,0 +1,54 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import production_calendar, schedule_store
+from .changes import Action, Entity, record_changes
+from .models import Holiday, User, VacationBalance, VacationRequest
+
+
+def _record_balance(balance: VacationBalance, action):
+    # балансы правят через админку и команды, поэтому ловим их сигналами
+    manager_id = User.objects.filter(pk=balance.user_id).values_list('manager_id', flat=True).first()
+    record_changes(Entity.BALANCE, [(balance.id, balance.user_id, manager_id)], action=action)
+
+
+@receiver(post_save, sender=VacationBalance)
+def balance_saved(sender, instance, **kwargs):
+    _record_balance(instance, Action.UPSERT)
+
+
+@receiver(post_delete, sender=VacationBalance)
+def balance_deleted(sender, instance, **kwargs):
+    _record_balance(instance, Action.DELETE)
+
+
+@receiver(pre_save, sender=VacationRequest)
+def request_days(sender, instance, update_fields=None, **kwargs):
+    # рабочие дни считаем, только если они и сохранятся: иначе в памяти
+    # окажутся дни, которых нет в БД, и ledger спишет не то, что зарезервировал
+    if update_fields is None or 'days' in update_fields:
+        instance.days = production_calendar.working_days(instance.start_date, instance.end_date)
+
+
+@receiver(post_save, sender=VacationRequest)
+def request_saved(sender, instance, **kwargs):
+    # строка графика HR: согласование, перенос, подтверждение, отклонение
+    schedule_store.sync_request(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    # вход в систему сохраняет только last_login - график не трогаем
+    if update_fields is not None and not (schedule_store.USER_FIELDS & set(update_fields)):
+        return
+    schedule_store.sync_user(instance)
+
+
+@receiver(post_save, sender=Holiday)
+@receiver(post_delete, sender=Holiday)
+def holiday_changed(sender, **kwargs):
+    # правка календаря в админке; дни существующих заявок пересчитывает
+    # import_production_calendar (production_calendar.replace_years)
+    production_calendar.invalidate()
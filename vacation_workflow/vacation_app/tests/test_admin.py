@@ -0,0 +1,114 @@
+from datetime import date
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from vacation_app import ledger
+from vacation_app.changes import latest_version
+from vacation_app.models import User, VacationBalance, VacationRequest
+from vacation_app.response_cache import response_cache
+
+
+class AdminJournalTests(TestCase):
+    """Правки пользователей в админке двигают версию данных - закэшированные ответы устаревают."""
+
+    def setUp(self):
+        response_cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='x', role=User.Roles.HR)
+        self.manager = User.objects.create(username='manager', role=User.Roles.MANAGER)
+        self.other_manager = User.objects.create(username='other', role=User.Roles.MANAGER)
+        self.employee = User.objects.create(
+            username='employee', first_name='Иван', last_name='Петров',
+            role=User.Roles.EMPLOYEE, manager=self.manager,
+        )
+
+    def _balances(self, user):
+        self.client.force_login(user)
+        response = self.client.get(reverse('vacation_balances'))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def _edit_employee(self, **changes):
+        data = {
+            'username': self.employee.username,
+            'first_name': self.employee.first_name,
+            'last_name': self.employee.last_name,
+            'email': '',
+            'is_active': 'on',
+            'role': self.employee.role,
+            'manager': self.employee.manager_id,
+            'date_joined_0': timezone.localtime(self.employee.date_joined).strftime('%Y-%m-%d'),
+            'date_joined_1': timezone.localtime(self.employee.date_joined).strftime('%H:%M:%S'),
+        }
+        data.update(changes)
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:vacation_app_user_change', args=[self.employee.id]), data)
+        self.assertEqual(response.status_code, 302, response.content[:2000])
+
+    def test_rename_turns_manager_hit_into_miss(self):
+        self._balances(self.manager)
+        self.assertEqual(self._balances(self.manager)['X-Cache'], 'HIT')
+        version = latest_version(self.manager)
+
+        self._edit_employee(last_name='Сидоров')
+
+        self.assertGreater(latest_version(self.manager), version)
+        self.assertEqual(self._balances(self.manager)['X-Cache'], 'MISS')
+
+    def test_manager_change_reaches_old_and_new_manager(self):
+        versions = {m.id: latest_version(m) for m in (self.manager, self.other_manager)}
+
+        self._edit_employee(manager=self.other_manager.id)
+
+        for manager in (self.manager, self.other_manager):
+            self.assertGreater(latest_version(manager), versions[manager.id])
+
+    def test_delete_is_journaled(self):
+        version = latest_version(self.manager)
+        self.client.force_login(self.admin)
+
+        response = self.client.post(
+            reverse('admin:vacation_app_user_delete', args=[self.employee.id]), {'post': 'yes'},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertGreater(latest_version(self.manager), version)
+
+
+class VacationRequestAdminTests(TestCase):
+    """Заявки в админке не меняют то, от чего зависит резерв дней."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='x', role=User.Roles.HR)
+        employee = User.objects.create(username='employee', role=User.Roles.EMPLOYEE)
+        VacationBalance.objects.create(user=employee, year=2030, days_remaining=28)
+        self.request = VacationRequest.objects.create(
+            user=employee, start_date=date(2030, 6, 3), end_date=date(2030, 6, 7),
+        )
+        ledger.rebuild()
+        self.client.force_login(self.admin)
+
+    def test_status_and_dates_are_not_editable(self):
+        response = self.client.post(
+            reverse('admin:vacation_app_vacationrequest_change', args=[self.request.id]),
+            {'status': VacationRequest.Status.APPROVED, 'start_date': '2030-06-03', 'end_date': '2030-06-28'},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.status, VacationRequest.Status.PENDING)
+        self.assertEqual(self.request.end_date, date(2030, 6, 7))
+        self.assertEqual(
+            VacationBalance.objects.values_list('reserved_days', flat=True).get(user=self.request.user), 5,
+        )
+
+    def test_add_and_delete_are_disabled(self):
+        add = self.client.get(reverse('admin:vacation_app_vacationrequest_add'))
+        delete = self.client.post(
+            reverse('admin:vacation_app_vacationrequest_delete', args=[self.request.id]), {'post': 'yes'},
+        )
+
+        self.assertEqual(add.status_code, 403)
+        self.assertEqual(delete.status_code, 403)
+        self.assertTrue(VacationRequest.objects.filter(id=self.request.id).exists())
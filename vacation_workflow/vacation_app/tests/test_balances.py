@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from vacation_app.models import User, VacationBalance, VacationRequest
+from vacation_app.response_cache import response_cache
+
+YEAR = 2030
+
+
+class BalanceListingQueryCountTests(TestCase):
+    """Списки балансов HR и менеджера - постоянное число запросов при любом числе сотрудников и заявок."""
+
+    def setUp(self):
+        self.hr = User.objects.create(username='hr', role=User.Roles.HR)
+        self.manager = User.objects.create(username='manager', role=User.Roles.MANAGER)
+        self.seeded = 0
+
+    def _seed(self, total):
+        """Доводит число сотрудников команды до total, у каждого баланс на два года и по три заявки."""
+        users = User.objects.bulk_create([
+            User(username=f'employee{i}', role=User.Roles.EMPLOYEE, manager=self.manager)
+            for i in range(self.seeded, total)
+        ])
+        self.seeded = total
+        VacationBalance.objects.bulk_create([
+            VacationBalance(user=user, year=year, days_remaining=28, reserved_days=5)
+            for user in users for year in (YEAR, YEAR + 1)
+        ])
+        first_day = date(YEAR, 3, 4)
+        VacationRequest.objects.bulk_create([
+            VacationRequest(
+                user=user,
+                start_date=first_day + timedelta(weeks=n),
+                end_date=first_day + timedelta(weeks=n, days=4),
+                days=5,
+                status=status,
+            )
+            for user in users
+            for n, status in enumerate(VacationRequest.Status.values[:3])
+        ])
+
+    def _queries(self, user):
+        self.client.force_login(user)
+        # без кэша ответов: меряем сборку списка, а не попадание в кэш
+        with mock.patch.object(response_cache, 'max_bytes', 0), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('vacation_balances'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), len(response.json()['balances'])
+
+    def test_query_count_does_not_grow_with_data(self):
+        self._seed(5)
+        small = {user.role: self._queries(user) for user in (self.hr, self.manager)}
+        self._seed(50)
+        large = {user.role: self._queries(user) for user in (self.hr, self.manager)}
+
+        for role in small:
+            with self.subTest(role=role):
+                (small_queries, small_rows), (large_queries, large_rows) = small[role], large[role]
+                self.assertEqual((small_rows, large_rows), (10, 100))
+                self.assertEqual(small_queries, large_queries)
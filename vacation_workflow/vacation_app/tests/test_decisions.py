@@ -0,0 +1,97 @@
+from datetime import date, timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from vacation_app import decisions, ledger
+from vacation_app.models import Notification, User, VacationBalance, VacationRequest
+
+YEAR = 2030
+# понедельник: неделя пн-пт - 5 рабочих дней
+FIRST_MONDAY = date(YEAR, 6, 3)
+
+
+class BulkDecisionTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create(username='manager', role=User.Roles.MANAGER)
+        self.employee = User.objects.create(username='employee', role=User.Roles.EMPLOYEE, manager=self.manager)
+        VacationBalance.objects.create(user=self.employee, year=YEAR, days_remaining=10)
+        self.weeks = 0
+
+    def _request(self, status, user=None):
+        start = FIRST_MONDAY + timedelta(weeks=self.weeks)
+        self.weeks += 1
+        request_obj = VacationRequest.objects.create(
+            user=user or self.employee, start_date=start, end_date=start + timedelta(days=4), status=status,
+        )
+        ledger.rebuild(user_ids=[request_obj.user_id])
+        return request_obj.id
+
+    def _balance(self):
+        return VacationBalance.objects.values_list('reserved_days', 'consumed_days').get(
+            user=self.employee, year=YEAR,
+        )
+
+    def _results(self, outcomes):
+        return [(outcome.request_id, outcome.result) for outcome in outcomes]
+
+    def test_partial_apply_reports_every_request(self):
+        pending = self._request(VacationRequest.Status.PENDING)
+        first_rejected = self._request(VacationRequest.Status.REJECTED)
+        second_rejected = self._request(VacationRequest.Status.REJECTED)
+        other_manager = User.objects.create(username='other', role=User.Roles.MANAGER)
+        stranger = User.objects.create(username='stranger', role=User.Roles.EMPLOYEE, manager=other_manager)
+        foreign = self._request(VacationRequest.Status.PENDING, user=stranger)
+        self.assertEqual(self._balance(), (5, 0))
+
+        outcomes = decisions.decide(self.manager, [
+            (first_rejected, VacationRequest.Status.APPROVED),
+            (second_rejected, VacationRequest.Status.APPROVED),
+            (pending, VacationRequest.Status.APPROVED),
+            (foreign, VacationRequest.Status.REJECTED),
+            (999999, VacationRequest.Status.REJECTED),
+        ])
+
+        self.assertEqual(self._results(outcomes), [
+            (first_rejected, VacationRequest.Status.APPROVED),
+            (second_rejected, decisions.INSUFFICIENT_DAYS),
+            (pending, VacationRequest.Status.APPROVED),
+            (foreign, decisions.NOT_FOUND),
+            (999999, decisions.NOT_FOUND),
+        ])
+        self.assertEqual(outcomes[1].error.available, 0)
+        statuses = dict(VacationRequest.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[first_rejected], VacationRequest.Status.APPROVED)
+        self.assertEqual(statuses[second_rejected], VacationRequest.Status.REJECTED)
+        self.assertEqual(statuses[pending], VacationRequest.Status.APPROVED)
+        self.assertEqual(statuses[foreign], VacationRequest.Status.PENDING)
+        self.assertEqual(self._balance(), (10, 0))
+        self.assertEqual(
+            sorted(Notification.objects.values_list('request_id', flat=True)), sorted([first_rejected, pending]),
+        )
+
+    def test_repeated_decision_is_unchanged(self):
+        pending = self._request(VacationRequest.Status.PENDING)
+        decisions.decide(self.manager, [(pending, VacationRequest.Status.REJECTED)])
+
+        outcomes = decisions.decide(self.manager, [(pending, VacationRequest.Status.REJECTED)])
+
+        self.assertEqual(self._results(outcomes), [(pending, decisions.UNCHANGED)])
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertEqual(self._balance(), (0, 0))
+
+    def test_query_count_does_not_grow_with_batch(self):
+        VacationBalance.objects.filter(user=self.employee).update(days_remaining=100)
+        small = [self._request(VacationRequest.Status.PENDING) for _ in range(2)]
+        large = [self._request(VacationRequest.Status.PENDING) for _ in range(8)]
+
+        counts = []
+        for ids in (small, large):
+            with CaptureQueriesContext(connection) as queries:
+                outcomes = decisions.decide(self.manager, [(pk, VacationRequest.Status.REJECTED) for pk in ids])
+            self.assertEqual({o.result for o in outcomes}, {VacationRequest.Status.REJECTED})
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(self._balance(), (0, 0))
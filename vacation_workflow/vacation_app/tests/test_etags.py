@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from vacation_app.models import Notification, User, VacationBalance
+from vacation_app.notification_texts import TEMPLATE_VERSION
+
+
+class ETagTests(TestCase):
+    """Каждое изменение, видимое в ответе, меняет ETag; совпавший If-None-Match - 304 без сериализации."""
+
+    def setUp(self):
+        self.employee = User.objects.create(username='employee', role=User.Roles.EMPLOYEE)
+        # баланс текущего года: иначе его создаст первый же GET /vacation/balance
+        self.balance = VacationBalance.objects.create(
+            user=self.employee, year=date.today().year, days_remaining=28,
+        )
+        self.notification = Notification.objects.create(
+            user=self.employee, type=Notification.Type.REQUEST_APPROVED,
+            message='согласовано', message_version=TEMPLATE_VERSION,
+        )
+        self.client.force_login(self.employee)
+
+    def _get(self, url_name, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse(url_name), **headers)
+
+    def _assert_etag_changes(self, url_name, change):
+        etag = self._get(url_name)['ETag']
+        self.assertEqual(self._get(url_name, etag).status_code, 304)
+
+        change()
+
+        response = self._get(url_name, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_notification_read_changes_etag(self):
+        def read():
+            response = self.client.post(reverse('notification_mark_read', args=[self.notification.id]))
+            self.assertEqual(response.status_code, 200)
+        self._assert_etag_changes('notifications_list', read)
+
+    def test_notification_archive_changes_etag(self):
+        def archive():
+            Notification.objects.filter(id=self.notification.id).update(
+                is_read=True, created_at=timezone.now() - timedelta(days=200),
+            )
+            call_command('archive_notifications', pause=0, stdout=StringIO())
+            self.assertFalse(Notification.objects.filter(id=self.notification.id).exists())
+        # прочтение в обход API журнал не пишет: тег меняет именно архивация
+        self._assert_etag_changes('notifications_list', archive)
+
+    def test_balance_change_changes_etag(self):
+        def change_balance():
+            self.balance.days_remaining = 14
+            self.balance.save()
+        self._assert_etag_changes('vacation_balance', change_balance)
+
+    def test_not_modified_skips_serialization_queries(self):
+        for url_name, table in (
+            ('notifications_list', Notification._meta.db_table),
+            ('vacation_balance', VacationBalance._meta.db_table),
+        ):
+            with self.subTest(url_name):
+                etag = self._get(url_name)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self._get(url_name, etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse(
+                    [q['sql'] for q in queries.captured_queries if f'"{table}"' in q['sql']],
+                )
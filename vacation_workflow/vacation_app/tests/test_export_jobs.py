@@ -0,0 +1,85 @@
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from vacation_app import export_jobs
+from vacation_app.models import ExportJob
+
+Kind, Status = ExportJob.Kind, ExportJob.Status
+
+
+class ExportJobQueueTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patch = override_settings(EXPORT_JOBS_DIR=directory.name)
+        patch.enable()
+        self.addCleanup(patch.disable)
+
+    def test_one_active_job_per_params(self):
+        ExportJob.objects.create(kind=Kind.REQUESTS_CSV)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ExportJob.objects.create(kind=Kind.REQUESTS_CSV)
+        # завершённое задание не мешает поставить новое
+        ExportJob.objects.update(status=Status.DONE)
+        ExportJob.objects.create(kind=Kind.REQUESTS_CSV)
+
+    def test_enqueue_race_returns_the_existing_job(self):
+        existing = ExportJob.objects.create(kind=Kind.SCHEDULE_CSV, year=2030, data_version=0)
+        first = QuerySet.first
+        calls = []
+
+        def first_misses_once(qs):
+            # параллельный запрос поставил задание между проверкой и вставкой
+            calls.append(qs)
+            return None if len(calls) == 1 else first(qs)
+
+        with mock.patch.object(export_jobs, 'hr_version', return_value=0), \
+                mock.patch.object(QuerySet, 'first', first_misses_once):
+            job, created = export_jobs.enqueue(Kind.SCHEDULE_CSV, year=2030)
+
+        self.assertEqual((job.id, created), (existing.id, False))
+        self.assertEqual(ExportJob.objects.count(), 1)
+
+    def test_requeue_only_jobs_without_fresh_heartbeat(self):
+        now = timezone.now()
+        alive = ExportJob.objects.create(
+            kind=Kind.REQUESTS_CSV, status=Status.RUNNING,
+            started_at=now - timedelta(hours=2), heartbeat_at=now - timedelta(seconds=10),
+        )
+        dead = ExportJob.objects.create(
+            kind=Kind.SCHEDULE_CSV, year=2030, status=Status.RUNNING,
+            started_at=now - timedelta(minutes=10), heartbeat_at=now - timedelta(minutes=10),
+        )
+
+        self.assertEqual(export_jobs.requeue_stale(now - timedelta(minutes=5)), 1)
+
+        self.assertEqual(ExportJob.objects.get(id=alive.id).status, Status.RUNNING)
+        self.assertEqual(ExportJob.objects.get(id=dead.id).status, Status.QUEUED)
+
+    def test_worker_drops_a_job_taken_over_by_another(self):
+        ExportJob.objects.create(kind=Kind.REQUESTS_CSV)
+        job = export_jobs.claim_next()
+        # задание вернули в очередь, и его взял другой воркер
+        export_jobs.requeue_stale(timezone.now() + timedelta(seconds=1))
+        other = export_jobs.claim_next()
+
+        result = export_jobs.run(job)
+
+        self.assertEqual(result.status, Status.RUNNING)
+        self.assertEqual(result.started_at, other.started_at)
+        self.assertFalse(export_jobs.artifact_path(job).exists())
+        self.assertEqual(list(export_jobs.jobs_dir().iterdir()), [])
+
+    def test_run_writes_the_claimed_job(self):
+        ExportJob.objects.create(kind=Kind.REQUESTS_CSV)
+        job = export_jobs.run(export_jobs.claim_next())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Status.DONE)
+        self.assertTrue(export_jobs.artifact_path(job).exists())
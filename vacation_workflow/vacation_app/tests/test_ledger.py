@@ -0,0 +1,122 @@
+from datetime import date
+
+from django.test import TestCase
+from django.urls import reverse
+
+from vacation_app import production_calendar
+from vacation_app.models import Holiday, ScheduleEntry, User, VacationBalance, VacationRequest
+
+YEAR = 2030
+
+
+class ManagerDecisionLedgerTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create(username='manager', role=User.Roles.MANAGER)
+        self.employee = User.objects.create(username='employee', role=User.Roles.EMPLOYEE, manager=self.manager)
+        VacationBalance.objects.create(user=self.employee, year=YEAR, days_remaining=10)
+
+    def _create(self, start, end):
+        self.client.force_login(self.employee)
+        response = self.client.post(
+            reverse('create_request'),
+            {'start_date': start.isoformat(), 'end_date': end.isoformat()},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def _decide(self, pk, action):
+        self.client.force_login(self.manager)
+        return self.client.post(reverse(f'manager_{action}', args=[pk]))
+
+    def _balance(self):
+        return VacationBalance.objects.values_list('reserved_days', 'consumed_days').get(
+            user=self.employee, year=YEAR,
+        )
+
+    def test_approve_after_reject_without_days_left(self):
+        # пн-пт: 5 рабочих дней
+        first = self._create(date(YEAR, 6, 3), date(YEAR, 6, 7))
+        self.assertEqual(self._decide(first, 'reject').status_code, 200)
+        # освободившиеся дни заняты другой заявкой на 10 дней
+        self._create(date(YEAR, 7, 1), date(YEAR, 7, 12))
+        self.assertEqual(self._balance(), (10, 0))
+
+        response = self._decide(first, 'approve')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Недостаточно дней отпуска', response.json()['error'])
+        self.assertEqual(VacationRequest.objects.get(pk=first).status, VacationRequest.Status.REJECTED)
+        self.assertEqual(self._balance(), (10, 0))
+
+    def test_approve_after_reject_with_days_left(self):
+        first = self._create(date(YEAR, 6, 3), date(YEAR, 6, 7))
+        self._decide(first, 'reject')
+
+        response = self._decide(first, 'approve')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['request']['status'], VacationRequest.Status.APPROVED)
+        self.assertEqual(self._balance(), (5, 0))
+
+
+def _new_year_calendar(with_workday=True):
+    """Переносы вокруг 1 января YEAR + 1 (среда): 31.12 - выходной, рабочая суббота 4.01."""
+    next_year = [
+        (date(YEAR + 1, 1, day), Holiday.Kind.HOLIDAY, 'Новогодние каникулы') for day in (1, 2, 3, 6, 7, 8)
+    ]
+    if with_workday:
+        next_year.append((date(YEAR + 1, 1, 4), Holiday.Kind.WORKDAY, 'Перенос с 31 декабря'))
+    return {
+        YEAR: [(date(YEAR, 12, 31), Holiday.Kind.DAY_OFF, 'Перенос на 4 января')],
+        YEAR + 1: next_year,
+    }
+
+
+class ProductionCalendarTests(TestCase):
+    """Дни заявки через Новый год - по календарю обоих годов, с переносами."""
+
+    def setUp(self):
+        production_calendar.replace_years(_new_year_calendar())
+        self.manager = User.objects.create(username='manager', role=User.Roles.MANAGER)
+        self.employee = User.objects.create(username='employee', role=User.Roles.EMPLOYEE, manager=self.manager)
+        VacationBalance.objects.create(user=self.employee, year=YEAR, days_remaining=28)
+
+    def tearDown(self):
+        # откат TestCase сигналов не шлёт - массивы с праздниками теста сбрасываем сами
+        production_calendar.invalidate()
+
+    def test_working_days_across_year_boundary(self):
+        # пн 30.12 - чт 9.01: рабочие 30.12, суббота 4.01 и 9.01
+        self.assertEqual(production_calendar.working_days(date(YEAR, 12, 30), date(YEAR + 1, 1, 9)), 3)
+        self.assertEqual(production_calendar.working_days(date(YEAR, 12, 31), date(YEAR + 1, 1, 3)), 0)
+        self.assertEqual(production_calendar.working_days(date(YEAR + 1, 1, 4), date(YEAR + 1, 1, 4)), 1)
+
+    def test_replace_years_recomputes_stored_days(self):
+        self.client.force_login(self.employee)
+        created = self.client.post(
+            reverse('create_request'),
+            {'start_date': date(YEAR, 12, 30).isoformat(), 'end_date': date(YEAR + 1, 1, 9).isoformat()},
+            content_type='application/json',
+        )
+        self.assertEqual(created.status_code, 201, created.content)
+        request_obj = VacationRequest.objects.get(pk=created.json()['id'])
+        self.assertEqual(request_obj.days, 3)
+        self.client.force_login(self.manager)
+        self.assertEqual(self.client.post(reverse('manager_approve', args=[request_obj.id])).status_code, 200)
+        balance = VacationBalance.objects.filter(user=self.employee, year=YEAR)
+        self.assertEqual(balance.values_list('reserved_days', flat=True).get(), 3)
+
+        # календарь следующего года переиздан без рабочей субботы
+        changed = production_calendar.replace_years({YEAR + 1: _new_year_calendar(with_workday=False)[YEAR + 1]})
+
+        self.assertEqual(changed, 1)
+        request_obj.refresh_from_db()
+        self.assertEqual(request_obj.days, 2)
+        # весь отпуск списывается с года начала
+        self.assertEqual(balance.values_list('reserved_days', flat=True).get(), 2)
+        self.assertEqual(ScheduleEntry.objects.get(request=request_obj).days, 2)
+        # календарь года, который не переиздавали, остался прежним
+        self.assertTrue(Holiday.objects.filter(date=date(YEAR, 12, 31), kind=Holiday.Kind.DAY_OFF).exists())
+
+        self.assertEqual(production_calendar.replace_years(_new_year_calendar(with_workday=False)), 0)
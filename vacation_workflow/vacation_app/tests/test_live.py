@@ -0,0 +1,50 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from vacation_app import live
+
+LIMIT = 10
+
+
+@override_settings(LIVE_SSE_MAX_CONNECTIONS=LIMIT)
+class ConnectionLimitTests(SimpleTestCase):
+    def setUp(self):
+        # без фонового опроса и чтения версии из БД
+        patches = [
+            mock.patch.object(live.ChangeBus, '_ensure_started'),
+            mock.patch.object(live, 'global_version', return_value=0),
+            mock.patch.object(live, 'change_bus', live.ChangeBus()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_concurrent_connects_stop_at_the_limit(self):
+        barrier = threading.Barrier(5 * LIMIT)
+        opened = []
+
+        def connect(i):
+            barrier.wait()
+            stream = live.open_event_stream({live.user_scope(i)}, heartbeat=1)
+            if stream is not None:
+                opened.append(stream)
+
+        threads = [threading.Thread(target=connect, args=(i,)) for i in range(5 * LIMIT)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(opened), LIMIT)
+        self.assertEqual(live.change_bus.subscriber_count(), LIMIT)
+
+    def test_closing_an_unread_stream_frees_its_slot(self):
+        streams = [live.open_event_stream({live.user_scope(i)}, heartbeat=1) for i in range(LIMIT)]
+        self.assertIsNone(live.open_event_stream({live.user_scope(LIMIT)}, heartbeat=1))
+
+        streams[0].close()
+
+        self.assertEqual(live.change_bus.subscriber_count(), LIMIT - 1)
+        self.assertIsNotNone(live.open_event_stream({live.user_scope(LIMIT)}, heartbeat=1))
@@ -0,0 +1,243 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from vacation_app import org_import, unread
+from vacation_app.changes import Action, Entity
+from vacation_app.models import (
+    ArchivedNotification,
+    BroadcastNotification,
+    ChangeLogEntry,
+    Notification,
+    User,
+    VacationBalance,
+    VacationRequest,
+)
+from vacation_app.notification_texts import TEMPLATE_VERSION
+
+
+class NotificationPaginationTests(TestCase):
+    def setUp(self):
+        self.hr = User.objects.create(
+            username='hr', role=User.Roles.HR, date_joined=timezone.now() - timedelta(days=1),
+        )
+        self.client.force_login(self.hr)
+
+    def _personal(self, created_at, count):
+        rows = Notification.objects.bulk_create([
+            Notification(
+                user=self.hr, type=Notification.Type.REQUEST_CREATED,
+                message='личное', message_version=TEMPLATE_VERSION,
+            )
+            for _ in range(count)
+        ])
+        Notification.objects.filter(id__in=[n.id for n in rows]).update(created_at=created_at)
+        return [str(n.id) for n in rows]
+
+    def _broadcast(self, created_at, count):
+        rows = BroadcastNotification.objects.bulk_create([
+            BroadcastNotification(
+                role=User.Roles.HR, type=Notification.Type.REMINDER_UPCOMING,
+                message='общее', message_version=TEMPLATE_VERSION,
+            )
+            for _ in range(count)
+        ])
+        BroadcastNotification.objects.filter(id__in=[n.id for n in rows]).update(created_at=created_at)
+        return [f'b{n.id}' for n in rows]
+
+    def _all_pages(self, limit):
+        ids, cursor = [], None
+        while True:
+            params = {'limit': limit}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(reverse('notifications_list'), params).json()
+            ids += [n['id'] for n in data['notifications']]
+            cursor = data['next_cursor']
+            if not cursor:
+                return ids
+
+    def test_tied_timestamps_across_tables_are_paged_once(self):
+        now = timezone.now().replace(microsecond=0)
+        earlier = now - timedelta(hours=1)
+        # id обеих таблиц идут с 1 и совпадают; все строки одной метки времени,
+        # кроме пары более старых
+        expected = set()
+        expected.update(self._personal(now, 5), self._broadcast(now, 5))
+        expected.update(self._personal(earlier, 1), self._broadcast(earlier, 1))
+
+        for limit in (1, 2, 3, 4, 7):
+            with self.subTest(limit=limit):
+                ids = [str(i) for i in self._all_pages(limit)]
+                self.assertEqual(len(ids), len(expected))
+                self.assertEqual(set(ids), expected)
+
+
+class ArchiveNotificationsTests(TestCase):
+    def setUp(self):
+        self.employee = User.objects.create(username='employee', role=User.Roles.EMPLOYEE)
+
+    def _notifications(self, count, is_read):
+        rows = Notification.objects.bulk_create([
+            Notification(
+                user=self.employee, type=Notification.Type.REQUEST_APPROVED, is_read=is_read,
+                message='старое', message_version=TEMPLATE_VERSION,
+            )
+            for _ in range(count)
+        ])
+        Notification.objects.filter(id__in=[n.id for n in rows]).update(
+            created_at=timezone.now() - timedelta(days=200),
+        )
+        return {n.id for n in rows}
+
+    def test_every_batch_journals_deleted_notifications(self):
+        read = self._notifications(5, is_read=True)
+        unread = self._notifications(2, is_read=False)
+
+        call_command('archive_notifications', batch_size=2, pause=0, stdout=StringIO())
+
+        self.assertEqual(set(Notification.objects.values_list('id', flat=True)), unread)
+        self.assertEqual(set(ArchivedNotification.objects.values_list('id', flat=True)), read)
+        deleted = ChangeLogEntry.objects.filter(entity=Entity.NOTIFICATION, action=Action.DELETE)
+        self.assertEqual(set(deleted.values_list('entity_id', flat=True)), read)
+        self.assertEqual(set(deleted.values_list('scope_user', flat=True)), {self.employee.id})
+
+
+class UnreadCounterTests(TestCase):
+    """Счётчик непрочитанных совпадает с тем, что показывает список, после любых операций."""
+
+    def setUp(self):
+        self.hr = User.objects.create(
+            username='hr', role=User.Roles.HR, date_joined=timezone.now() - timedelta(days=1),
+        )
+
+    def _broadcasts(self, count, role=User.Roles.HR):
+        # как reminders: строка на событие и +1 всем пользователям роли
+        rows = BroadcastNotification.objects.bulk_create([
+            BroadcastNotification(
+                role=role, type=Notification.Type.REMINDER_UPCOMING, created_at=timezone.now(),
+                message='общее', message_version=TEMPLATE_VERSION,
+            )
+            for _ in range(count)
+        ])
+        unread.increment_role(role, count)
+        return [n.id for n in rows]
+
+    def _listed_unread(self, user):
+        self.client.force_login(user)
+        return {n['id'] for n in self.client.get(reverse('notifications_list')).json()['notifications'] if not n['is_read']}
+
+    def _assert_counter_matches_list(self, user):
+        user.refresh_from_db()
+        self.assertEqual(user.unread_notifications, len(self._listed_unread(user)))
+
+    def test_read_up_to_with_broadcast_id(self):
+        for raw in (lambda pk: f'b{pk}', lambda pk: pk):
+            with self.subTest(broadcast_id=raw('N')):
+                first, second, third = self._broadcasts(3)
+                self.client.force_login(self.hr)
+
+                response = self.client.post(
+                    reverse('notifications_mark_read_up_to'), {'broadcast_id': raw(second)},
+                    content_type='application/json',
+                )
+
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual(response.json()['unread_count'], 1)
+                self.assertEqual(self._listed_unread(self.hr), {f'b{third}'})
+                self._assert_counter_matches_list(self.hr)
+                self.client.post(reverse('notifications_mark_all_read'))
+
+    def test_role_change_after_broadcast(self):
+        self._broadcasts(2)
+        self._broadcasts(1, role=User.Roles.MANAGER)
+        admin = User.objects.create_superuser(username='admin', password='x', role=User.Roles.HR)
+        self.client.force_login(admin)
+
+        response = self.client.post(reverse('admin:vacation_app_user_change', args=[self.hr.id]), {
+            'username': 'hr', 'role': User.Roles.MANAGER, 'is_active': 'on',
+            'date_joined_0': timezone.localtime(self.hr.date_joined).strftime('%Y-%m-%d'),
+            'date_joined_1': timezone.localtime(self.hr.date_joined).strftime('%H:%M:%S'),
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self._assert_counter_matches_list(self.hr)
+        self.assertEqual(self.hr.unread_notifications, 1)
+
+    def test_role_change_by_org_import(self):
+        self._broadcasts(2)
+
+        org_import.run(StringIO('username,role\nhr,employee\n'))
+
+        self._assert_counter_matches_list(self.hr)
+        self.assertEqual(self.hr.unread_notifications, 0)
+
+    def test_counter_after_request_delete_and_archive(self):
+        manager = User.objects.create(username='manager', role=User.Roles.MANAGER)
+        employee = User.objects.create(username='employee', role=User.Roles.EMPLOYEE, manager=manager)
+        VacationBalance.objects.create(user=employee, year=2030, days_remaining=28)
+        self.client.force_login(employee)
+        created = self.client.post(
+            reverse('create_request'), {'start_date': '2030-06-03', 'end_date': '2030-06-07'},
+            content_type='application/json',
+        )
+        self.assertEqual(created.status_code, 201, created.content)
+        # перенос уведомляет менеджера
+        moved = self.client.post(
+            reverse('update_request', args=[created.json()['id']]),
+            {'start_date': '2030-06-10', 'end_date': '2030-06-14'}, content_type='application/json',
+        )
+        self.assertEqual(moved.status_code, 200, moved.content)
+        manager.refresh_from_db()
+        self.assertEqual(manager.unread_notifications, 1)
+
+        self.client.force_login(employee)
+        self.assertEqual(self.client.post(reverse('delete_request', args=[created.json()['id']])).status_code, 200)
+        self._assert_counter_matches_list(manager)
+        self.assertEqual(manager.unread_notifications, 0)
+
+        # архив забирает только прочитанные - счётчик не меняется
+        read_ids = self._old_notifications(manager, is_read=True)
+        self._old_notifications(manager, is_read=False)
+        call_command('archive_notifications', pause=0, stdout=StringIO())
+        self.assertFalse(Notification.objects.filter(id__in=read_ids).exists())
+        self._assert_counter_matches_list(manager)
+
+    def test_counter_after_user_deleted_in_admin(self):
+        manager = User.objects.create(username='manager', role=User.Roles.MANAGER)
+        employee = User.objects.create(username='employee', role=User.Roles.EMPLOYEE, manager=manager)
+        request_obj = VacationRequest.objects.create(
+            user=employee, start_date=timezone.localdate() + timedelta(days=30),
+            end_date=timezone.localdate() + timedelta(days=34),
+        )
+        Notification.objects.create(
+            user=manager, request=request_obj, type=Notification.Type.REQUEST_CREATED,
+            message='новая заявка', message_version=TEMPLATE_VERSION,
+        )
+        unread.increment({manager.id: 1})
+        admin = User.objects.create_superuser(username='admin', password='x', role=User.Roles.HR)
+        self.client.force_login(admin)
+
+        response = self.client.post(reverse('admin:vacation_app_user_delete', args=[employee.id]), {'post': 'yes'})
+
+        self.assertEqual(response.status_code, 302)
+        self._assert_counter_matches_list(manager)
+        self.assertEqual(manager.unread_notifications, 0)
+
+    def _old_notifications(self, user, is_read):
+        rows = Notification.objects.bulk_create([
+            Notification(
+                user=user, type=Notification.Type.REQUEST_APPROVED, is_read=is_read,
+                message='старое', message_version=TEMPLATE_VERSION,
+            )
+            for _ in range(2)
+        ])
+        ids = [n.id for n in rows]
+        Notification.objects.filter(id__in=ids).update(created_at=timezone.now() - timedelta(days=200))
+        if not is_read:
+            unread.increment({user.id: len(ids)})
+        return ids
@@ -0,0 +1,142 @@
+from datetime import date
+from io import StringIO
+
+from django.test import TestCase
+
+from vacation_app import org_import
+from vacation_app.changes import Entity
+from vacation_app.models import ChangeLogEntry, ScheduleEntry, User, VacationBalance, VacationRequest
+
+YEAR = 2030
+
+
+def _run(text, dry_run=False):
+    return org_import.run(StringIO(text), dry_run=dry_run)
+
+
+class OrgImportTests(TestCase):
+    def _state(self):
+        return (
+            sorted(User.objects.values_list('username', 'first_name', 'last_name', 'role', 'manager__username')),
+            sorted(VacationBalance.objects.values_list('user__username', 'year', 'days_remaining')),
+            ChangeLogEntry.objects.count(),
+        )
+
+    def test_manager_later_in_file_is_resolved(self):
+        _run(
+            'username,last_name,manager,year,days_remaining\n'
+            f'ivanov,Иванов,boss,{YEAR},28\n'
+            'boss,Петрова,,,\n'
+        )
+
+        ivanov = User.objects.get(username='ivanov')
+        self.assertEqual(ivanov.manager.username, 'boss')
+        self.assertEqual(ivanov.manager.role, User.Roles.MANAGER)
+        self.assertEqual(ivanov.role, User.Roles.EMPLOYEE)
+        self.assertEqual(VacationBalance.objects.get(user=ivanov, year=YEAR).days_remaining, 28)
+
+    def test_cycle_is_rejected_with_its_row(self):
+        with self.assertRaises(org_import.OrgImportError) as raised:
+            _run('username,manager\nfirst,second\nsecond,third\nthird,first\n')
+
+        self.assertTrue(
+            any(error.startswith('Строка 2:') and 'цикл' in error for error in raised.exception.errors),
+            raised.exception.errors,
+        )
+        self.assertFalse(User.objects.exists())
+
+    def test_cycle_through_existing_users_is_rejected(self):
+        top = User.objects.create(username='top', role=User.Roles.MANAGER)
+        User.objects.create(username='middle', role=User.Roles.MANAGER, manager=top)
+
+        with self.assertRaises(org_import.OrgImportError) as raised:
+            _run('username,manager\ntop,middle\n')
+
+        self.assertIn('цикл', raised.exception.errors[0])
+        self.assertIsNone(User.objects.get(username='top').manager)
+
+    def test_reimport_changes_nothing(self):
+        text = (
+            'username,first_name,last_name,role,manager,year,days_remaining\n'
+            f'boss,Анна,Петрова,manager,,{YEAR},30\n'
+            f'ivanov,Иван,Иванов,employee,boss,{YEAR},28\n'
+            f'ivanov,Иван,Иванов,employee,boss,{YEAR + 1},28\n'
+        )
+        _run(text)
+        before = self._state()
+
+        report = _run(text)
+
+        self.assertEqual(self._state(), before)
+        self.assertEqual(
+            (report.users_created, report.users_updated, report.balances_created, report.balances_updated),
+            (0, 0, 0, 0),
+        )
+        self.assertEqual((report.users_unchanged, report.balances_unchanged), (2, 3))
+
+    def test_dry_run_writes_nothing(self):
+        User.objects.create(username='ivanov', role=User.Roles.EMPLOYEE)
+        before = self._state()
+
+        report = _run(
+            'username,last_name,manager,year,days_remaining\n'
+            f'ivanov,Иванов,boss,{YEAR},28\n'
+            'boss,Петрова,,,\n',
+            dry_run=True,
+        )
+
+        self.assertEqual(self._state(), before)
+        self.assertTrue(report.dry_run)
+        self.assertEqual((report.users_created, report.users_updated, report.balances_created), (1, 1, 1))
+
+    def test_journal_and_schedule_follow_the_import(self):
+        old_manager = User.objects.create(username='old', role=User.Roles.MANAGER)
+        new_manager = User.objects.create(username='new', first_name='Мария', role=User.Roles.MANAGER)
+        employee = User.objects.create(username='ivanov', role=User.Roles.EMPLOYEE, manager=old_manager)
+        request_obj = VacationRequest.objects.create(
+            user=employee, start_date=date(YEAR, 6, 3), end_date=date(YEAR, 6, 7),
+            status=VacationRequest.Status.APPROVED,
+        )
+        last_entry = ChangeLogEntry.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+        _run('username,first_name,last_name,manager\nivanov,Иван,Иванов,new\n')
+
+        entry = ScheduleEntry.objects.get(request=request_obj)
+        self.assertEqual(
+            (entry.full_name, entry.manager_id, entry.manager_name), ('Иван Иванов', new_manager.id, 'Мария'),
+        )
+        journal = ChangeLogEntry.objects.filter(id__gt=last_entry, entity=Entity.USER, entity_id=employee.id)
+        self.assertEqual(
+            set(journal.values_list('scope_manager', flat=True)), {old_manager.id, new_manager.id},
+        )
+
+    def test_referenced_manager_gets_manager_role(self):
+        lead = User.objects.create(username='lead', role=User.Roles.EMPLOYEE)
+
+        report = _run('username,manager\nivanov,lead\n')
+
+        lead.refresh_from_db()
+        self.assertEqual(lead.role, User.Roles.MANAGER)
+        self.assertIn(
+            {'line': 2, 'username': 'lead', 'action': 'update_user',
+             'changes': {'role': [User.Roles.EMPLOYEE, User.Roles.MANAGER]}},
+            report.changes,
+        )
+
+    def test_explicit_non_manager_role_of_a_manager_is_rejected(self):
+        with self.assertRaises(org_import.OrgImportError) as raised:
+            _run('username,role,manager\nivanov,employee,lead\nlead,hr,\n')
+
+        self.assertTrue(raised.exception.errors[0].startswith('Строка 3:'), raised.exception.errors)
+        self.assertFalse(User.objects.exists())
+
+    def test_demoting_a_manager_with_subordinates_is_rejected(self):
+        lead = User.objects.create(username='lead', role=User.Roles.MANAGER)
+        User.objects.create(username='ivanov', role=User.Roles.EMPLOYEE, manager=lead)
+
+        with self.assertRaises(org_import.OrgImportError) as raised:
+            _run('username,role\nlead,employee\n')
+
+        self.assertIn('ivanov', raised.exception.errors[0])
+        lead.refresh_from_db()
+        self.assertEqual(lead.role, User.Roles.MANAGER)
@@ -0,0 +1,55 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from vacation_app import ledger
+from vacation_app.models import Notification, User, VacationBalance, VacationRequest
+
+# год запросов HOT_VIEWS в check_query_plans
+YEAR = 2025
+
+
+class QueryPlanTests(TestCase):
+    """Горячие эндпоинты всех ролей не читают таблицы целиком (EXPLAIN QUERY PLAN)."""
+
+    def setUp(self):
+        User.objects.create(username='hr', role=User.Roles.HR)
+        managers = User.objects.bulk_create([
+            User(username=f'manager{i}', last_name=f'Менеджер {i}', role=User.Roles.MANAGER) for i in range(3)
+        ])
+        employees = User.objects.bulk_create([
+            User(username=f'employee{i}', last_name=f'Сотрудник {i}', role=User.Roles.EMPLOYEE, manager=manager)
+            for i, manager in enumerate(managers * 10)
+        ])
+        VacationBalance.objects.bulk_create([
+            VacationBalance(user=user, year=year, days_remaining=28)
+            for user in employees for year in (YEAR, YEAR + 1)
+        ])
+        first_day = date(YEAR, 3, 3)
+        statuses = list(VacationRequest.Status)
+        requests = []
+        for user in employees:
+            for n, status in enumerate(statuses):
+                start = first_day + timedelta(weeks=3 * n)
+                # save(), а не bulk_create: строки графика HR пишут сигналы
+                requests.append(VacationRequest.objects.create(
+                    user=user, start_date=start, end_date=start + timedelta(days=4), status=status,
+                ))
+        ledger.rebuild()
+        Notification.objects.bulk_create([
+            Notification(user=request_obj.user, request=request_obj, type=Notification.Type.REQUEST_APPROVED)
+            for request_obj in requests
+        ])
+
+    def test_hot_views_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertNotIn('skip', out.getvalue())
+        self.assertNotIn('FULL SCAN', out.getvalue())
+
+    def test_view_without_user_fails_the_check(self):
+        User.objects.filter(role=User.Roles.HR).delete()
+        with self.assertRaisesMessage(CommandError, 'not checked'):
+            call_command('check_query_plans', stdout=StringIO())
@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.test import TestCase
+from django.urls import reverse
+
+from vacation_app.models import User, VacationBalance, VacationRequest
+
+YEAR = 2030
+
+
+class DuplicateRequestTests(TestCase):
+    def setUp(self):
+        self.employee = User.objects.create(username='employee', role=User.Roles.EMPLOYEE)
+        VacationBalance.objects.create(user=self.employee, year=YEAR, days_remaining=20)
+        self.client.force_login(self.employee)
+
+    def _request(self, status, start=date(YEAR, 6, 3), end=date(YEAR, 6, 7)):
+        return VacationRequest.objects.create(user=self.employee, start_date=start, end_date=end, status=status)
+
+    def _duplicate(self, request_obj):
+        return self.client.post(reverse('duplicate_request', args=[request_obj.id]))
+
+    def test_active_request_is_not_duplicated(self):
+        for status in (VacationRequest.Status.PENDING, VacationRequest.Status.APPROVED):
+            source = self._request(status)
+            self.assertEqual(self._duplicate(source).status_code, 400)
+            source.delete()
+        self.assertFalse(VacationRequest.objects.exists())
+
+    def test_rejected_request_is_duplicated_unless_period_is_taken(self):
+        source = self._request(VacationRequest.Status.REJECTED)
+        response = self._duplicate(source)
+        self.assertEqual(response.status_code, 201)
+        copy_id = response.json()['request']['id']
+
+        response = self._duplicate(source)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['overlapping_request']['id'], copy_id)
+        self.assertEqual(VacationRequest.objects.count(), 2)
@@ -0,0 +1,80 @@
+from datetime import date
+
+from django.test import TestCase
+from django.urls import reverse
+
+from vacation_app import exports, ledger, schedule_store
+from vacation_app.models import User, VacationBalance, VacationRequest
+from vacation_app.response_cache import response_cache
+
+YEAR = 2030
+
+
+class PrintFragmentCacheTests(TestCase):
+    """
+    Фрагменты печати версионированы: изменение графика видно без сброса кэша.
+    В TestCase колбэки on_commit не выполняются - как в процессе, до которого сброс не дошёл.
+    """
+
+    def setUp(self):
+        schedule_store.fragment_cache().clear()
+        self.manager = User.objects.create(username='manager', first_name='Анна', role=User.Roles.MANAGER)
+        self.employee = User.objects.create(username='employee', role=User.Roles.EMPLOYEE, manager=self.manager)
+        self.request = VacationRequest.objects.create(
+            user=self.employee, start_date=date(YEAR, 6, 3), end_date=date(YEAR, 6, 7),
+            status=VacationRequest.Status.APPROVED,
+        )
+
+    def _print(self):
+        return ''.join(exports.schedule_print_chunks(YEAR))
+
+    def test_moved_request_is_printed_with_new_dates(self):
+        self.assertIn('2030-06-03', self._print())
+
+        self.request.start_date, self.request.end_date = date(YEAR, 7, 1), date(YEAR, 7, 5)
+        self.request.save()
+
+        printed = self._print()
+        self.assertIn('2030-07-01', printed)
+        self.assertNotIn('2030-06-03', printed)
+
+    def test_renamed_manager_is_printed_with_new_name(self):
+        self.assertIn('Анна', self._print())
+
+        self.manager.first_name = 'Мария'
+        self.manager.save()
+
+        printed = self._print()
+        self.assertIn('Мария', printed)
+        self.assertNotIn('Анна', printed)
+
+
+class HeatmapCacheTests(TestCase):
+    def setUp(self):
+        schedule_store.fragment_cache().clear()
+        response_cache.clear()
+        self.hr = User.objects.create(username='hr', role=User.Roles.HR)
+        self.manager = User.objects.create(username='manager', role=User.Roles.MANAGER)
+        self.employee = User.objects.create(username='employee', role=User.Roles.EMPLOYEE, manager=self.manager)
+        VacationBalance.objects.create(user=self.employee, year=YEAR, days_remaining=28)
+
+    def _heatmap(self):
+        self.client.force_login(self.hr)
+        response = self.client.get(reverse('hr_heatmap'), {'year': YEAR})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_request_change_invalidates_heatmap(self):
+        request_obj = VacationRequest.objects.create(
+            user=self.employee, start_date=date(YEAR, 6, 3), end_date=date(YEAR, 6, 7),
+        )
+        ledger.rebuild(user_ids=[self.employee.id])
+        self.assertEqual(max(self._heatmap().json()['total']), 0)
+        self.assertEqual(self._heatmap()['X-Cache'], 'HIT')
+
+        self.client.force_login(self.manager)
+        self.assertEqual(self.client.post(reverse('manager_approve', args=[request_obj.id])).status_code, 200)
+
+        response = self._heatmap()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(max(response.json()['total']), 1)
@@ -0,0 +1,115 @@
+"""
+Денормализованный счётчик непрочитанных уведомлений (User.unread_notifications).
+
+Счётчик меняется там же, где уведомления создаются и читаются, атомарным
+UPDATE с F-выражением, поэтому бейдж в интерфейсе - это поле уже
+загруженного пользователя, а не COUNT(*) по уведомлениям. Личные и
+broadcast-уведомления считаются вместе. Пересчёт с нуля - recount()
+(команда recount_unread_notifications).
+
+Массовое "прочитано" - один UPDATE по уведомлениям плюс сдвиг отметки
+broadcast; каждая операция возвращает новое значение счётчика.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from . import broadcasts
+from .changes import record_notifications
+from .models import Notification, User
+
+
+def increment(counts):
+    """counts - {user_id: сколько новых непрочитанных}; UPDATE на каждое различное значение."""
+    by_amount = defaultdict(list)
+    for user_id, amount in counts.items():
+        if amount:
+            by_amount[amount].append(user_id)
+    for amount, user_ids in by_amount.items():
+        User.objects.filter(id__in=user_ids).update(
+            unread_notifications=F('unread_notifications') + amount
+        )
+
+
+def increment_role(role, amount):
+    """Новые broadcast-уведомления: +amount всем пользователям роли одним UPDATE."""
+    if amount:
+        User.objects.filter(role=role).update(unread_notifications=F('unread_notifications') + amount)
+
+
+def _decrement(user, amount):
+    if amount:
+        User.objects.filter(pk=user.pk).update(
+            unread_notifications=Greatest(F('unread_notifications') - amount, 0)
+        )
+
+
+def current(user):
+    count = User.objects.values_list('unread_notifications', flat=True).get(pk=user.pk)
+    user.unread_notifications = count
+    return count
+
+
+def _read_personal(user, qs):
+    """Отмечает прочитанными личные уведомления из qs одним UPDATE; возвращает их число."""
+    qs = qs.filter(user=user, is_read=False)
+    ids = list(qs.values_list('id', flat=True))
+    if not ids:
+        return 0
+    # граница по id: уведомления, пришедшие после выборки, остаются непрочитанными
+    updated = qs.filter(id__lte=max(ids)).update(is_read=True)
+    record_notifications((notification_id, user.id) for notification_id in ids)
+    return updated
+
+
+def mark_read(user: User, notification_ids=(), broadcast_ids=()):
+    """Прочитаны уведомления из списков; возвращает новое значение счётчика."""
+    with transaction.atomic():
+        read = 0
+        if notification_ids:
+            read += _read_personal(user, Notification.objects.filter(id__in=notification_ids))
+        read += len(broadcasts.mark_read(user, broadcast_ids))
+        _decrement(user, read)
+    return current(user)
+
+
+def mark_read_up_to(user: User, notification_id=None, broadcast_id=None):
+    """Прочитаны личные с id <= notification_id и broadcast с id <= broadcast_id."""
+    with transaction.atomic():
+        read = 0
+        if notification_id is not None:
+            read += _read_personal(user, Notification.objects.filter(id__lte=notification_id))
+        if broadcast_id is not None:
+            read += len(broadcasts.mark_read_up_to(user, broadcast_id))
+        _decrement(user, read)
+    return current(user)
+
+
+def mark_all_read(user: User):
+    with transaction.atomic():
+        read = _read_personal(user, Notification.objects.all())
+        read += len(broadcasts.mark_read_up_to(user))
+        _decrement(user, read)
+    return current(user)
+
+
+@transaction.atomic
+def recount(user_ids=None):
+    """Пересчитывает счётчики с нуля (после ручных правок и каскадных удалений)."""
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(id__in=user_ids)
+    personal = dict(
+        Notification.objects
+        .filter(is_read=False, user__in=users)
+        .values('user_id')
+        .annotate(unread=Count('id'))
+        .values_list('user_id', 'unread')
+    )
+    users = list(users.select_related('broadcast_read_state'))
+    for user in users:
+        user.unread_notifications = personal.get(user.id, 0) + broadcasts.unread_broadcasts(user).count()
+    User.objects.bulk_update(users, ['unread_notifications'], batch_size=1000)
+    return len(users)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
@@ -14,19 +15,36 @@ urlpatterns = [
     path('vacation/request/<int:pk>/duplicate', views.duplicate_request, name='duplicate_request'),
     path('vacation/request/<int:pk>/confirm', views.confirm_request, name='confirm_request'),
     path('vacation/balances', views.vacation_balances, name='vacation_balances'),
+    path('calendar', views.production_calendar_year, name='production_calendar_year'),
     path('manager/requests', views.manager_requests, name='manager_requests'),
     path('manager/request/<int:pk>/approve', views.manager_approve, name='manager_approve'),
     path('manager/request/<int:pk>/reject', views.manager_reject, name='manager_reject'),
+    path('manager/requests/decide', views.manager_bulk_decision, name='manager_bulk_decision'),
     path('hr/requests', views.hr_requests, name='hr_requests'),
     path('hr/export', views.hr_export, name='hr_export'),
     path('hr/schedule/export', views.hr_schedule_export, name='hr_schedule_export'),
     path('hr/schedule/print', views.hr_schedule_print, name='hr_schedule_print'),
+    path('hr/export_jobs', views.hr_export_job_create, name='hr_export_job_create'),
+    path('hr/export_jobs/<int:pk>', views.hr_export_job_status, name='hr_export_job_status'),
+    path('hr/export_jobs/<int:pk>/download', views.hr_export_job_download, name='hr_export_job_download'),
+    path('hr/org_import', views.hr_org_import, name='hr_org_import'),
     path('hr/departments', views.hr_departments, name='hr_departments'),
+    path('hr/heatmap', views.hr_heatmap, name='hr_heatmap'),
+    path('hr/response_cache', views.hr_response_cache, name='hr_response_cache'),
     path('notifications', views.notifications_list, name='notifications_list'),
     path('notifications/unread_count', views.notifications_unread_count, name='notifications_unread_count'),
     path('notifications/<int:pk>/read', views.notification_mark_read, name='notification_mark_read'),
+    path('notifications/b<int:pk>/read', views.broadcast_mark_read, name='broadcast_mark_read'),
+    path('notifications/read', views.notifications_mark_read_bulk, name='notifications_mark_read_bulk'),
+    path('notifications/read_up_to', views.notifications_mark_read_up_to, name='notifications_mark_read_up_to'),
+    path('notifications/read_all', views.notifications_mark_all_read, name='notifications_mark_all_read'),
     path('profile/update', views.profile_update, name='profile_update'),
     path("hr/schedule", views.hr_schedule, name="hr_schedule"),
-    path("live/sse", views.live_sse, name="live_sse"),
+    # под ASGI стрим обслуживается корутиной, под WSGI - потоком на соединение
+    path(
+        "live/sse",
+        views.live_sse_async if settings.LIVE_SSE_MODE == "async" else views.live_sse,
+        name="live_sse",
+    ),
     path("live/changes", views.live_changes, name="live_changes"),
 ]
@@ -1,25 +1,52 @@
-import csv
+import codecs
 import json
-import time
+from collections import Counter
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
-from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.http import (
+    FileResponse,
+    HttpResponseForbidden,
+    HttpResponseNotAllowed,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.middleware import csrf
-from django.utils.html import escape
 from .models import User, VacationRequest, Notification, VacationBalance
 from datetime import date, datetime
-from django.utils import timezone
-from django.db.models import Max
 from django.http import JsonResponse
+from django.db.models import Q
+from django.db import transaction
 from django.views.decorators.http import require_GET, require_POST, require_http_methods
 from django.contrib.auth.decorators import login_required
 
 from .models import (
+    ArchivedNotification,
+    BroadcastNotification,
+    ExportJob,
     Notification,
     User,
     VacationBalance,
     VacationRequest,
 )
+from .changes import (
+    Action,
+    Entity,
+    collapse_entries,
+    latest_version,
+    record_change,
+    record_notification,
+    visible_entries,
+)
+from . import (
+    broadcasts, coverage, decisions, export_jobs, exports, heatmap, ledger, notification_texts, org_import,
+    production_calendar, schedule_store, unread,
+)
+from .pagination import PaginationError, keyset_page, merged_keyset_page, parse_limit
+from .etags import data_etag, etag, notifications_etag, unread_etag
+from .response_cache import cached_response, response_cache
+from .live import open_async_event_stream, open_event_stream, scopes_for_user
 
 
 ROLE_EMPLOYEE = User.Roles.EMPLOYEE
@@ -70,6 +97,7 @@ def me(request):
 
 @login_required
 @require_GET
+@etag(data_etag)
 def vacation_balance(request):
     if request.user.role != ROLE_EMPLOYEE:
         return HttpResponseForbidden()
@@ -89,11 +117,135 @@ def vacation_balance(request):
 
 @login_required
 @require_GET
+def production_calendar_year(request):
+    """
+    Отличия года от обычной недели для подсчёта рабочих дней на фронте:
+    нерабочие будни (праздники, переносы) и рабочие выходные. Берутся из
+    календаря в памяти процесса (production_calendar.py), без запроса к БД.
+    """
+    try:
+        year = int(request.GET.get("year") or date.today().year)
+    except ValueError:
+        year = date.today().year
+    non_working, working = production_calendar.year_overrides(year)
+    return JsonResponse({
+        "year": year,
+        "non_working": [day.isoformat() for day in non_working],
+        "working": [day.isoformat() for day in working],
+    })
+
+
+def _role_requests_queryset(user):
+    """Заявки, которые пользователь видит в своём списке (по роли)."""
+    qs = VacationRequest.objects.select_related('user')
+    if user.role == ROLE_EMPLOYEE:
+        return qs.filter(user=user)
+    if user.role == ROLE_MANAGER:
+        return qs.filter(user__manager=user)
+    if user.role == ROLE_HR:
+        return qs
+    return qs.none()
+
+
+def _role_balances_queryset(user):
+    """Балансы, которые пользователь видит в /api/vacation/balances (по роли)."""
+    qs = VacationBalance.objects.select_related('user')
+    if user.role == ROLE_EMPLOYEE:
+        return qs.filter(user=user)
+    if user.role == ROLE_MANAGER:
+        # все сотрудники, у которых этот пользователь - менеджер
+        return qs.filter(user__manager=user)
+    if user.role == ROLE_HR:
+        # кадровик видит всех
+        return qs
+    return qs.none()
+
+
+def _role_users_queryset(user):
+    """Профили, изменения которых доходят до пользователя."""
+    if user.role == ROLE_MANAGER:
+        return User.objects.filter(Q(id=user.id) | Q(manager=user))
+    if user.role == ROLE_HR:
+        return User.objects.all()
+    return User.objects.filter(id=user.id)
+
+
+def _parse_date_param(params, name):
+    raw = params.get(name)
+    if not raw:
+        return None
+    try:
+        return date.fromisoformat(raw)
+    except ValueError:
+        raise PaginationError(f'Неверный формат {name}. Ожидается YYYY-MM-DD')
+
+
+def _filter_requests(qs, params, allow_manager_filter=False):
+    """Серверные фильтры списков заявок: статус, период, подразделение, поиск по сотруднику."""
+    status = params.get('status')
+    if status:
+        if status not in VacationRequest.Status.values:
+            raise PaginationError(f'Неизвестный статус: {status}')
+        qs = qs.filter(status=status)
+
+    # заявки, период которых пересекается с [date_from, date_to]
+    date_from = _parse_date_param(params, 'date_from')
+    date_to = _parse_date_param(params, 'date_to')
+    if date_from:
+        qs = qs.filter(end_date__gte=date_from)
+    if date_to:
+        qs = qs.filter(start_date__lte=date_to)
+
+    manager_id = params.get('manager_id')
+    if manager_id and allow_manager_filter:
+        try:
+            qs = qs.filter(user__manager_id=int(manager_id))
+        except ValueError:
+            raise PaginationError('manager_id должен быть числом')
+
+    search = (params.get('q') or '').strip()
+    if search:
+        qs = qs.filter(
+            Q(user__username__icontains=search)
+            | Q(user__first_name__icontains=search)
+            | Q(user__last_name__icontains=search)
+        )
+    return qs
+
+
+def _requests_page_response(request, qs, allow_manager_filter=False, annotate=None):
+    """
+    Страница списка заявок: ?cursor, ?limit, фильтры и ?count=0, чтобы
+    не считать total (COUNT по всей выборке) на каждой странице.
+
+    annotate(items) -> {id заявки: dict} добавляет к заявкам страницы поля
+    сверх _serialize_request.
+    """
+    params = request.GET
+    try:
+        qs = _filter_requests(qs, params, allow_manager_filter)
+        limit = parse_limit(params.get('limit'))
+        items, next_cursor = keyset_page(qs, params.get('cursor'), limit)
+    except PaginationError as exc:
+        return _json_error(str(exc))
+
+    extra = annotate(items) if annotate else {}
+    data = {
+        'requests': [{**_serialize_request(req), **extra.get(req.id, {})} for req in items],
+        'next_cursor': next_cursor,
+    }
+    if params.get('count', '1') not in ('0', 'false'):
+        data['total'] = qs.count()
+    return JsonResponse(data)
+
+
+@login_required
+@require_GET
+@etag(data_etag)
 def my_requests(request):
     if request.user.role != ROLE_EMPLOYEE:
         return HttpResponseForbidden()
-    requests = VacationRequest.objects.filter(user=request.user).order_by('-created_at')
-    return JsonResponse({'requests': [_serialize_request(req) for req in requests]})
+    return _requests_page_response(request, _role_requests_queryset(request.user))
 
 
 @login_required
@@ -132,29 +284,32 @@ def update_request(request, pk):
     if end_date < start_date:
         return _json_error('Дата окончания не может быть раньше даты начала')
 
-    # количество дней в заявке (включая обе даты)
-    days_requested = (end_date - start_date).days + 1
-
-    # проверяем фактический остаток за год начала отпуска
-    year = start_date.year
-    balance = VacationBalance.objects.filter(user=request.user, year=year).first()
-    if balance:
-        initial_days = balance.days_remaining
-        planned_days = _calculate_planned_days(request.user, year)
-        available = max(initial_days - planned_days, 0)
-    else:
-        available = 0
-
-    if days_requested > available:
+    # Обновляем заявку; резерв дней переносится в той же транзакции
+    # (остаток проверяется за год начала отпуска)
+    read_state = ledger.snapshot(vacation_request)
+    old_state = ledger.state_of(vacation_request)
+    vacation_request.start_date = start_date
+    vacation_request.end_date = end_date
+    try:
+        with transaction.atomic():
+            if not ledger.lock_unchanged(vacation_request.id, read_state):
+                return _stale_request_error()
+            # пересечения - под блокировкой балансов, иначе параллельная заявка на те же даты проскочит
+            ledger.lock_balances(request.user.id)
+            overlap = coverage.own_overlap(request.user, start_date, end_date, exclude_id=vacation_request.id)
+            if overlap:
+                return _overlap_error(overlap)
+            vacation_request.save(update_fields=['start_date', 'end_date', 'days'])
+            ledger.apply(old_state, ledger.state_of(vacation_request))
+    except ledger.InsufficientVacationDays as exc:
+        days_requested = ledger.request_days(start_date, end_date)
+        # при переносе внутри года собственный резерв заявки тоже доступен
+        available = exc.available + (days_requested - exc.requested)
         return _json_error(
-            f'Недостаточно дней отпуска на {year} год. Доступно: {available}, выбрано: {days_requested}.',
+            f'Недостаточно дней отпуска на {exc.year} год. Доступно: {available}, выбрано: {days_requested}.',
             status=400,
         )
-
-    # Обновляем заявку
-    vacation_request.start_date = start_date
-    vacation_request.end_date = end_date
-    vacation_request.save(update_fields=['start_date', 'end_date'])
+    record_change(Entity.REQUEST, vacation_request.id, request.user)
 
     # Уведомляем менеджера, если есть
     if manager:
@@ -176,18 +331,67 @@ def confirm_request(request, pk):
         vacation_request = VacationRequest.objects.get(pk=pk, user=request.user)
     except VacationRequest.DoesNotExist:
         return _json_error('Request not found', status=404)
+    read_state = ledger.snapshot(vacation_request)
+    old_state = ledger.state_of(vacation_request)
     vacation_request.confirmed_by_employee = True
-    vacation_request.save(update_fields=['confirmed_by_employee'])
+    with transaction.atomic():
+        if not ledger.lock_unchanged(vacation_request.id, read_state):
+            return _stale_request_error()
+        vacation_request.save(update_fields=['confirmed_by_employee'])
+        ledger.apply(old_state, ledger.state_of(vacation_request))
+    record_change(Entity.REQUEST, vacation_request.id, request.user)
     return JsonResponse({'request': _serialize_request(vacation_request)})
 
 
 @login_required
 @require_GET
+@etag(data_etag)
+@cached_response('manager_requests')
 def manager_requests(request):
     if request.user.role != ROLE_MANAGER:
         return HttpResponseForbidden()
-    requests = VacationRequest.objects.filter(user__manager=request.user).select_related('user').order_by('-created_at')
-    return JsonResponse({'requests': [_serialize_request(req) for req in requests]})
+    return _requests_page_response(
+        request,
+        _role_requests_queryset(request.user),
+        annotate=lambda items: _team_coverage(request.user, items),
+    )
+
+
+def _team_coverage(manager, items):
+    """Пересечения с отпусками команды и минимум сотрудников на месте - для каждой заявки страницы."""
+    team = coverage.for_requests(manager, items)
+    if team is None:
+        return {}
+    return {req.id: {'coverage': team.annotate(req)} for req in items}
+
+
+def _overlap_error(overlap):
+    return JsonResponse(
+        {
+            'error': (
+                f'Период пересекается с вашей заявкой №{overlap.id} '
+                f'({overlap.start_date.isoformat()} - {overlap.end_date.isoformat()}).'
+            ),
+            'overlapping_request': {
+                'id': overlap.id,
+                'start_date': overlap.start_date.isoformat(),
+                'end_date': overlap.end_date.isoformat(),
+                'status': overlap.status,
+            },
+        },
+        status=400,
+    )
+
+
+def _stale_request_error():
+    return _json_error('Заявку только что изменили или удалили, обновите список', status=409)
+
+
+def _insufficient_days_error(exc):
+    return _json_error(
+        f'Недостаточно дней отпуска на {exc.year} год. Доступно: {exc.available}, выбрано: {exc.requested}.',
+        status=400,
+    )
 
 
 @login_required
@@ -199,8 +403,18 @@ def manager_approve(request, pk):
         vacation_request = VacationRequest.objects.get(pk=pk, user__manager=request.user)
     except VacationRequest.DoesNotExist:
         return _json_error('Request not found', status=404)
+    read_state = ledger.snapshot(vacation_request)
+    old_state = ledger.state_of(vacation_request)
     vacation_request.status = VacationRequest.Status.APPROVED
-    vacation_request.save(update_fields=['status'])
+    try:
+        with transaction.atomic():
+            if not ledger.lock_unchanged(vacation_request.id, read_state):
+                return _stale_request_error()
+            vacation_request.save(update_fields=['status'])
+            ledger.apply(old_state, ledger.state_of(vacation_request))
+    except ledger.InsufficientVacationDays as exc:
+        return _insufficient_days_error(exc)
+    record_change(Entity.REQUEST, vacation_request.id, vacation_request.user)
     _create_notification(
         user=vacation_request.user,
         type=Notification.Type.REQUEST_APPROVED,
@@ -218,8 +432,18 @@ def manager_reject(request, pk):
         vacation_request = VacationRequest.objects.get(pk=pk, user__manager=request.user)
     except VacationRequest.DoesNotExist:
         return _json_error('Request not found', status=404)
+    read_state = ledger.snapshot(vacation_request)
+    old_state = ledger.state_of(vacation_request)
     vacation_request.status = VacationRequest.Status.REJECTED
-    vacation_request.save(update_fields=['status'])
+    try:
+        with transaction.atomic():
+            if not ledger.lock_unchanged(vacation_request.id, read_state):
+                return _stale_request_error()
+            vacation_request.save(update_fields=['status'])
+            ledger.apply(old_state, ledger.state_of(vacation_request))
+    except ledger.InsufficientVacationDays as exc:
+        return _insufficient_days_error(exc)
+    record_change(Entity.REQUEST, vacation_request.id, vacation_request.user)
     _create_notification(
         user=vacation_request.user,
         type=Notification.Type.REQUEST_REJECTED,
@@ -228,13 +452,76 @@ def manager_reject(request, pk):
     return JsonResponse({'request': _serialize_request(vacation_request)})
 
 
+BULK_DECISIONS = {
+    'approve': VacationRequest.Status.APPROVED,
+    'reject': VacationRequest.Status.REJECTED,
+}
+
+
+def _parse_decisions(raw):
+    """[{"id": 12, "decision": "approve"}, ...] -> [(id, статус)]; ValueError с текстом ошибки."""
+    if not isinstance(raw, list) or not raw:
+        raise ValueError('decisions должен быть непустым списком')
+    if len(raw) > decisions.MAX_DECISIONS:
+        raise ValueError(f'Не больше {decisions.MAX_DECISIONS} заявок за раз')
+    parsed = []
+    seen = set()
+    for item in raw:
+        if not isinstance(item, dict):
+            raise ValueError('Элемент decisions должен быть объектом {"id": ..., "decision": ...}')
+        request_id = item.get('id')
+        if isinstance(request_id, bool) or not isinstance(request_id, int):
+            raise ValueError(f'Некорректный id заявки: {request_id}')
+        status = BULK_DECISIONS.get(item.get('decision'))
+        if status is None:
+            raise ValueError(f'Решение по заявке {request_id}: ожидается approve или reject')
+        if request_id in seen:
+            raise ValueError(f'Заявка {request_id} указана дважды')
+        seen.add(request_id)
+        parsed.append((request_id, status))
+    return parsed
+
+
+def _serialize_outcome(outcome):
+    item = {'id': outcome.request_id, 'result': outcome.result}
+    if outcome.error is not None:
+        item['error'] = (
+            f'Недостаточно дней отпуска на {outcome.error.year} год. '
+            f'Доступно: {outcome.error.available}, выбрано: {outcome.error.requested}.'
+        )
+    if outcome.request is not None:
+        item['request'] = _serialize_request(outcome.request)
+    return item
+
+
+@login_required
+@require_POST
+def manager_bulk_decision(request):
+    """
+    Согласовать/отклонить пачку заявок команды одним запросом:
+    {"decisions": [{"id": 12, "decision": "approve"}, {"id": 15, "decision": "reject"}]}.
+    Ответ - результат по каждой заявке в том же порядке (см. decisions.py).
+    """
+    if request.user.role != ROLE_MANAGER:
+        return HttpResponseForbidden()
+    try:
+        parsed = _parse_decisions(_get_request_data(request).get('decisions'))
+    except ValueError as exc:
+        return _json_error(str(exc))
+    outcomes = decisions.decide(request.user, parsed)
+    return JsonResponse({
+        'results': [_serialize_outcome(outcome) for outcome in outcomes],
+        'summary': dict(Counter(outcome.result for outcome in outcomes)),
+    })
+
+
 @login_required
 @require_GET
+@etag(data_etag)
 def hr_requests(request):
     if request.user.role != ROLE_HR:
         return HttpResponseForbidden()
-    requests = VacationRequest.objects.select_related('user').order_by('-created_at')
-    return JsonResponse({'requests': [_serialize_request(req) for req in requests]})
+    return _requests_page_response(request, _role_requests_queryset(request.user), allow_manager_filter=True)
 
 
 @login_required
@@ -242,25 +529,16 @@ def hr_requests(request):
 def hr_export(request):
     if request.user.role != ROLE_HR:
         return HttpResponseForbidden()
-    approved_requests = VacationRequest.objects.filter(status=VacationRequest.Status.APPROVED).select_related('user')
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="vacation_approved.csv"'
-    writer = csv.writer(response)
-    writer.writerow(['ID', 'Employee', 'Start Date', 'End Date', 'Status', 'Created At', 'Confirmed'])
-    for req in approved_requests:
-        writer.writerow([
-            req.id,
-            req.user.username,
-            req.start_date,
-            req.end_date,
-            req.status,
-            req.created_at,
-            req.confirmed_by_employee,
-        ])
-    return response
+    return exports.streaming_csv_response(
+        request,
+        'vacation_approved.csv',
+        exports.csv_chunks(exports.REQUESTS_HEADER, exports.approved_request_rows()),
+    )
 
 @login_required
 @require_GET
+@etag(data_etag)
+@cached_response('hr_schedule')
 def hr_schedule(request):
     # Только HR имеет доступ
     if getattr(request.user, "role", None) != "hr":
@@ -289,47 +567,17 @@ def hr_schedule(request):
 
 
 def _get_hr_schedule_entries(year: int, manager_id: int | None = None):
-    qs = (
-        VacationRequest.objects
-        .filter(
-            start_date__year=year,
-            status="approved",  # только согласованные
-        )
-        .select_related("user", "user__manager")
-        .order_by("user__last_name", "user__first_name", "start_date")
-    )
-
-    if manager_id:
-        qs = qs.filter(user__manager_id=manager_id)
-
-    schedule = {}
-    for req in qs:
-        u = req.user
-        key = u.id
-        manager = getattr(u, "manager", None)
-        manager_name = ""
-        if manager:
-            manager_name = (f"{manager.first_name} {manager.last_name}".strip() or manager.username).strip()
-        if key not in schedule:
-            full_name = (f"{u.first_name} {u.last_name}".strip() or u.username).strip()
-            schedule[key] = {
-                "user_id": u.id,
-                "username": u.username,
-                "full_name": full_name,
-                "manager_id": manager.id if manager else None,
-                "manager_name": manager_name,
-                "periods": [],
-            }
-        days = (req.end_date - req.start_date).days + 1
-        schedule[key]["periods"].append({
-            "id": req.id,
-            "start_date": req.start_date.isoformat(),
-            "end_date": req.end_date.isoformat(),
-            "confirmed_by_employee": req.confirmed_by_employee,
-            "days": days,
-        })
-
-    return list(schedule.values())
+    # график читается из материализованного хранилища (schedule_store.py)
+    return [
+        {
+            **employee,
+            "periods": [
+                {**period, "start_date": period["start_date"].isoformat(), "end_date": period["end_date"].isoformat()}
+                for period in periods
+            ],
+        }
+        for employee, periods in schedule_store.entries(year, manager_id)
+    ]
 
 
 @login_required
@@ -349,31 +597,11 @@ def hr_schedule_export(request):
     except ValueError:
         manager_id = None
 
-    entries = _get_hr_schedule_entries(year=year, manager_id=manager_id)
-
-    response = HttpResponse(content_type='text/csv')
     filename = f"vacation_schedule_{year}.csv"
     if manager_id:
         filename = f"vacation_schedule_{year}_manager_{manager_id}.csv"
-    response['Content-Disposition'] = f'attachment; filename=\"{filename}\"'
-
-    writer = csv.writer(response)
-    writer.writerow([
-        'Сотрудник (логин)', 'ФИО', 'Менеджер', 'Начало отпуска',
-        'Конец отпуска', 'Дней', 'Подтверждено сотрудником'
-    ])
-    for entry in entries:
-        for period in entry.get("periods", []):
-            writer.writerow([
-                entry.get("username", ""),
-                entry.get("full_name", ""),
-                entry.get("manager_name", ""),
-                period.get("start_date", ""),
-                period.get("end_date", ""),
-                period.get("days", ""),
-                "Да" if period.get("confirmed_by_employee") else "Нет",
-            ])
-    return response
+    rows = exports.schedule_rows(year, manager_id=manager_id)
+    return exports.streaming_csv_response(request, filename, exports.csv_chunks(exports.SCHEDULE_HEADER, rows))
 
 
 @login_required
@@ -393,75 +621,125 @@ def hr_schedule_print(request):
     except ValueError:
         manager_id = None
 
-    entries = _get_hr_schedule_entries(year=year, manager_id=manager_id)
+    # строки уходят по мере готовности; неизменившиеся берутся из кэша фрагментов
+    chunks = exports.schedule_print_chunks(year, manager_id)
+    return exports.streaming_response(request, chunks, 'text/html; charset=utf-8')
 
-    rows_html = []
-    for entry in entries:
-        period_chunks = []
-        for p in entry.get("periods", []):
-            confirm_suffix = "" if p.get("confirmed_by_employee") else " <span class=\"chip-sub\">без подтверждения</span>"
-            period_chunks.append(
-                f"<div class='chip'>{escape(p['start_date'])} - {escape(p['end_date'])} ({p['days']} дн.){confirm_suffix}</div>"
-            )
-        periods_html = "".join(period_chunks) or "<div class='muted'>Нет утверждённых периодов</div>"
-        rows_html.append(
-            "<tr>"
-            f"<td><div class='user-name'>{escape(entry.get('full_name',''))}</div>"
-            f"<div class='muted'>{escape(entry.get('username',''))}</div>"
-            f"<div class='muted small'>{escape(entry.get('manager_name',''))}</div></td>"
-            f"<td>{periods_html}</td>"
-            "</tr>"
-        )
 
-    manager_label = ""
-    if manager_id:
-        manager_obj = User.objects.filter(id=manager_id, role=ROLE_MANAGER).first()
-        if manager_obj:
-            manager_label = f" • Подразделение: {(manager_obj.first_name + ' ' + manager_obj.last_name).strip() or manager_obj.username}"
-
-    html_content = f"""
-    <!doctype html>
-    <html>
-      <head>
-        <meta charset="utf-8" />
-        <title>График отпусков {year}</title>
-        <style>
-          body {{ font-family: Arial, sans-serif; margin: 24px; }}
-          h1 {{ margin-bottom: 4px; }}
-          .muted {{ color: #666; font-size: 12px; }}
-          .small {{ font-size: 11px; }}
-          table {{ width: 100%; border-collapse: collapse; margin-top: 12px; }}
-          th, td {{ border: 1px solid #ddd; padding: 8px; vertical-align: top; }}
-          th {{ background: #f7f7f7; text-align: left; }}
-          .chip {{ display: inline-block; padding: 4px 8px; background: #eef6ff; border: 1px solid #d3e5ff; border-radius: 12px; margin: 2px; }}
-          .chip-sub {{ color: #a94442; font-size: 11px; }}
-          .user-name {{ font-weight: 600; }}
-          @media print {{
-            button {{ display: none; }}
-            body {{ margin: 0; padding: 0; }}
-          }}
-        </style>
-      </head>
-      <body>
-        <h1>График отпусков на {year} год</h1>
-        <div class="muted">Только согласованные заявки{escape(manager_label)}</div>
-        <table>
-          <thead>
-            <tr><th>Сотрудник</th><th>Периоды</th></tr>
-          </thead>
-          <tbody>
-            {''.join(rows_html)}
-          </tbody>
-        </table>
-        <button onclick="window.print()">Печать</button>
-      </body>
-    </html>
+def _serialize_export_job(job: ExportJob):
+    percent = None
+    if job.rows_total:
+        percent = min(100, round(job.rows_done * 100 / job.rows_total))
+    elif job.status == ExportJob.Status.DONE:
+        percent = 100
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'year': job.year,
+        'manager_id': job.manager_id,
+        'status': job.status,
+        'rows_done': job.rows_done,
+        'rows_total': job.rows_total,
+        'percent': percent,
+        'file_name': job.file_name,
+        'file_size': job.file_size if job.status == ExportJob.Status.DONE else None,
+        'error': job.error or None,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'download_url': (
+            f'/api/hr/export_jobs/{job.id}/download' if job.status == ExportJob.Status.DONE else None
+        ),
+    }
+
+
+@login_required
+@require_POST
+def hr_export_job_create(request):
+    """
+    Ставит выгрузку в очередь фонового воркера (run_export_jobs).
+    Тело: {"kind": "requests_csv|schedule_csv|schedule_print", "year": 2025, "manager_id": 3}.
+    Если свежая выгрузка с теми же параметрами уже есть или готовится - возвращается она.
+    """
+    if request.user.role != ROLE_HR:
+        return _json_error('Forbidden', status=403)
+    data = _get_request_data(request)
+    kind = data.get('kind')
+    if kind not in ExportJob.Kind.values:
+        return _json_error(f'Неизвестный тип выгрузки: {kind}')
+    try:
+        year = int(data.get('year') or date.today().year)
+        manager_id = int(data['manager_id']) if data.get('manager_id') else None
+    except (TypeError, ValueError):
+        return _json_error('year и manager_id должны быть числами')
+
+    job, created = export_jobs.enqueue(kind, year, manager_id, requested_by=request.user)
+    return JsonResponse(
+        {'job': _serialize_export_job(job), 'reused': not created},
+        status=202 if created else 200,
+    )
+
+
+@login_required
+@require_POST
+def hr_org_import(request):
+    """
+    Загрузка оргструктуры и балансов из CSV (multipart, поле file; формат -
+    org_import.py). dry_run=1 - только показать, что изменится.
+    Ответ - счётчики, первые изменения и скорость обработки.
     """
-    return HttpResponse(html_content)
+    if request.user.role != ROLE_HR:
+        return _json_error('Forbidden', status=403)
+    upload = request.FILES.get('file')
+    if upload is None:
+        return _json_error('Нужен CSV-файл в поле file')
+    dry_run = (request.POST.get('dry_run') or request.GET.get('dry_run')) in ('1', 'true')
+    try:
+        # файл читается построчно, целиком в память не попадает
+        report = org_import.run(codecs.iterdecode(upload, 'utf-8-sig'), dry_run=dry_run)
+    except org_import.OrgImportError as exc:
+        return JsonResponse({'error': str(exc), 'errors': exc.errors}, status=400)
+    except UnicodeDecodeError:
+        return _json_error('Файл должен быть в кодировке UTF-8')
+    return JsonResponse(report.as_dict())
+
+
+@login_required
+@require_GET
+def hr_export_job_status(request, pk):
+    if request.user.role != ROLE_HR:
+        return _json_error('Forbidden', status=403)
+    job = ExportJob.objects.filter(pk=pk).first()
+    if job is None:
+        return _json_error('Выгрузка не найдена', status=404)
+    return JsonResponse({'job': _serialize_export_job(job)})
 
 
 @login_required
 @require_GET
+def hr_export_job_download(request, pk):
+    if request.user.role != ROLE_HR:
+        return _json_error('Forbidden', status=403)
+    job = ExportJob.objects.filter(pk=pk).first()
+    if job is None:
+        return _json_error('Выгрузка не найдена', status=404)
+    if job.status != ExportJob.Status.DONE:
+        return _json_error('Выгрузка ещё не готова', status=409)
+    path = export_jobs.artifact_path(job)
+    if not path.exists():
+        return _json_error('Файл выгрузки удалён, запросите её заново', status=410)
+    # печатную версию открываем в браузере, CSV - скачиваем
+    return FileResponse(
+        open(path, 'rb'),
+        as_attachment=job.kind != ExportJob.Kind.SCHEDULE_PRINT,
+        filename=job.file_name,
+        content_type=export_jobs.CONTENT_TYPES[job.kind],
+    )
+
+
+@login_required
+@require_GET
+@etag(data_etag)
+@cached_response('hr_departments')
 def hr_departments(request):
     if getattr(request.user, "role", None) != "hr":
         return JsonResponse({"error": "Forbidden"}, status=403)
@@ -477,154 +755,223 @@ def hr_departments(request):
     return JsonResponse({"departments": data})
 
 
+@login_required
+@require_GET
+@etag(data_etag)
+@cached_response('hr_heatmap')
+def hr_heatmap(request):
+    """
+    Отсутствующие по дням года в разрезе подразделений (heatmap.py).
+
+    Карта года считается один раз на версию данных HR (heatmap.year_heatmap),
+    готовый JSON лежит в кэше ответов под той же версией.
+    """
+    if getattr(request.user, "role", None) != "hr":
+        return JsonResponse({"error": "Forbidden"}, status=403)
+    try:
+        year = int(request.GET.get("year") or date.today().year)
+    except ValueError:
+        year = date.today().year
+    return JsonResponse(heatmap.year_heatmap(year))
+
+
+@login_required
+@require_GET
+def hr_response_cache(request):
+    """Счётчики кэша ответов этого процесса (попадания, промахи, объём) - для настройки размера."""
+    if getattr(request.user, "role", None) != "hr":
+        return JsonResponse({"error": "Forbidden"}, status=403)
+    return JsonResponse(response_cache.stats())
+
+
 @login_required
 @require_GET
 def live_changes(request):
     """
-    Лёгкий пинг для фронта: если зафиксированы изменения в заявках/уведомлениях
-    после переданного timestamp (ms), возвращаем changed=True и новую метку.
+    Дельта-синхронизация для фронта.
+
+    Клиент передаёт курсор ?since=<версия>. В ответ - новая версия и только то,
+    что поменялось в его зоне видимости после курсора: сериализованные заявки,
+    балансы, уведомления и профили, плюс id удалённых сущностей (tombstones).
+    Если курсора нет или изменений слишком много, возвращаем reset=True -
+    клиенту проще перезагрузить списки целиком.
     """
     try:
-        since_ms = float(request.GET.get("since", "0"))
+        since = int(request.GET.get("since", "0"))
     except ValueError:
-        since_ms = 0
-    since = timezone.datetime.fromtimestamp(since_ms / 1000, tz=timezone.utc) if since_ms else None
+        since = 0
 
     user = request.user
-    role = getattr(user, "role", None)
-
-    latest_ts = None
-
-    def bump(ts):
-        nonlocal latest_ts
-        if ts and (latest_ts is None or ts > latest_ts):
-            latest_ts = ts
-
-    # заявки
-    if role == ROLE_EMPLOYEE:
-        qs = VacationRequest.objects.filter(user=user)
-    elif role == ROLE_MANAGER:
-        qs = VacationRequest.objects.filter(user__manager=user)
-    elif role == ROLE_HR:
-        qs = VacationRequest.objects.all()
-    else:
-        qs = VacationRequest.objects.none()
-    agg = qs.aggregate(max_updated=Max("updated_at"))
-    bump(agg.get("max_updated"))
-
-    # уведомления (только для текущего пользователя)
-    notif_agg = Notification.objects.filter(user=user).aggregate(max_created=Max("created_at"))
-    bump(notif_agg.get("max_created"))
-
-    # балансы для HR/manager/employee
-    bal_qs = VacationBalance.objects.all()
-    if role == ROLE_EMPLOYEE:
-        bal_qs = bal_qs.filter(user=user)
-    elif role == ROLE_MANAGER:
-        bal_qs = bal_qs.filter(user__manager=user)
-    bal_agg = bal_qs.aggregate(max_updated=Max("id"))
-    bump(timezone.now() if bal_agg.get("max_updated") else None)
-
-    changed = False
-    if latest_ts:
-        if since is None or latest_ts > since:
-            changed = True
-
-    latest_ms = int(latest_ts.timestamp() * 1000) if latest_ts else since_ms
-    return JsonResponse({
-        "changed": changed,
-        "timestamp": latest_ms,
+    version = latest_version(user)
+    response = {
+        "changed": version > since,
+        "version": max(version, since),
+        "reset": since <= 0,
+    }
+    if not response["changed"] or response["reset"]:
+        return JsonResponse(response)
+
+    limit = getattr(settings, "LIVE_SYNC_MAX_ENTRIES", 500)
+    entries = list(
+        visible_entries(user)
+        .filter(id__gt=since, id__lte=version)
+        .order_by("id")
+        .values_list("entity", "entity_id", "action", "scope_user")[:limit + 1]
+    )
+    if len(entries) > limit:
+        response["reset"] = True
+        return JsonResponse(response)
+
+    changes, request_owners = collapse_entries(entries)
+    upserts = {entity: ids[Action.UPSERT] for entity, ids in changes.items()}
+
+    requests = _role_requests_queryset(user).filter(id__in=upserts[Entity.REQUEST])
+    # планируемые дни в балансе зависят от заявок владельца
+    balances = _role_balances_queryset(user).filter(
+        Q(id__in=upserts[Entity.BALANCE]) | Q(user_id__in=request_owners)
+    )
+    notifications = list(Notification.objects.filter(user=user, id__in=upserts[Entity.NOTIFICATION]))
+    changed_broadcasts = list(broadcasts.visible_broadcasts(user).filter(id__in=upserts[Entity.BROADCAST]))
+    notification_texts.refresh_stale(notifications)
+    notification_texts.refresh_stale(changed_broadcasts)
+    users = _role_users_queryset(user).filter(id__in=upserts[Entity.USER])
+    read_state = broadcasts.read_state(user)
+
+    response.update({
+        "requests": [_serialize_request(r) for r in requests],
+        "balances": _serialize_balances(balances),
+        "notifications": (
+            [_serialize_notification(n) for n in notifications]
+            + [_serialize_broadcast(b, read_state) for b in changed_broadcasts]
+        ),
+        "users": [_serialize_user(u) for u in users],
+        "deleted": {
+            "requests": sorted(changes[Entity.REQUEST][Action.DELETE]),
+            "balances": sorted(changes[Entity.BALANCE][Action.DELETE]),
+            "notifications": (
+                sorted(changes[Entity.NOTIFICATION][Action.DELETE])
+                + [broadcasts.public_id(i) for i in sorted(changes[Entity.BROADCAST][Action.DELETE])]
+            ),
+        },
     })
+    return JsonResponse(response)
+
+
+def _sse_response(stream):
+    response = StreamingHttpResponse(stream, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
-def _latest_change_timestamp(user):
-    """Возвращает максимальный timestamp изменений, доступных пользователю."""
-    role = getattr(user, "role", None)
-    latest_ts = None
-
-    def bump(ts):
-        nonlocal latest_ts
-        if ts and (latest_ts is None or ts > latest_ts):
-            latest_ts = ts
-
-    if role == ROLE_EMPLOYEE:
-        req_qs = VacationRequest.objects.filter(user=user)
-    elif role == ROLE_MANAGER:
-        req_qs = VacationRequest.objects.filter(user__manager=user)
-    elif role == ROLE_HR:
-        req_qs = VacationRequest.objects.all()
-    else:
-        req_qs = VacationRequest.objects.none()
-    agg = req_qs.aggregate(max_updated=Max("updated_at"))
-    bump(agg.get("max_updated"))
-
-    notif_agg = Notification.objects.filter(user=user).aggregate(max_created=Max("created_at"))
-    bump(notif_agg.get("max_created"))
-
-    bal_qs = VacationBalance.objects.all()
-    if role == ROLE_EMPLOYEE:
-        bal_qs = bal_qs.filter(user=user)
-    elif role == ROLE_MANAGER:
-        bal_qs = bal_qs.filter(user__manager=user)
-
-    # обновления профилей (имён) - чтобы списки заявок подтягивали новые ФИО
-    if role == ROLE_EMPLOYEE:
-        user_qs = User.objects.filter(id=user.id)
-    elif role == ROLE_MANAGER:
-        user_qs = User.objects.filter(manager=user)
-    elif role == ROLE_HR:
-        user_qs = User.objects.all()
-    else:
-        user_qs = User.objects.none()
-    user_agg = user_qs.aggregate(max_updated=Max("updated_at"))
-    bump(user_agg.get("max_updated"))
-
-    return latest_ts
+def _sse_overloaded():
+    response = _json_error("Слишком много live-подключений, попробуйте позже", status=503)
+    response["Retry-After"] = "10"
+    return response
 
 
 @login_required
 @require_GET
 def live_sse(request):
-    """Простой SSE-стрим изменений для реактивного фронта."""
-    user = request.user
-    last_ts = _latest_change_timestamp(user) or timezone.now()
-
-    def event_stream():
-        nonlocal last_ts
-        while True:
-            try:
-                current = _latest_change_timestamp(user) or last_ts
-                if current > last_ts:
-                    last_ts = current
-                    payload = json.dumps({
-                        "type": "change",
-                        "timestamp": int(current.timestamp() * 1000),
-                    })
-                    yield f"event: change\ndata: {payload}\n\n"
-                time.sleep(2)
-            except GeneratorExit:
-                break
-            except Exception:
-                break
-
-    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
-    response["Cache-Control"] = "no-cache"
-    response["X-Accel-Buffering"] = "no"
-    return response
+    """SSE-стрим изменений для реактивного фронта (WSGI).
+
+    Соединение не ходит в БД само: оно подписывается на общую шину процесса
+    (см. live.change_bus) и ждёт событий в своей очереди.
+    """
+    heartbeat = getattr(settings, "LIVE_SSE_HEARTBEAT", 15)
+    stream = open_event_stream(scopes_for_user(request.user), heartbeat)
+    if stream is None:
+        return _sse_overloaded()
+    return _sse_response(stream)
+
+
+async def live_sse_async(request):
+    """Асинхронный вариант live_sse для запуска под ASGI.
+
+    Декораторы login_required/require_GET в Django 4.2 не умеют async,
+    поэтому проверки сделаны вручную.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+    if not is_authenticated:
+        return _json_error("Authentication required", status=401)
+    heartbeat = getattr(settings, "LIVE_SSE_HEARTBEAT", 15)
+    stream = await open_async_event_stream(scopes_for_user(request.user), heartbeat)
+    if stream is None:
+        return _sse_overloaded()
+    return _sse_response(stream)
+
+
+# метки таблиц ленты уведомлений в курсоре (pagination.merged_keyset_page)
+PERSONAL_SOURCE = 0
+BROADCAST_SOURCE = 1
 
 
 @login_required
 @require_GET
+@etag(notifications_etag)
 def notifications_list(request):
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    return JsonResponse({'notifications': [_serialize_notification(n) for n in notifications]})
+    """
+    Личные и broadcast-уведомления вперемешку, от новых к старым, страницами
+    по ?cursor / ?limit.
+
+    Тексты хранятся готовыми, поэтому страница стоит фиксированное число
+    запросов: страница личных, страница broadcast и состояние прочтения.
+    ?history=1 - архив старых прочитанных уведомлений (ArchivedNotification).
+    """
+    user = request.user
+    params = request.GET
+    if params.get('history') in ('1', 'true'):
+        return _archived_notifications_page(request)
+    try:
+        page, next_cursor = merged_keyset_page(
+            {
+                PERSONAL_SOURCE: Notification.objects.filter(user=user),
+                # broadcast-уведомления роли: одна строка на событие, прочитанность - из BroadcastReadState
+                BROADCAST_SOURCE: broadcasts.visible_broadcasts(user),
+            },
+            params.get('cursor'),
+            parse_limit(params.get('limit')),
+        )
+    except PaginationError as exc:
+        return _json_error(str(exc))
+    page = [n for _, n in page]
+
+    notification_texts.refresh_stale([n for n in page if isinstance(n, Notification)])
+    notification_texts.refresh_stale([n for n in page if isinstance(n, BroadcastNotification)])
+    state = broadcasts.read_state(user) if any(isinstance(n, BroadcastNotification) for n in page) else None
+    return JsonResponse({
+        'notifications': [
+            _serialize_notification(n) if isinstance(n, Notification) else _serialize_broadcast(n, state)
+            for n in page
+        ],
+        'next_cursor': next_cursor,
+    })
+
+
+def _archived_notifications_page(request):
+    params = request.GET
+    try:
+        limit = parse_limit(params.get('limit'))
+        items, next_cursor = keyset_page(
+            ArchivedNotification.objects.filter(user=request.user), params.get('cursor'), limit
+        )
+    except PaginationError as exc:
+        return _json_error(str(exc))
+    notification_texts.refresh_stale(items)
+    return JsonResponse({
+        'notifications': [_serialize_archived_notification(n) for n in items],
+        'next_cursor': next_cursor,
+    })
 
 
 @login_required
 @require_GET
+@etag(unread_etag)
 def notifications_unread_count(request):
-    count = Notification.objects.filter(user=request.user, is_read=False).count()
-    return JsonResponse({'unread_count': count})
+    # денормализованный счётчик (unread.py): пользователь уже загружен сессией
+    return JsonResponse({'unread_count': request.user.unread_notifications})
 
 
 @login_required
@@ -634,9 +981,95 @@ def notification_mark_read(request, pk):
         notification = Notification.objects.get(pk=pk, user=request.user)
     except Notification.DoesNotExist:
         return _json_error('Notification not found', status=404)
+    unread_count = unread.mark_read(request.user, notification_ids=[notification.id])
     notification.is_read = True
-    notification.save(update_fields=['is_read'])
-    return JsonResponse({'notification': _serialize_notification(notification)})
+    notification_texts.refresh_stale([notification])
+    return JsonResponse({
+        'notification': _serialize_notification(notification),
+        'unread_count': unread_count,
+    })
+
+
+@login_required
+@require_POST
+def broadcast_mark_read(request, pk):
+    user = request.user
+    try:
+        broadcast = broadcasts.visible_broadcasts(user).get(pk=pk)
+    except BroadcastNotification.DoesNotExist:
+        return _json_error('Notification not found', status=404)
+    unread_count = unread.mark_read(user, broadcast_ids=[broadcast.id])
+    notification_texts.refresh_stale([broadcast])
+    return JsonResponse({
+        'notification': _serialize_broadcast(broadcast, broadcasts.read_state(user)),
+        'unread_count': unread_count,
+    })
+
+
+def _parse_notification_ids(raw_ids):
+    """Список id из API (42 или "b42") -> (личные id, broadcast id)."""
+    if not isinstance(raw_ids, list):
+        raise ValueError('ids должен быть списком')
+    personal, shared = [], []
+    for raw in raw_ids:
+        raw = str(raw)
+        target = personal
+        if raw.startswith(broadcasts.ID_PREFIX):
+            raw = raw[len(broadcasts.ID_PREFIX):]
+            target = shared
+        if not raw.isdigit():
+            raise ValueError(f'Некорректный id уведомления: {raw}')
+        target.append(int(raw))
+    return personal, shared
+
+
+@login_required
+@require_POST
+def notifications_mark_read_bulk(request):
+    """Отметить прочитанными уведомления из списка: {"ids": [1, 2, "b3"]}."""
+    data = _get_request_data(request)
+    try:
+        personal, shared = _parse_notification_ids(data.get('ids'))
+    except ValueError as exc:
+        return _json_error(str(exc))
+    unread_count = unread.mark_read(request.user, notification_ids=personal, broadcast_ids=shared)
+    return JsonResponse({'unread_count': unread_count})
+
+
+@login_required
+@require_POST
+def notifications_mark_read_up_to(request):
+    """
+    Отметить прочитанным всё до id включительно: {"id": 120} для личных,
+    {"broadcast_id": "b45"} для broadcast (можно оба).
+    """
+    data = _get_request_data(request)
+    personal, shared = [], []
+    try:
+        if data.get('id') is not None:
+            personal, shared = _parse_notification_ids([data['id']])
+        if data.get('broadcast_id') is not None:
+            # broadcast_id - всегда broadcast, с префиксом "b" или без
+            raw = str(data['broadcast_id'])
+            if not raw.startswith(broadcasts.ID_PREFIX):
+                raw = broadcasts.ID_PREFIX + raw
+            shared += _parse_notification_ids([raw])[1]
+    except ValueError as exc:
+        return _json_error(str(exc))
+    if not personal and not shared:
+        return _json_error('Нужно передать id или broadcast_id')
+    unread_count = unread.mark_read_up_to(
+        request.user,
+        notification_id=max(personal) if personal else None,
+        broadcast_id=max(shared) if shared else None,
+    )
+    return JsonResponse({'unread_count': unread_count})
+
+
+@login_required
+@require_POST
+def notifications_mark_all_read(request):
+    return JsonResponse({'unread_count': unread.mark_all_read(request.user)})
 
 
 @login_required
@@ -651,17 +1084,40 @@ def delete_request(request, pk):
         return _json_error('Заявка не найдена', status=404)
     if vacation_request.status != VacationRequest.Status.PENDING:
         return _json_error('Удалять можно только заявки в статусе "На согласовании"', status=400)
-    vacation_request.delete()
-    # обновляем updated_at у пользователя, чтобы фронт получил SSE-событие
-    request.user.updated_at = timezone.now()
-    request.user.save(update_fields=['updated_at'])
+    # уведомления по заявке (и broadcast) удалятся каскадом - их получателям тоже нужна отметка об удалении
+    notification_rows = list(
+        Notification.objects.filter(request=vacation_request).values_list('id', 'user_id')
+    )
+    broadcast_rows = list(
+        BroadcastNotification.objects.filter(request=vacation_request).values_list('id', 'role')
+    )
+    request_id = vacation_request.id
+    with transaction.atomic():
+        if not ledger.lock_unchanged(request_id, ledger.snapshot(vacation_request)):
+            return _stale_request_error()
+        ledger.apply(ledger.state_of(vacation_request), None)
+        vacation_request.delete()
+    record_change(Entity.REQUEST, request_id, request.user, action=Action.DELETE)
+    for notification_id, recipient_id in notification_rows:
+        record_notification(notification_id, recipient_id, action=Action.DELETE)
+    broadcasts.record_broadcasts(broadcast_rows, action=Action.DELETE)
+    if notification_rows or broadcast_rows:
+        # непрочитанные среди удалённых каскадом - пересчитываем счётчики получателей
+        affected = {recipient_id for _, recipient_id in notification_rows}
+        if broadcast_rows:
+            roles = {role for _, role in broadcast_rows}
+            affected.update(User.objects.filter(role__in=roles).values_list('id', flat=True))
+        unread.recount(affected)
     return JsonResponse({'deleted': True})
 
 
 @login_required
 @require_POST
 def duplicate_request(request, pk):
-    """Создание копии своей заявки (новая pending, учитываем баланс)."""
+    """
+    Создание копии своей отклонённой заявки (новая pending, учитываем баланс).
+    Копия активной заявки пересекалась бы с ней самой, поэтому запрещена.
+    """
     if request.user.role != ROLE_EMPLOYEE:
         return HttpResponseForbidden()
     try:
@@ -673,30 +1129,26 @@ def duplicate_request(request, pk):
     end_date = source.end_date
     if end_date < start_date:
         return _json_error('Дата окончания не может быть раньше даты начала')
+    if source.status in coverage.ACTIVE_STATUSES:
+        return _json_error('Дублировать можно только отклонённую заявку: копия пересекалась бы с исходной')
 
-    days_requested = (end_date - start_date).days + 1
-    year = start_date.year
-    balance, _ = VacationBalance.objects.get_or_create(
-        user=request.user,
-        year=year,
-        defaults={"days_remaining": 0},
-    )
-    initial_days = balance.days_remaining
-    planned_days = _calculate_planned_days(request.user, year)
-    available = max(initial_days - planned_days, 0)
-    if days_requested > available:
-        return _json_error(
-            f'Недостаточно дней отпуска на {year} год. Доступно: {available}, выбрано: {days_requested}.',
-            status=400,
-        )
-
-    new_req = VacationRequest.objects.create(
-        user=request.user,
-        start_date=start_date,
-        end_date=end_date,
-        status=VacationRequest.Status.PENDING,
-        confirmed_by_employee=False,
-    )
+    try:
+        with transaction.atomic():
+            ledger.lock_balances(request.user.id)
+            overlap = coverage.own_overlap(request.user, start_date, end_date)
+            if overlap:
+                return _overlap_error(overlap)
+            new_req = VacationRequest.objects.create(
+                user=request.user,
+                start_date=start_date,
+                end_date=end_date,
+                status=VacationRequest.Status.PENDING,
+                confirmed_by_employee=False,
+            )
+            ledger.apply(None, ledger.state_of(new_req))
+    except ledger.InsufficientVacationDays as exc:
+        return _insufficient_days_error(exc)
+    record_change(Entity.REQUEST, new_req.id, request.user)
     return JsonResponse({'request': _serialize_request(new_req)}, status=201)
 
 
@@ -711,23 +1163,14 @@ def _serialize_user(user: User):
     }
 
 
-def _calculate_planned_days(user: User, year: int) -> int:
-    """Считает количество дней уже утверждённых и подтверждённых заявок за указанный год."""
-    qs = VacationRequest.objects.filter(
-        user=user,
-        start_date__year=year,
-        status=VacationRequest.Status.APPROVED,
-        confirmed_by_employee=True,
-    )
-    total_days = 0
-    for req in qs:
-        total_days += (req.end_date - req.start_date).days + 1
-    return total_days
+def _serialize_balances(balances_qs):
+    """Сериализация списка балансов одним запросом: итоги уже лежат в строке баланса."""
+    return [_serialize_balance(b) for b in balances_qs.select_related('user')]
 
 
 def _serialize_balance(balance: VacationBalance):
     initial_days = balance.days_remaining
-    planned_days = _calculate_planned_days(balance.user, balance.year)
+    planned_days = balance.consumed_days
     remaining_days = max(initial_days - planned_days, 0)
     return {
         'id': balance.id,
@@ -735,6 +1178,9 @@ def _serialize_balance(balance: VacationBalance):
         'initial_days': initial_days,
         'planned_days': planned_days,
         'remaining_days': remaining_days,
+        # дни заявок на согласовании и ещё не подтверждённых - уже заняты
+        'reserved_days': balance.reserved_days,
+        'available_days': max(remaining_days - balance.reserved_days, 0),
         # для обратной совместимости с фронтом
         'days_remaining': remaining_days,
         'user': _serialize_user(balance.user),
@@ -749,115 +1195,63 @@ def _serialize_request(request_obj: VacationRequest):
         'status': request_obj.status,
         'created_at': request_obj.created_at.isoformat(),
         'confirmed_by_employee': request_obj.confirmed_by_employee,
+        # рабочие дни по производственному календарю - столько списывается с баланса
+        'days': request_obj.days,
     }
 
 
 def _serialize_notification(notification: Notification):
+    # текст хранится готовым (см. notification_texts); устаревшие тексты
+    # перерисовывает notification_texts.refresh_stale до сериализации
     return {
         'id': notification.id,
         'type': notification.type,
-        'request_id': notification.request.id if notification.request else None,
-        'message': _build_notification_message(notification),
+        'request_id': notification.request_id,
+        'message': notification.message,
         'is_read': notification.is_read,
+        'remind_days': notification.remind_days,
         'created_at': notification.created_at.isoformat(),
     }
 
 
-def _build_notification_message(notification: Notification):
-    req = notification.request
-
-    # Пользователь, который видит уведомление (получатель)
-    viewer = notification.user
-
-    # Будем показывать имя сотрудника только, если уведомление читает не он сам
-    employee_label = ""
-    is_self = False
-
-    if req and req.user:
-        u = req.user
-        full_name = (f"{u.first_name} {u.last_name}".strip() or u.username).strip()
-        is_self = (viewer.id == u.id)
-
-        if not is_self:
-            employee_label = f" сотрудника {full_name}"
-
-    # Далее тексты зависят и от типа уведомления, и от того, кто его читает
-
-    if notification.type == Notification.Type.REQUEST_APPROVED and req:
-        if is_self:
-            return (
-                f"Ваша заявка №{req.id} на отпуск "
-                f"с {req.start_date.isoformat()} по {req.end_date.isoformat()} - согласована менеджером."
-            )
-        return (
-            f"Заявка №{req.id}{employee_label} на отпуск "
-            f"с {req.start_date.isoformat()} по {req.end_date.isoformat()} - согласована менеджером."
-        )
-
-    if notification.type == Notification.Type.REQUEST_REJECTED and req:
-        if is_self:
-            return (
-                f"Ваша заявка №{req.id} на отпуск "
-                f"с {req.start_date.isoformat()} по {req.end_date.isoformat()} - отклонена менеджером."
-            )
-        return (
-            f"Заявка №{req.id}{employee_label} на отпуск "
-            f"с {req.start_date.isoformat()} по {req.end_date.isoformat()} - отклонена менеджером."
-        )
-
-    if notification.type == Notification.Type.REQUEST_CREATED and req:
-        if is_self:
-            return (
-                f"Вы создали заявку №{req.id} на отпуск "
-                f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
-            )
-        return (
-            f"Создана новая заявка №{req.id}{employee_label} на отпуск "
-            f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
-        )
-
-    if notification.type == Notification.Type.REQUEST_RESCHEDULED and req:
-        if is_self:
-            return (
-                f"Вы изменили период заявки №{req.id} на отпуск. "
-                f"Новый период: {req.start_date.isoformat()} - {req.end_date.isoformat()}."
-            )
-        return (
-            f"Сотрудник{employee_label} изменил период заявки №{req.id} на отпуск. "
-            f"Новый период: {req.start_date.isoformat()} - {req.end_date.isoformat()}."
-        )
-
-    if notification.type == "vacation_reminder_14d" and req:
-        if is_self:
-            return (
-                f"До начала вашего отпуска №{req.id} осталось 14 дней "
-                f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
-            )
-        return (
-            f"До начала отпуска №{req.id}{employee_label} осталось 14 дней "
-            f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
-        )
+def _serialize_archived_notification(notification: ArchivedNotification):
+    return {
+        'id': notification.id,
+        'type': notification.type,
+        'request_id': notification.request_id,
+        'message': notification.message,
+        'is_read': True,
+        'remind_days': notification.remind_days,
+        'created_at': notification.created_at.isoformat(),
+        'archived': True,
+    }
 
-    if notification.type == "vacation_start_today" and req:
-        if is_self:
-            return (
-                f"Сегодня начинается ваш отпуск №{req.id} "
-                f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
-            )
-        return (
-            f"Сегодня начинается отпуск №{req.id}{employee_label} "
-            f"({req.start_date.isoformat()} - {req.end_date.isoformat()})."
-        )
 
-    return "Уведомление"
+def _serialize_broadcast(broadcast: BroadcastNotification, state):
+    """Broadcast в том же формате, что и личное уведомление; id с префиксом "b"."""
+    return {
+        'id': broadcasts.public_id(broadcast.id),
+        'type': broadcast.type,
+        'request_id': broadcast.request_id,
+        'message': broadcast.message,
+        'is_read': state.is_read(broadcast.id),
+        'remind_days': broadcast.remind_days,
+        'created_at': broadcast.created_at.isoformat(),
+        'broadcast': True,
+    }
 
 
 def _create_notification(user: User, type: str, request: VacationRequest = None):
-    Notification.objects.create(
+    notification = Notification.objects.create(
         user=user,
         type=type,
-        request=request
+        request=request,
+        message=notification_texts.render_message(type, request, user.id),
+        message_version=notification_texts.TEMPLATE_VERSION,
     )
+    record_notification(notification.id, user.id)
+    unread.increment({user.id: 1})
+
 
 @login_required
 @require_POST
@@ -872,33 +1266,18 @@ def profile_update(request):
     user = request.user
     user.first_name = first_name
     user.last_name = last_name
-    # обновляем updated_at, чтобы SSE увидело изменение профиля
     user.save(update_fields=['first_name', 'last_name', 'updated_at'])
-
-    # Обновляем метку у заявок, чтобы менеджеры/HR получили событие и новые ФИО
-    VacationRequest.objects.filter(user=user).update(updated_at=timezone.now())
+    # менеджер и HR получат событие и подтянут новые ФИО в списках заявок
+    record_change(Entity.USER, user.id, user)
 
     return JsonResponse({'user': _serialize_user(user)})
 
 @login_required
 @require_GET
+@etag(data_etag)
+@cached_response('vacation_balances')
 def vacation_balances(request):
-    user = request.user
-    qs = VacationBalance.objects.select_related('user')
-
-    # Разные выборки по ролям
-    if user.role == User.Roles.EMPLOYEE:
-        qs = qs.filter(user=user)
-    elif user.role == User.Roles.MANAGER:
-        # все сотрудники, у которых этот пользователь - менеджер
-        qs = qs.filter(user__manager=user)
-    elif user.role == User.Roles.HR:
-        # кадровик видит всех
-        pass
-    else:
-        qs = qs.none()
-
-    data = [_serialize_balance(b) for b in qs]
+    data = _serialize_balances(_role_balances_queryset(request.user))
     return JsonResponse({'balances': data})
 
 @login_required
@@ -940,37 +1319,34 @@ def create_request(request):
             status=400,
         )
 
-    days_requested = (end_date - start_date).days + 1
-
-    # Берём остаток по году начала отпуска
-    year = start_date.year
-    balance, _ = VacationBalance.objects.get_or_create(
-        user=request.user,
-        year=year,
-        defaults={"days_remaining": 0},
-    )
-
-    initial_days = balance.days_remaining
-    planned_days = _calculate_planned_days(request.user, year)
-    available = max(initial_days - planned_days, 0)
-
-    if days_requested > available:
+    # Резервируем дни по году начала отпуска вместе с созданием заявки:
+    # при нехватке остатка транзакция откатывается и заявка не появляется
+    try:
+        with transaction.atomic():
+            # свои активные заявки (на согласовании и согласованные) не должны пересекаться;
+            # проверка - под блокировкой балансов сотрудника, чтобы параллельная заявка её не обошла
+            ledger.lock_balances(request.user.id)
+            overlap = coverage.own_overlap(request.user, start_date, end_date)
+            if overlap:
+                return _overlap_error(overlap)
+            req = VacationRequest.objects.create(
+                user=request.user,
+                start_date=start_date,
+                end_date=end_date,
+                status="pending",
+                confirmed_by_employee=False,
+            )
+            ledger.apply(None, ledger.state_of(req))
+    except ledger.InsufficientVacationDays as exc:
         return JsonResponse(
             {
-                "error": f"У вас нет доступных дней отпуска для выбранного периода на {year} год.",
-                "days_requested": days_requested,
-                "available_days": available,
+                "error": f"У вас нет доступных дней отпуска для выбранного периода на {exc.year} год.",
+                "days_requested": exc.requested,
+                "available_days": exc.available,
             },
             status=400,
         )
-
-    req = VacationRequest.objects.create(
-        user=request.user,
-        start_date=start_date,
-        end_date=end_date,
-        status="pending",
-        confirmed_by_employee=False,
-    )
+    record_change(Entity.REQUEST, req.id, request.user)
 
     data = {
         "id": req.id,
@@ -978,6 +1354,7 @@ def create_request(request):
         "end_date": str(req.end_date),
         "status": req.status,
         "confirmed_by_employee": req.confirmed_by_employee,
+        "days": req.days,
     }
 
     return JsonResponse(data, status=201)
@@ -1,6 +1,61 @@
+import asyncio
 import os
+
 from django.core.asgi import get_asgi_application
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vacation_workflow.settings')
+# под ASGI live-стрим работает в асинхронном режиме (см. vacation_app/urls.py)
+os.environ.setdefault('LIVE_SSE_MODE', 'async')
+
+
+class DisconnectAwareASGIHandler(ASGIHandler):
+    """
+    ASGIHandler, который замечает разрыв соединения во время стриминга.
+
+    Django 4.2 не слушает http.disconnect, пока отдаёт StreamingHttpResponse,
+    и бесконечный SSE-стрим так и висел бы после закрытия вкладки. Здесь после
+    чтения тела запроса параллельно ждём http.disconnect и отменяем обработку
+    (так же ведёт себя Django 5.0) - генератор стрима закрывается и снимает
+    подписку.
+    """
+
+    async def handle(self, scope, receive, send):
+        body_received = asyncio.Event()
+
+        async def receive_body():
+            message = await receive()
+            if message['type'] != 'http.request' or not message.get('more_body', False):
+                body_received.set()
+            return message
+
+        handler_task = asyncio.ensure_future(super().handle(scope, receive_body, send))
+        body_task = asyncio.ensure_future(body_received.wait())
+        await asyncio.wait({handler_task, body_task}, return_when=asyncio.FIRST_COMPLETED)
+        body_task.cancel()
+        if handler_task.done():
+            return handler_task.result()
+
+        # тело прочитано, дальше receive() нужен только для http.disconnect
+        disconnect_task = asyncio.ensure_future(self._wait_disconnect(receive))
+        await asyncio.wait({handler_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        if handler_task.done():
+            disconnect_task.cancel()
+            return handler_task.result()
+
+        handler_task.cancel()
+        try:
+            await handler_task
+        except asyncio.CancelledError:
+            pass
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
 
-application = get_asgi_application()
+get_asgi_application()  # django.setup()
+application = DisconnectAwareASGIHandler()
@@ -54,6 +54,22 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # HTML-фрагменты печатного графика HR (строка на сотрудника, schedule_store.py)
+    # и тепловые карты отсутствий по годам (heatmap.py).
+    # Ключи версионированы (строки графика сотрудника, журнал изменений HR) -
+    # годится и кэш в памяти каждого процесса, старые записи уходят по TIMEOUT
+    'schedule_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'schedule-fragments',
+        'TIMEOUT': 24 * 3600,
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -81,3 +97,24 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'vacation_app.User'
 LOGIN_URL = '/admin/login/'
+
+# Live-обновления (SSE): период опроса общей шины изменений и интервал пинга
+LIVE_POLL_INTERVAL = 2
+LIVE_SSE_HEARTBEAT = 15
+# sync - поток на соединение (runserver/WSGI), async - корутина (ASGI, выставляет asgi.py)
+LIVE_SSE_MODE = os.environ.get('LIVE_SSE_MODE', 'sync')
+# лимит одновременных SSE-подключений на процесс; сверх него отвечаем 503
+LIVE_SSE_MAX_CONNECTIONS = int(os.environ.get('LIVE_SSE_MAX_CONNECTIONS', '5000'))
+# сколько записей журнала /api/live/changes отдаёт дельтой; больше - клиенту reset
+LIVE_SYNC_MAX_ENTRIES = 500
+
+# кэш JSON-ответов горячих эндпоинтов (response_cache.py): предел суммарного
+# размера тел на процесс, 0 - выключить
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# как часто процесс перечитывает производственный календарь (production_calendar.py),
+# секунд: импорт в другом процессе доходит до остальных не позже этого срока
+PRODUCTION_CALENDAR_TTL = int(os.environ.get('PRODUCTION_CALENDAR_TTL', '300'))
+
+# каталог файлов фоновых выгрузок (ExportJob, команда run_export_jobs)
+EXPORT_JOBS_DIR = Path(os.environ.get('EXPORT_JOBS_DIR', BASE_DIR / 'exports'))